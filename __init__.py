@@ -1,4 +1,5 @@
 # __init__.py
+import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 
@@ -15,7 +16,181 @@ def create_app():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['JSON_AS_ASCII'] = False
 
+    # JSON provider nhanh (orjson nếu có), datetime -> ISO 8601
+    from json_provider import init_json_provider
+    init_json_provider(app)
+
+    # Cấu hình server production (đọc từ biến môi trường)
+    app.config['SERVER_WORKERS'] = int(os.environ.get('SPA_WORKERS', (os.cpu_count() or 1) * 2 + 1))
+    app.config['SERVER_THREADS'] = int(os.environ.get('SPA_THREADS', 4))
+    app.config['SERVER_GRACEFUL_TIMEOUT'] = int(os.environ.get('SPA_GRACEFUL_TIMEOUT', 30))
+    app.config['API_BIND'] = os.environ.get('SPA_API_BIND', '127.0.0.1:5000')
+    app.config['FRONTEND_BIND'] = os.environ.get('SPA_FRONTEND_BIND', '127.0.0.1:5500')
+
+    # Access log JSON (ghi bất đồng bộ qua hàng đợi có giới hạn)
+    app.config['ACCESS_LOG_ENABLED'] = os.environ.get('SPA_ACCESS_LOG', '1') == '1'
+    app.config['ACCESS_LOG_QUEUE_SIZE'] = int(os.environ.get('SPA_ACCESS_LOG_QUEUE_SIZE', 10000))
+
+    # Slow-query log: ngưỡng (ms), số bản ghi giữ lại, có chạy EXPLAIN QUERY PLAN hay không
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = float(os.environ.get('SPA_SLOW_QUERY_MS', 200))
+    app.config['SLOW_QUERY_BUFFER_SIZE'] = int(os.environ.get('SPA_SLOW_QUERY_BUFFER', 100))
+    app.config['SLOW_QUERY_EXPLAIN'] = os.environ.get('SPA_SLOW_QUERY_EXPLAIN', '1') == '1'
+
+    # Cache-Control cho các API danh mục có ETag (0 = luôn hỏi lại server bằng If-None-Match)
+    app.config['CATALOG_CACHE_MAX_AGE'] = int(os.environ.get('SPA_CATALOG_MAX_AGE', 0))
+
+    # Nén response: bật/tắt, mức nén gzip (1-9), brotli (0-11), kích thước tối thiểu (byte)
+    app.config['COMPRESS_ENABLED'] = os.environ.get('SPA_COMPRESS', '1') == '1'
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('SPA_COMPRESS_LEVEL', 6))
+    app.config['COMPRESS_BROTLI_QUALITY'] = int(os.environ.get('SPA_BROTLI_QUALITY', 5))
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('SPA_COMPRESS_MIN_SIZE', 500))
+
+    # Số sub-request tối đa trong một lần gọi /api/batch
+    app.config['BATCH_MAX_REQUESTS'] = int(os.environ.get('SPA_BATCH_MAX_REQUESTS', 20))
+
+    # SSE sự kiện booking: chu kỳ polling bảng booking_events (giây), heartbeat (giây),
+    # số kết nối tối đa mỗi process (mỗi kết nối giữ một thread worker, mặc định một nửa
+    # SERVER_THREADS), hàng đợi mỗi kết nối, thời gian giữ sự kiện (giờ)
+    app.config['EVENTS_POLL_INTERVAL'] = float(os.environ.get('SPA_EVENTS_POLL_INTERVAL', 1.0))
+    app.config['EVENTS_HEARTBEAT'] = float(os.environ.get('SPA_EVENTS_HEARTBEAT', 15))
+    app.config['EVENTS_MAX_SUBSCRIBERS'] = int(os.environ.get('SPA_EVENTS_MAX_SUBSCRIBERS',
+                                                              app.config['SERVER_THREADS'] // 2))
+    app.config['EVENTS_SUBSCRIBER_QUEUE'] = int(os.environ.get('SPA_EVENTS_SUBSCRIBER_QUEUE', 1000))
+    app.config['EVENTS_RETENTION_HOURS'] = int(os.environ.get('SPA_EVENTS_RETENTION_HOURS', 24))
+
+    # Đồng bộ delta: số ngày giữ tombstone (since cũ hơn thì trả toàn bộ danh sách)
+    app.config['SYNC_TOMBSTONE_RETENTION_DAYS'] = int(os.environ.get('SPA_SYNC_TOMBSTONE_DAYS', 30))
+
+    # Số booking tối đa trong một lần gọi /api/invoices/quote
+    app.config['QUOTE_MAX_ITEMS'] = int(os.environ.get('SPA_QUOTE_MAX_ITEMS', 1000))
+
+    # Số booking tối đa trong một lần gọi /api/invoices/bulk
+    app.config['INVOICE_BULK_MAX_ITEMS'] = int(os.environ.get('SPA_INVOICE_BULK_MAX_ITEMS', 1000))
+
+    # Job nền: bật thread worker trong process web, số thread, chu kỳ polling (giây),
+    # thời gian tối đa một job được giữ trước khi coi worker đã chết (giây),
+    # backoff khi chạy lại (giây), số lần thử mặc định, thời gian giữ job đã xong (giờ)
+    app.config['JOBS_ENABLED'] = os.environ.get('SPA_JOBS', '1') == '1'
+    app.config['JOBS_WORKERS'] = int(os.environ.get('SPA_JOBS_WORKERS', 2))
+    app.config['JOBS_POLL_INTERVAL'] = float(os.environ.get('SPA_JOBS_POLL_INTERVAL', 5.0))
+    app.config['JOBS_LEASE_SECONDS'] = int(os.environ.get('SPA_JOBS_LEASE_SECONDS', 600))
+    app.config['JOBS_RETRY_BASE_SECONDS'] = float(os.environ.get('SPA_JOBS_RETRY_BASE', 5))
+    app.config['JOBS_RETRY_MAX_SECONDS'] = float(os.environ.get('SPA_JOBS_RETRY_MAX', 3600))
+    app.config['JOBS_MAX_ATTEMPTS'] = int(os.environ.get('SPA_JOBS_MAX_ATTEMPTS', 5))
+    app.config['JOBS_RETENTION_HOURS'] = int(os.environ.get('SPA_JOBS_RETENTION_HOURS', 72))
+
+    # Nhắc lịch hẹn: bật scheduler, sender ('log', 'file', 'stub' hoặc 'module:attr'), file của
+    # FileSender, nhắc trước giờ hẹn bao nhiêu phút (nhiều mốc cách nhau dấu phẩy), cửa sổ nạp
+    # booking (giờ), chu kỳ kiểm tra (giây), độ trễ tối đa còn gửi (phút), số ngày giữ reminder_log
+    app.config['REMINDERS_ENABLED'] = os.environ.get('SPA_REMINDERS', '1') == '1'
+    app.config['REMINDERS_SENDER'] = os.environ.get('SPA_REMINDERS_SENDER', 'log')
+    app.config['REMINDERS_FILE'] = os.environ.get('SPA_REMINDERS_FILE', 'reminders.jsonl')
+    app.config['REMINDERS_LEAD_MINUTES'] = os.environ.get('SPA_REMINDERS_LEAD_MINUTES', '1440,120')
+    app.config['REMINDERS_HORIZON_HOURS'] = int(os.environ.get('SPA_REMINDERS_HORIZON_HOURS', 48))
+    app.config['REMINDERS_POLL_INTERVAL'] = float(os.environ.get('SPA_REMINDERS_POLL_INTERVAL', 30))
+    app.config['REMINDERS_GRACE_MINUTES'] = int(os.environ.get('SPA_REMINDERS_GRACE_MINUTES', 15))
+    app.config['REMINDERS_LOG_RETENTION_DAYS'] = int(os.environ.get('SPA_REMINDERS_LOG_DAYS', 7))
+
     # Khởi tạo database với app
     db.init_app(app)
 
-    return app
\ No newline at end of file
+    return app
+
+
+def init_database(app):
+    """Tạo bảng và cài đặt mặc định - chỉ gọi một lần khi khởi động server"""
+    import models  # noqa: F401 - đăng ký các model với metadata
+    from datetime import datetime, timedelta
+    from dao import (init_default_settings, warm_directory, delete_tombstones_before, create_account_search_index,
+                     link_invoices_to_bookings, transaction)
+
+    with app.app_context():
+        db.create_all()
+        add_missing_columns()
+        with transaction():
+            link_invoices_to_bookings()
+            remove_unique_conflicts(app.logger)
+        create_missing_indexes()
+        create_account_search_index()
+        with transaction():
+            init_default_settings()
+            # Tính lại điểm tích lũy một lần cho dữ liệu có từ trước (job nền, loại trùng theo quy tắc)
+            from loyalty import schedule_initial_recompute
+            schedule_initial_recompute()
+            delete_tombstones_before(datetime.now() - timedelta(days=app.config['SYNC_TOMBSTONE_RETENTION_DAYS']))
+        # Nạp sẵn danh bạ tên khách hàng/nhân viên (worker kế thừa khi fork)
+        warm_directory()
+
+
+def add_missing_columns():
+    """Thêm các cột khai báo trong model nhưng chưa có trong bảng đã tồn tại
+
+    SQLite chỉ hỗ trợ ALTER TABLE ADD COLUMN; các dòng cũ được gán giá trị mặc định
+    của cột (vd. updatedAt = thời điểm nâng cấp).
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+
+                default = column.default
+                if default is not None and (default.is_scalar or default.is_callable):
+                    value = default.arg(None) if default.is_callable else default.arg
+                    conn.execute(table.update().where(column.is_(None)).values({column.name: value}))
+
+
+def remove_unique_conflicts(logger):
+    """Dọn dữ liệu trùng do kiểu check-then-insert cũ để tạo được unique index trên database cũ
+
+    Chỉ chạy khi index chưa có. Phiếu dịch vụ trùng booking bị xóa (giữ phiếu sửa gần nhất,
+    nội dung phiếu bị xóa được ghi log); hóa đơn trùng booking chỉ bị bỏ liên kết booking.
+    """
+    from sqlalchemy import inspect
+    from dao import delete_duplicate_service_forms, unlink_duplicate_invoices
+
+    inspector = inspect(db.session.connection())
+
+    def missing(table, index):
+        return inspector.has_table(table) and index not in {i['name'] for i in inspector.get_indexes(table)}
+
+    if missing('service_forms', 'uq_service_forms_bookingId'):
+        for form in delete_duplicate_service_forms():
+            logger.warning(
+                'Migration uq_service_forms_bookingId: xóa phiếu dịch vụ trùng booking %s: formId=%s, '
+                'employeeId=%s, serviceName=%s, serviceDuration=%s, servicePrice=%s, serviceNote=%s, createdAt=%s',
+                form.bookingId, form.formId, form.employeeId, form.serviceName, form.serviceDuration,
+                form.servicePrice, form.serviceNote, form.createdAt
+            )
+
+    if missing('invoices', 'uq_invoices_bookingId'):
+        for invoice in unlink_duplicate_invoices():
+            logger.warning(
+                'Migration uq_invoices_bookingId: hóa đơn %s bỏ liên kết booking %s (booking đã có hóa đơn khác)',
+                invoice.invoiceId, invoice.bookingId
+            )
+
+
+# Index không còn khai báo trong model (đã được thay thế), xóa khỏi database cũ
+OBSOLETE_INDEXES = ('ix_accounts_fullName_nocase', 'ix_accounts_phone_nocase')
+
+
+def create_missing_indexes():
+    """Tạo các index khai báo trong model nhưng chưa có trong database đã tồn tại"""
+    from sqlalchemy import text
+
+    with db.engine.begin() as conn:
+        for name in OBSOLETE_INDEXES:
+            conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
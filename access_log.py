@@ -0,0 +1,158 @@
+# access_log.py
+"""
+Access log / activity log dạng JSON, ghi bất đồng bộ.
+
+Request thread chỉ đưa bản ghi vào một hàng đợi có giới hạn (put_nowait);
+việc format JSON và ghi ra stdout do một thread nền (QueueListener) đảm nhận.
+Khi hàng đợi đầy, bản ghi bị bỏ qua và bộ đếm `dropped` tăng lên - log không
+bao giờ làm chậm request, kể cả khi stdout chậm.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+access_logger = logging.getLogger('spa.access')
+activity_logger = logging.getLogger('spa.activity')
+slow_query_logger = logging.getLogger('spa.slow_query')
+
+
+class JsonFormatter(logging.Formatter):
+    """Format bản ghi thành một dòng JSON"""
+
+    def format(self, record):
+        if isinstance(record.msg, dict):
+            payload = dict(record.msg)
+        else:
+            payload = {'message': record.getMessage()}
+        payload.setdefault('timestamp', datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'))
+        payload.setdefault('logger', record.name)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler không bao giờ block: hàng đợi đầy thì bỏ bản ghi và đếm"""
+
+    def __init__(self, maxsize, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.stream = stream
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._listener = None
+        self._pid = None
+
+    def _ensure_listener(self):
+        # Thread không sống sót qua fork: mỗi worker gunicorn tự khởi động listener riêng
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.maxsize)
+            output = logging.StreamHandler(self.stream or sys.stdout)
+            output.setFormatter(JsonFormatter())
+            self._listener = QueueListener(self.queue, output)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Không format trên request thread - JsonFormatter chạy ở thread nền
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def stop(self):
+        """Dừng thread nền sau khi ghi hết hàng đợi"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+
+
+_handler = None
+
+
+def get_log_stats():
+    """Thống kê hàng đợi log"""
+    if _handler is None:
+        return {'enabled': False}
+    return {
+        'enabled': True,
+        'queued': _handler.queue.qsize(),
+        'queueSize': _handler.maxsize,
+        'dropped': _handler.dropped
+    }
+
+
+def current_account():
+    """Username gửi kèm request (adminUsername hoặc username), nếu có"""
+    username = request.args.get('adminUsername') or request.args.get('username')
+    if not username and request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            username = data.get('adminUsername') or data.get('username')
+    return username
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    """Đếm số câu SQL của request hiện tại"""
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def init_access_log(app):
+    """Gắn access log JSON vào app"""
+    global _handler
+
+    if _handler is None:
+        _handler = DroppingQueueHandler(app.config['ACCESS_LOG_QUEUE_SIZE'])
+        for logger in (access_logger, activity_logger, slow_query_logger):
+            logger.setLevel(logging.INFO)
+            logger.addHandler(_handler)
+            logger.propagate = False
+        atexit.register(_handler.stop)
+
+    if not app.config['ACCESS_LOG_ENABLED']:
+        return _handler
+
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+        g.query_count = 0
+
+    @app.after_request
+    def _write_access_log(response):
+        start = g.get('request_start')
+        if start is None:
+            return response
+
+        access_logger.info({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'durationMs': round((time.perf_counter() - start) * 1000, 2),
+            'queries': g.get('query_count', 0),
+            'account': current_account(),
+            'ip': request.remote_addr
+        })
+        return response
+
+    return _handler
@@ -3,11 +3,19 @@ from flask import redirect, url_for, request, flash
 from flask_admin import Admin, AdminIndexView, expose
 from flask_admin.contrib.sqla import ModelView
 from flask_admin.form import Select2Widget
+from sqlalchemy import or_, inspect
+from sqlalchemy.orm import joinedload, configure_mappers
 from werkzeug.security import check_password_hash
 from wtforms import SelectField, TextAreaField, PasswordField
-from wtforms.validators import DataRequired, Length, Email, Optional
+from wtforms.validators import DataRequired, Length, Email, Optional, ValidationError
 from __init__ import db
 from models import Customer, Service, Employee, Booking, Invoice, Account, Settings
+from loyalty import LoyaltyRules, LoyaltyError, accrue_points, schedule_recompute, parse_point_value, parse_tiers
+import dao
+
+# Backref (Customer.account, Booking.customer, ...) chỉ có sau khi configure mapper;
+# cần có trước khi khai báo column_select_related_list của các view
+configure_mappers()
 
 
 class SecureAdminIndexView(AdminIndexView):
@@ -21,37 +29,46 @@ class SecureAdminIndexView(AdminIndexView):
             flash('Vui lòng đăng nhập admin', 'error')
             return redirect('/login')
 
-        # Thống kê cơ bản
-        stats = {
-            'total_customers': Customer.query.filter_by(active=True).count(),
-            'total_services': Service.query.count(),
-            'total_employees': Employee.query.filter_by(active=True).count(),
-            'total_bookings': Booking.query.count(),
-            'pending_bookings': Booking.query.filter_by(status='Đang chờ').count(),
-            'total_invoices': Invoice.query.count()
-        }
+        # Thống kê cơ bản - một câu SQL, cache ngắn hạn
+        from dao import get_dashboard_stats
+        stats = get_dashboard_stats()
 
         return self.render('admin/index.html', stats=stats)
 
     def is_accessible(self):
-        # Kiểm tra quyền truy cập
+        # Kiểm tra quyền truy cập (kết quả được cache ngắn hạn theo username)
         admin_user = request.args.get('admin')
         if admin_user:
-            from dao import get_account_by_username
-            account = get_account_by_username(admin_user)
-            return account and account.role == 'Admin'
+            from dao import is_admin_account
+            return is_admin_account(admin_user)
         return False
 
 
 class SecureModelView(ModelView):
     """Base ModelView với bảo mật"""
 
+    # Tìm kiếm qua index FTS account_search (tên, điện thoại, email, username; khớp tiền tố,
+    # không dấu) thay cho LIKE '%...%' trên bảng nối: tên cột của accounts trùng với khóa
+    # của model ('customerId', 'employeeId', 'accountId'); None = tìm kiếm mặc định
+    account_search_key = None
+
+    def _apply_search(self, query, count_query, joins, count_joins, search):
+        if self.account_search_key is None:
+            return super()._apply_search(query, count_query, joins, count_joins, search)
+
+        key = getattr(self.model, self.account_search_key)
+        # Khớp chính xác mã (khóa chính) hoặc khớp FTS
+        condition = or_(key == search.strip(), key.in_(dao.search_account_keys(search, self.account_search_key)))
+        query = query.filter(condition)
+        if count_query is not None:
+            count_query = count_query.filter(condition)
+        return query, count_query, joins, count_joins
+
     def is_accessible(self):
         admin_user = request.args.get('admin')
         if admin_user:
-            from dao import get_account_by_username
-            account = get_account_by_username(admin_user)
-            return account and account.role == 'Admin'
+            from dao import is_admin_account
+            return is_admin_account(admin_user)
         return False
 
     def inaccessible_callback(self, name, **kwargs):
@@ -74,26 +91,30 @@ class CustomerAdmin(SecureModelView):
         'membershipLevel': 'Hạng thành viên'
     }
 
-    # Form tạo/sửa - chỉ các field trong Customer model
-    form_columns = ('customerId', 'loyaltyPoints', 'membershipLevel', 'active')
+    # Form tạo/sửa - chỉ các field trong Customer model; điểm/hạng chỉ đọc (được cộng dồn
+    # từ hóa đơn, sửa tay sẽ lệch với lịch sử hóa đơn)
+    form_columns = ('customerId', 'active')
     form_args = {
         'customerId': {'validators': [DataRequired()], 'render_kw': {'placeholder': 'Mã khách hàng'}},
-        'loyaltyPoints': {'validators': [Optional()], 'render_kw': {'placeholder': 'Điểm tích lũy'}},
-        'membershipLevel': {'validators': [Optional()], 'render_kw': {'placeholder': 'Hạng thành viên'}},
     }
 
     # Phân trang
     page_size = 20
 
+    column_select_related_list = (Customer.account,)
+    account_search_key = 'customerId'
+
     # Query chỉ lấy customer active
     def get_query(self):
-        return self.session.query(self.model).filter_by(active=True)
+        return super().get_query().filter_by(active=True)
+
+    def get_count_query(self):
+        return super().get_count_query().filter(Customer.active == True)
 
     def create_model(self, form):
         # Tạo mã khách hàng tự động nếu chưa có
         if not form.customerId.data:
-            import secrets
-            form.customerId.data = 'C' + secrets.token_hex(4).upper()
+            form.customerId.data = dao.generate_customer_id()
         return super().create_model(form)
 
 
@@ -133,8 +154,7 @@ class ServiceAdmin(SecureModelView):
     def create_model(self, form):
         # Tạo mã dịch vụ tự động theo format SVXXXXXXXX
         if not form.servicesId.data:
-            import secrets
-            form.servicesId.data = 'SV' + secrets.token_hex(4).upper()
+            form.servicesId.data = dao.generate_service_id()
         return super().create_model(form)
 
 
@@ -143,7 +163,7 @@ class EmployeeAdmin(SecureModelView):
 
     # Cột hiển thị - sử dụng relationship với account
     column_list = ('employeeId', 'account.fullName', 'position', 'department', 'account.phone', 'account.email')
-    column_searchable_list = ('employeeId', 'account.fullName', 'position')
+    column_searchable_list = ('employeeId', 'account.fullName', 'account.phone')
     column_filters = ('position', 'department', 'active')
     column_labels = {
         'employeeId': 'Mã NV',
@@ -162,14 +182,19 @@ class EmployeeAdmin(SecureModelView):
         'department': {'validators': [DataRequired()]},
     }
 
+    column_select_related_list = (Employee.account,)
+    account_search_key = 'employeeId'
+
     # Query chỉ lấy employee active
     def get_query(self):
-        return self.session.query(self.model).filter_by(active=True)
+        return super().get_query().filter_by(active=True)
+
+    def get_count_query(self):
+        return super().get_count_query().filter(Employee.active == True)
 
     def create_model(self, form):
         if not form.employeeId.data:
-            import secrets
-            form.employeeId.data = 'E' + secrets.token_hex(4).upper()
+            form.employeeId.data = dao.generate_employee_id()
         return super().create_model(form)
 
 
@@ -214,6 +239,15 @@ class BookingAdmin(SecureModelView):
     # Sắp xếp mặc định
     column_default_sort = ('time', True)  # True = DESC
 
+    column_select_related_list = (Booking.service,)
+
+    def get_query(self):
+        # Tên khách hàng/nhân viên nằm ở accounts: load cả hai bước nối trong câu query danh sách
+        return super().get_query().options(
+            joinedload(Booking.customer).joinedload(Customer.account),
+            joinedload(Booking.employee).joinedload(Employee.account)
+        )
+
 
 class InvoiceAdmin(SecureModelView):
     """Quản lý hóa đơn"""
@@ -238,10 +272,19 @@ class InvoiceAdmin(SecureModelView):
         'finalTotal': lambda v, c, m, p: f"{m.finalTotal:,.0f}đ"
     }
 
+    def get_query(self):
+        # Tên khách hàng nằm ở accounts: load cả hai bước nối trong câu query danh sách
+        return super().get_query().options(joinedload(Invoice.customer).joinedload(Customer.account))
+
     # Chỉ cho phép xem và xóa, không cho phép tạo/sửa
     can_create = False
     can_edit = False
 
+    def on_model_delete(self, model):
+        # Trừ lại điểm đã tích từ hóa đơn (cùng transaction với việc xóa)
+        loyalty = LoyaltyRules.load()
+        accrue_points(loyalty, [(model.customerId, -loyalty.points(model.finalTotal))])
+
 
 class AccountAdmin(SecureModelView):
     """Quản lý tài khoản"""
@@ -262,6 +305,8 @@ class AccountAdmin(SecureModelView):
     # Ẩn cột password
     column_exclude_list = ('passwordHash',)
 
+    account_search_key = 'accountId'
+
     form_columns = ('accountId', 'username', 'role', 'fullName', 'phone', 'email')
 
     form_overrides = {
@@ -287,6 +332,18 @@ class AccountAdmin(SecureModelView):
     # Không cho phép tạo account từ admin (dùng API register)
     can_create = False
 
+    # Đổi role/username hoặc xóa tài khoản phải xóa cache quyền admin và cập nhật danh bạ.
+    # Các hook này chạy trước khi Flask-Admin commit, nên cache được cập nhật khi commit
+    def on_model_change(self, form, model, is_created):
+        old_usernames = inspect(model).attrs.username.history.deleted
+        for username in {*old_usernames, model.username}:
+            dao.invalidate_admin_check(username)
+        dao.remember_account(model)
+
+    def on_model_delete(self, model):
+        dao.invalidate_admin_check(model.username)
+        dao.forget_party(model.customerId, model.employeeId)
+
 
 class SettingsAdmin(SecureModelView):
     """Quản lý cài đặt hệ thống"""
@@ -304,6 +361,22 @@ class SettingsAdmin(SecureModelView):
     # Không cho phép xóa settings
     can_delete = False
 
+    def on_model_change(self, form, model, is_created):
+        # Quy tắc tích điểm không hợp lệ làm hỏng mọi API hóa đơn: kiểm tra như API cài đặt
+        try:
+            if model.settingId == 'loyalty_point_value':
+                parse_point_value(model.value)
+            elif model.settingId == 'loyalty_tiers':
+                parse_tiers(model.value)
+            else:
+                return
+        except LoyaltyError as e:
+            raise ValidationError(str(e))
+
+        # Đổi quy tắc: tính lại điểm/hạng của mọi khách hàng ở job nền
+        self.session.flush()
+        schedule_recompute(LoyaltyRules.load())
+
 
 def init_admin(app):
     """Khởi tạo Flask-Admin"""
@@ -325,62 +398,3 @@ def init_admin(app):
     admin.add_view(SettingsAdmin(Settings, db.session, name='Cài đặt'))
 
     return admin
-
-
-# Tạo custom templates (tùy chọn)
-def create_admin_templates():
-    """Tạo templates tùy chỉnh cho admin"""
-
-    # admin/index.html
-    index_template = """
-    {% extends 'admin/master.html' %}
-
-    {% block body %}
-    <div class="row">
-        <div class="col-md-12">
-            <h1>OU Spa - Admin Dashboard</h1>
-            <p>Chào mừng đến trang quản trị OU Spa</p>
-        </div>
-    </div>
-
-    <div class="row">
-        <div class="col-md-3">
-            <div class="panel panel-info">
-                <div class="panel-heading">Khách hàng</div>
-                <div class="panel-body text-center">
-                    <h2>{{ stats.total_customers }}</h2>
-                </div>
-            </div>
-        </div>
-        <div class="col-md-3">
-            <div class="panel panel-success">
-                <div class="panel-heading">Dịch vụ</div>
-                <div class="panel-body text-center">
-                    <h2>{{ stats.total_services }}</h2>
-                </div>
-            </div>
-        </div>
-        <div class="col-md-3">
-            <div class="panel panel-warning">
-                <div class="panel-heading">Nhân viên</div>
-                <div class="panel-body text-center">
-                    <h2>{{ stats.total_employees }}</h2>
-                </div>
-            </div>
-        </div>
-        <div class="col-md-3">
-            <div class="panel panel-primary">
-                <div class="panel-heading">Booking</div>
-                <div class="panel-body text-center">
-                    <h2>{{ stats.total_bookings }}</h2>
-                    <small>{{ stats.pending_bookings }} đang chờ</small>
-                </div>
-            </div>
-        </div>
-    </div>
-    {% endblock %}
-    """
-
-    return {
-        'admin/index.html': index_template
-    }
@@ -1,22 +1,50 @@
 # app.py
-from flask import request, jsonify
+from flask import request, jsonify, Response
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import re
-import secrets
 
-from __init__ import create_app, db
-from models import Service, Customer, Employee, Booking, Account, Settings
+from __init__ import create_app, db, init_database
+from models import Booking, Account
 import dao
-from dao import *
-from decorator import admin_required, validate_json, handle_errors, cors_enabled, rate_limit
-from admin import init_admin
+import serializers
+from decorator import admin_required, validate_json, handle_errors, cors_enabled, rate_limit, etag_cached, transactional
+from lazy_admin import init_admin_lazy
+from access_log import init_access_log, get_log_stats
+from slow_query import init_slow_query_log, get_slow_queries
+from compression import init_compression
+from batch import run_batch, BatchError
+from events import init_events, stream_booking_events, TooManySubscribers, RETRY_MS
+from jobs import init_jobs
+from reminders import init_reminders
+from sync import SyncRequest
+from pagination import PageRequest
+from pricing import PricingSettings, PricingError, service_price, price_bookings
+from loyalty import LoyaltyRules, LoyaltyError, accrue_points, schedule_recompute, parse_point_value, parse_tiers
 
 # Tạo Flask app
 app = create_app()
 
-# Khởi tạo Flask-Admin
-admin = init_admin(app)
+# Access log JSON ghi bất đồng bộ
+init_access_log(app)
+
+# Ghi lại các câu SQL chậm
+init_slow_query_log(app)
+
+# Nén gzip/brotli cho response JSON
+init_compression(app)
+
+# Hub sự kiện booking cho SSE
+event_hub = init_events(app)
+
+# Job nền (hàng đợi bền vững trong bảng jobs)
+job_runner = init_jobs(app)
+
+# Nhắc lịch hẹn (gửi qua job nền)
+reminder_scheduler = init_reminders(app)
+
+# Khởi tạo Flask-Admin (lazy - chỉ import khi truy cập /admin/ lần đầu)
+admin = init_admin_lazy(app)
 
 
 # Cấu hình CORS
@@ -45,6 +73,7 @@ def handle_cors(path):
 @validate_json(['username', 'password', 'name', 'phone'])
 @handle_errors
 @rate_limit(max_requests=10, per_minutes=1)
+@transactional
 def register():
     """Đăng ký tài khoản mới"""
     data = request.get_json()
@@ -57,10 +86,6 @@ def register():
             'message': 'Số điện thoại không hợp lệ (chỉ gồm 9–11 chữ số)'
         }), 400
 
-    # Kiểm tra username đã tồn tại
-    if dao.get_account_by_username(data['username']):
-        return jsonify({'success': False, 'message': 'Username đã tồn tại'}), 400
-
     # Kiểm tra độ dài password (tối thiểu 6 ký tự)
     if len(data['password']) < 6:
         return jsonify({'success': False, 'message': 'Password phải có ít nhất 6 ký tự'}), 400
@@ -68,9 +93,7 @@ def register():
     # Tạo Customer mới
     customer_id = dao.generate_customer_id()
     customer_data = {
-        'customerId': customer_id,
-        'loyaltyPoints': 0,
-        'membershipLevel': 'Basic'
+        'customerId': customer_id
     }
     customer = dao.create_customer(customer_data)
 
@@ -126,6 +149,7 @@ def login():
 @app.route('/api/auth/change-password', methods=['PUT'])
 @validate_json(['username', 'oldPassword', 'newPassword'])
 @handle_errors
+@transactional
 def change_password():
     """Đổi mật khẩu"""
     data = request.get_json()
@@ -178,6 +202,7 @@ def get_profile():
 @admin_required
 @validate_json(['username', 'newRole'])
 @handle_errors
+@transactional
 def change_role():
     """Đổi role tài khoản - chỉ admin"""
     data = request.get_json()
@@ -205,6 +230,8 @@ def change_role():
     backup_email = target_account.email or data.get('email', '')
 
     # Soft delete records cũ
+    old_customer_id = target_account.customerId
+    old_employee_id = target_account.employeeId
     if target_account.customer:
         target_account.customer.active = False
     if target_account.employee:
@@ -217,9 +244,7 @@ def change_role():
     if new_role == 'Customer':
         # Tạo Customer record mới
         customer_data = {
-            'customerId': dao.generate_customer_id(),
-            'loyaltyPoints': 0,
-            'membershipLevel': 'Basic'
+            'customerId': dao.generate_customer_id()
         }
         customer = dao.create_customer(customer_data)
         target_account.customerId = customer.customerId
@@ -240,7 +265,9 @@ def change_role():
     target_account.phone = backup_phone
     target_account.email = backup_email
 
-    db.session.commit()
+    dao.invalidate_admin_check(target_account.username)
+    dao.forget_party(old_customer_id, old_employee_id)
+    dao.remember_account(target_account)
 
     return jsonify({
         'success': True,
@@ -259,14 +286,15 @@ def change_role():
 def get_all_accounts():
     """Lấy danh sách tất cả tài khoản - chỉ admin"""
     try:
-        accounts = dao.get_all_accounts()
+        sync = SyncRequest()
+        accounts = dao.get_all_accounts(sync.since)
         data = []
 
         for acc in accounts:
             account_info = dao.get_account_info_by_role(acc)
             data.append(account_info)
 
-        return jsonify({'success': True, 'data': data}), 200
+        return jsonify(sync.payload(data, 'accounts')), 200
 
     except Exception as e:
         return jsonify({'success': False, 'message': f'Có lỗi xảy ra: {str(e)}'}), 500
@@ -276,6 +304,7 @@ def get_all_accounts():
 @app.route('/api/auth/accounts/<account_id>', methods=['PUT'])
 @admin_required
 @handle_errors
+@transactional
 def update_account(account_id):
     """Cập nhật thông tin tài khoản - chỉ admin"""
     data = request.get_json()
@@ -300,7 +329,7 @@ def update_account(account_id):
     if 'email' in data:
         account.email = data['email']
 
-    db.session.commit()
+    dao.remember_account(account)
 
     return jsonify({
         'success': True,
@@ -313,6 +342,7 @@ def update_account(account_id):
 @app.route('/api/auth/accounts/<account_id>', methods=['DELETE'])
 @admin_required
 @handle_errors
+@transactional
 def delete_account(account_id):
     """Xóa tài khoản - chỉ admin"""
     # Tìm tài khoản theo ID
@@ -336,8 +366,11 @@ def delete_account(account_id):
         account.employee.active = False
 
     # Xóa account
+    username = account.username
+    customer_id, employee_id = account.customerId, account.employeeId
     db.session.delete(account)
-    db.session.commit()
+    dao.invalidate_admin_check(username)
+    dao.forget_party(customer_id, employee_id)
 
     return jsonify({
         'success': True,
@@ -349,6 +382,7 @@ def delete_account(account_id):
 
 @app.route('/api/customers', methods=['POST'])
 @handle_errors
+@transactional
 def create_customer():
     """Tạo khách hàng mới"""
     data = request.get_json()
@@ -359,33 +393,27 @@ def create_customer():
 @app.route('/api/customers', methods=['GET'])
 @handle_errors
 def get_customers():
-    """Lấy danh sách khách hàng active"""
-    customers = dao.get_all_customers()
-    data = []
-    for c in customers:
-        customer_info = {
-            'customerId': c.customerId,
-            'loyaltyPoints': c.loyaltyPoints,
-            'membershipLevel': c.membershipLevel
-        }
+    """Lấy danh sách khách hàng active theo trang
 
-        # Tìm account tương ứng với customer này
-        account = Account.query.filter_by(customerId=c.customerId).first()
-        if account:
-            customer_info.update({
-                'name': account.fullName or '',
-                'phone': account.phone or '',
-                'email': account.email or ''
-            })
-        else:
-            customer_info.update({
-                'name': 'N/A',
-                'phone': '',
-                'email': ''
-            })
-
-        data.append(customer_info)
-    return jsonify({'success': True, 'data': data}), 200
+    ?limit=, ?cursor= (nextCursor của trang trước), ?sort=name|loyaltyPoints|createdAt,
+    ?order=asc|desc, ?membershipLevel=
+    """
+    page = PageRequest(dao.CUSTOMER_SORTS, 'name')
+    rows = dao.get_customer_page(page, membership_level=request.args.get('membershipLevel'))
+    return jsonify(page.payload(rows, serializers.CUSTOMER_DIRECTORY_ITEM)), 200
+
+
+@app.route('/api/customers/search', methods=['GET'])
+@handle_errors
+def search_customers():
+    """Tìm khách hàng theo tên/số điện thoại/email/username (?q=, ?limit=, tối đa 50)"""
+    q = request.args.get('q', '').strip()
+    limit = max(1, min(int(request.args.get('limit', 20)), 50))
+    if not q:
+        return jsonify({'success': True, 'data': []}), 200
+
+    rows = dao.search_customers(q, limit)
+    return jsonify({'success': True, 'data': serializers.CUSTOMER_SEARCH_RESULT.many(rows)}), 200
 
 
 @app.route('/api/customers/<customerId>', methods=['GET'])
@@ -422,6 +450,7 @@ def get_customer(customerId):
 
 @app.route('/api/customers/<customerId>', methods=['PUT'])
 @handle_errors
+@transactional
 def update_customer(customerId):
     """Cập nhật thông tin khách hàng"""
     customer = dao.get_customer_by_id(customerId)
@@ -436,6 +465,7 @@ def update_customer(customerId):
 
 @app.route('/api/customers/<customerId>', methods=['DELETE'])
 @handle_errors
+@transactional
 def delete_customer_api(customerId):
     """Xóa khách hàng"""
     customer = dao.get_customer_by_id(customerId)
@@ -453,6 +483,7 @@ def delete_customer_api(customerId):
 
 @app.route('/api/employees', methods=['POST'])
 @handle_errors
+@transactional
 def create_employee():
     """Tạo nhân viên mới"""
     data = request.get_json()
@@ -462,34 +493,20 @@ def create_employee():
 
 @app.route('/api/employees', methods=['GET'])
 @handle_errors
+@etag_cached('employees', 'accounts')
 def get_employees():
-    """Lấy danh sách nhân viên active (không bao gồm cashier)"""
-    employees = dao.get_all_employees()
-    data = []
-    for e in employees:
-        employee_info = {
-            'employeeId': e.employeeId,
-            'position': e.position,
-            'department': e.department
-        }
+    """Lấy danh sách nhân viên active (không bao gồm cashier) theo trang
 
-        # Tìm account tương ứng với employee này
-        account = Account.query.filter_by(employeeId=e.employeeId).first()
-        if account:
-            employee_info.update({
-                'name': account.fullName or '',
-                'phone': account.phone or '',
-                'email': account.email or ''
-            })
-        else:
-            employee_info.update({
-                'name': 'N/A',
-                'phone': '',
-                'email': ''
-            })
-
-        data.append(employee_info)
-    return jsonify({'success': True, 'data': data}), 200
+    ?limit=, ?cursor= (nextCursor của trang trước), ?sort=name|createdAt,
+    ?order=asc|desc, ?position=, ?department=
+    """
+    page = PageRequest(dao.EMPLOYEE_SORTS, 'name')
+    rows = dao.get_employee_page(
+        page,
+        position=request.args.get('position'),
+        department=request.args.get('department')
+    )
+    return jsonify(page.payload(rows, serializers.EMPLOYEE_DIRECTORY_ITEM)), 200
 
 
 @app.route('/api/employees/<employeeId>', methods=['GET'])
@@ -524,8 +541,23 @@ def get_employee(employeeId):
     return jsonify({'success': True, 'data': employee_info}), 200
 
 
+@app.route('/api/employees/<employeeId>/worklist', methods=['GET'])
+@handle_errors
+def get_employee_worklist(employeeId):
+    """Lịch làm việc của nhân viên (từ đầu ngày hôm nay hoặc ?from=YYYY-MM-DD) kèm trạng thái phiếu dịch vụ"""
+    since = request.args.get('from')
+    if since:
+        since = datetime.fromisoformat(since)
+    else:
+        since = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    rows = dao.get_employee_worklist(employeeId, since)
+    return jsonify({'success': True, 'data': serializers.WORKLIST_ITEM.many(rows)}), 200
+
+
 @app.route('/api/employees/<employeeId>', methods=['PUT'])
 @handle_errors
+@transactional
 def update_employee(employeeId):
     """Cập nhật thông tin nhân viên"""
     employee = dao.get_employee_by_id(employeeId)
@@ -540,6 +572,7 @@ def update_employee(employeeId):
 
 @app.route('/api/employees/<employeeId>', methods=['DELETE'])
 @handle_errors
+@transactional
 def delete_employee_api(employeeId):
     """Xóa nhân viên"""
     employee = dao.get_employee_by_id(employeeId)
@@ -559,7 +592,7 @@ def delete_employee_api(employeeId):
 @cors_enabled
 def generate_service_id():
     """Tạo mã dịch vụ tự động"""
-    service_id = 'SV' + secrets.token_hex(4).upper()
+    service_id = dao.generate_service_id()
     return jsonify({'success': True, 'servicesId': service_id}), 200
 
 
@@ -567,16 +600,14 @@ def generate_service_id():
 @validate_json(['name', 'durration', 'price'])
 @handle_errors
 @cors_enabled
+@transactional
 def create_service():
     """Tạo dịch vụ mới"""
     data = request.get_json()
 
-    # Tạo mã dịch vụ tự động nếu không có
+    # Tạo mã dịch vụ tự động nếu không có (mã do client gửi bị trùng -> lỗi khóa chính khi insert)
     if not data.get('servicesId'):
-        data['servicesId'] = 'SV' + secrets.token_hex(4).upper()
-
-    if dao.get_service_by_id(data['servicesId']):
-        return jsonify({'success': False, 'message': 'Mã dịch vụ đã tồn tại'}), 400
+        data['servicesId'] = dao.generate_service_id()
 
     d = int(data['durration'])
     if d < 15 or d > 120:
@@ -589,17 +620,13 @@ def create_service():
 @app.route('/api/services', methods=['GET'])
 @cors_enabled
 @handle_errors
+@etag_cached('services')
 def get_services():
-    """Lấy danh sách dịch vụ"""
-    services = dao.get_all_services()
-    data = [{
-        'servicesId': s.servicesId,
-        'name': s.name,
-        'durration': s.durration,
-        'price': float(s.price) if s.price is not None else 0.0,
-        'note': s.note
-    } for s in services]
-    return jsonify({'success': True, 'data': data}), 200
+    """Lấy danh sách dịch vụ (?since= để chỉ lấy thay đổi)"""
+    sync = SyncRequest()
+    services = dao.get_all_services(sync.since)
+    data = serializers.SERVICE.many(services)
+    return jsonify(sync.payload(data, 'services')), 200
 
 
 @app.route('/api/services/<servicesId>', methods=['GET'])
@@ -609,17 +636,12 @@ def get_service(servicesId):
     service = dao.get_service_by_id(servicesId)
     if not service:
         return jsonify({'success': False, 'message': 'Không tìm thấy dịch vụ'}), 404
-    return jsonify({'success': True, 'data': {
-        'servicesId': service.servicesId,
-        'name': service.name,
-        'durration': service.durration,
-        'price': float(service.price) if service.price is not None else 0.0,
-        'note': service.note
-    }}), 200
+    return jsonify({'success': True, 'data': serializers.SERVICE(service)}), 200
 
 
 @app.route('/api/services/<servicesId>', methods=['PUT'])
 @handle_errors
+@transactional
 def update_service(servicesId):
     """Cập nhật thông tin dịch vụ"""
     service = dao.get_service_by_id(servicesId)
@@ -638,6 +660,7 @@ def update_service(servicesId):
 
 @app.route('/api/services/<servicesId>', methods=['DELETE'])
 @handle_errors
+@transactional
 def delete_service(servicesId):
     """Xóa dịch vụ"""
     service = dao.get_service_by_id(servicesId)
@@ -655,6 +678,7 @@ def delete_service(servicesId):
 
 @app.route('/api/bookings', methods=['POST'])
 @handle_errors
+@transactional
 def create_booking():
     """Tạo booking mới"""
     data = request.get_json()
@@ -683,39 +707,22 @@ def create_booking():
     if dao.check_customer_booking_conflicts(customer.customerId, booking_time, service.durration):
         return jsonify({'success': False, 'message': "Khách hàng đã có lịch trùng"}), 400
 
-    # Tạo booking
-    dao.create_booking(data)
-    return jsonify({'success': True, 'message': "Tạo lịch thành công"}), 201
+    # Tạo booking (mã do server sinh nếu client không gửi)
+    if not data.get('bookingId'):
+        data['bookingId'] = dao.generate_booking_id()
+
+    booking = dao.create_booking(data)
+    return jsonify({'success': True, 'message': "Tạo lịch thành công", 'data': {'bookingId': booking.bookingId}}), 201
 
 
 @app.route('/api/bookings', methods=['GET'])
 @handle_errors
 def get_bookings():
-    """Lấy danh sách booking với thông tin từ account"""
-    bookings = dao.get_all_bookings()
-    data = []
-    for b in bookings:
-        # Tìm account cho customer và employee
-        customer_account = Account.query.filter_by(customerId=b.customerId).first()
-        employee_account = Account.query.filter_by(employeeId=b.employeeId).first()
-
-        customer_name = customer_account.fullName if customer_account else 'N/A'
-        employee_name = employee_account.fullName if employee_account else 'N/A'
-
-        data.append({
-            'bookingId': b.bookingId,
-            'time': b.time.isoformat(),
-            'status': b.status,
-            'customer': {'customerId': b.customerId, 'name': customer_name},
-            'service': {
-                'servicesId': b.servicesId,
-                'name': b.service.name,
-                'price': float(b.service.price) if b.service.price is not None else 0.0,
-                'durration': b.service.durration
-            },
-            'employee': {'employeeId': b.employeeId, 'name': employee_name}
-        })
-    return jsonify({'success': True, 'data': data}), 200
+    """Lấy danh sách booking với thông tin từ account (?since= để chỉ lấy thay đổi)"""
+    sync = SyncRequest()
+    bookings = dao.get_all_bookings(sync.since)
+    data = serializers.BOOKING.many(bookings)
+    return jsonify(sync.payload(data, 'bookings')), 200
 
 
 @app.route('/api/bookings/<bookingId>', methods=['GET'])
@@ -726,30 +733,12 @@ def get_booking(bookingId):
     if not b:
         return jsonify({'success': False, 'message': 'Không tìm thấy lịch'}), 404
 
-    # Tìm account cho customer và employee
-    customer_account = Account.query.filter_by(customerId=b.customerId).first()
-    employee_account = Account.query.filter_by(employeeId=b.employeeId).first()
-
-    customer_name = customer_account.fullName if customer_account else 'N/A'
-    employee_name = employee_account.fullName if employee_account else 'N/A'
-
-    return jsonify({'success': True, 'data': {
-        'bookingId': b.bookingId,
-        'time': b.time.isoformat(),
-        'status': b.status,
-        'customer': {'customerId': b.customerId, 'name': customer_name},
-        'service': {
-            'servicesId': b.servicesId,
-            'name': b.service.name,
-            'price': float(b.service.price) if b.service.price is not None else 0.0,
-            'durration': b.service.durration
-        },
-        'employee': {'employeeId': b.employeeId, 'name': employee_name}
-    }}), 200
+    return jsonify({'success': True, 'data': serializers.BOOKING(b)}), 200
 
 
 @app.route('/api/bookings/<bookingId>', methods=['PUT'])
 @handle_errors
+@transactional
 def update_booking(bookingId):
     """Cập nhật booking"""
     booking = dao.get_booking_by_id(bookingId)
@@ -763,6 +752,7 @@ def update_booking(bookingId):
 
 @app.route('/api/bookings/<bookingId>', methods=['DELETE'])
 @handle_errors
+@transactional
 def delete_booking(bookingId):
     """Xóa booking"""
     booking = dao.get_booking_by_id(bookingId)
@@ -773,8 +763,51 @@ def delete_booking(bookingId):
     return jsonify({'success': True, 'message': "Xóa lịch thành công"}), 200
 
 
+@app.route('/api/events/bookings', methods=['GET'])
+@handle_errors
+def booking_events():
+    """SSE: sự kiện booking (created, status_changed, invoiced, updated, deleted)
+
+    Client kết nối lại gửi Last-Event-ID (EventSource tự gửi) hoặc ?lastEventId=
+    để nhận tiếp các sự kiện bị lỡ.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    last_event_id = int(last_event_id) if last_event_id else None
+
+    try:
+        stream = stream_booking_events(event_hub, last_event_id, app.config['EVENTS_HEARTBEAT'])
+    except TooManySubscribers:
+        response = jsonify({'success': False, 'message': 'Quá nhiều kết nối theo dõi sự kiện'})
+        response.headers['Retry-After'] = str(RETRY_MS // 1000)
+        return response, 503
+
+    response = Response(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # INVOICE APIs
 
+def _booking_items(data, max_items, required=True):
+    """Danh sách {bookingId, discount} từ body {"items": [...]} hoặc {"bookingIds": [...]}"""
+    if 'items' in data:
+        items = data['items']
+    elif 'bookingIds' in data:
+        items = data['bookingIds']
+        items = [{'bookingId': booking_id} for booking_id in items] if isinstance(items, list) else items
+    elif required:
+        raise ValueError('Thiếu danh sách bookingIds hoặc items')
+    else:
+        return None
+
+    if not isinstance(items, list) or not all(isinstance(item, dict) and item.get('bookingId') for item in items):
+        raise ValueError('items phải là danh sách {bookingId, discount}')
+    if len(items) > max_items:
+        raise ValueError(f'Tối đa {max_items} booking trong một request')
+    return items
+
+
 @app.route('/api/invoices/preview', methods=['POST'])
 @handle_errors
 def preview_invoice():
@@ -790,51 +823,101 @@ def preview_invoice():
     if not service:
         return jsonify({'success': False, 'message': 'Không tìm thấy dịch vụ'}), 404
 
-    # Xử lý price
-    price = service.price
-    if price is None:
-        price = 0
-
+    pricing = PricingSettings.load()
     try:
-        total = float(price)
-    except (ValueError, TypeError):
-        total = 0.0
-
-    # Lấy cấu hình từ settings
-    vat_rate = float(dao.get_setting_value('vat_rate', '10'))
-    max_discount_rate = float(dao.get_setting_value('max_discount', '20'))
+        quote = pricing.quote(service_price(service), pricing.discount_percent(data.get('discount', 0)))
+    except PricingError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
 
-    discount_percent = float(data.get('discount', 0))
-    if discount_percent < 0 or discount_percent > max_discount_rate:
-        return jsonify({'success': False, 'message': f'Giảm giá tối đa {max_discount_rate}%'}), 400
+    # Lấy tên customer từ danh bạ
+    customer_name = dao.get_customer_name(booking.customerId)
 
-    # Tính toán
-    discount = total * discount_percent / 100
-    subtotal = total - discount
-    vat = subtotal * vat_rate / 100
-    finalTotal = subtotal + vat
+    return jsonify({
+        'success': True,
+        'data': {'serviceName': service.name, 'customerName': customer_name, **quote}
+    }), 200
 
-    # Lấy tên customer từ account
-    customer_account = Account.query.filter_by(customerId=booking.customerId).first()
-    customer_name = customer_account.fullName if customer_account else 'N/A'
 
+@app.route('/api/invoices/quote', methods=['POST'])
+@handle_errors
+def quote_invoices():
+    """Báo giá nhiều booking một lượt (không tạo hóa đơn)
+
+    Body: {"bookingIds": [...], "discount": 0} hoặc {"items": [{"bookingId", "discount"}]};
+    không gửi bookingIds/items thì báo giá toàn bộ hàng đợi thu ngân.
+    """
+    data = request.get_json(silent=True) or {}
+    items = _booking_items(data, app.config['QUOTE_MAX_ITEMS'], required=False)
+
+    pricing = PricingSettings.load()
+    rows = dao.get_bookings_for_quote([item['bookingId'] for item in items] if items is not None else None)
+    if items is None:
+        items = [{'bookingId': row.bookingId} for row in rows]
+
+    results, _priced, summary = price_bookings(
+        pricing, items, {row.bookingId: row for row in rows}, data.get('discount', 0)
+    )
     return jsonify({
         'success': True,
-        'data': {
-            'serviceName': service.name,
-            'customerName': customer_name,
-            'total': total,
-            'discount': discount,
-            'discountPercent': discount_percent,
-            'vat': vat,
-            'vatPercent': vat_rate,
-            'finalTotal': finalTotal
-        }
+        'data': {'settings': pricing.to_dict(), 'items': results, 'summary': summary}
     }), 200
 
 
+@app.route('/api/invoices/bulk', methods=['POST'])
+@handle_errors
+@transactional
+def create_invoices_bulk():
+    """Xuất hóa đơn cho nhiều booking trong một transaction
+
+    Body: {"bookingIds": [...], "discount": 0} hoặc {"items": [{"bookingId", "discount"}]},
+    "atomic": true để không tạo hóa đơn nào nếu có item lỗi.
+    Mã hóa đơn do server sinh; kết quả trả về theo từng item.
+    """
+    data = request.get_json(silent=True) or {}
+    items = _booking_items(data, app.config['INVOICE_BULK_MAX_ITEMS'])
+
+    pricing = PricingSettings.load()
+    rows = dao.get_bookings_for_quote([item['bookingId'] for item in items])
+    results, priced, summary = price_bookings(
+        pricing, items, {row.bookingId: row for row in rows}, data.get('discount', 0), for_invoice=True
+    )
+
+    failed = len(results) - len(priced)
+    if failed and data.get('atomic'):
+        return jsonify({
+            'success': False,
+            'message': f'{failed} booking không xuất được hóa đơn, không tạo hóa đơn nào',
+            'data': {'created': 0, 'failed': failed, 'items': results}
+        }), 400
+
+    invoices = []
+    for result, row in priced:
+        result['invoiceId'] = dao.generate_invoice_id()
+        invoices.append({
+            'invoiceId': result['invoiceId'],
+            'bookingId': row.bookingId,
+            'customerId': row.customerId,
+            'total': result['total'],
+            'vat': result['vat'],
+            'discount': result['discount'],
+            'finalTotal': result['finalTotal']
+        })
+    dao.create_invoices_bulk(invoices, rows)
+
+    # Tích điểm trong cùng transaction (một câu UPDATE cho mọi khách hàng)
+    loyalty = LoyaltyRules.load()
+    accrue_points(loyalty, [(invoice['customerId'], loyalty.points(invoice['finalTotal'])) for invoice in invoices])
+
+    return jsonify({
+        'success': True,
+        'message': f'Đã tạo {len(invoices)} hóa đơn',
+        'data': {'created': len(invoices), 'failed': failed, 'items': results, 'summary': summary}
+    }), 201 if invoices else 200
+
+
 @app.route('/api/invoices', methods=['POST'])
 @handle_errors
+@transactional
 def create_invoice():
     """Tạo hóa đơn thanh toán cho booking"""
     data = request.get_json()
@@ -843,61 +926,45 @@ def create_invoice():
     if not booking:
         return jsonify({'success': False, 'message': 'Không tìm thấy booking'}), 404
 
-    if booking.invoiceId:
-        return jsonify({'success': False, 'message': 'Booking đã có hóa đơn'}), 400
-
-    if dao.get_invoice_by_id(data['invoiceId']):
-        return jsonify({'success': False, 'message': 'Mã hóa đơn đã tồn tại'}), 400
+    # Mã hóa đơn luôn do server sinh (tăng theo thời gian, không trùng) - bỏ qua invoiceId
+    # client gửi; booking đã có hóa đơn -> ràng buộc unique của database báo lỗi khi insert
+    invoice_id = dao.generate_invoice_id()
 
     # Lấy service từ booking.service relationship
     service = booking.service
     if not service:
         return jsonify({'success': False, 'message': 'Không tìm thấy dịch vụ'}), 404
 
-    # Kiểm tra và xử lý price
-    price = service.price
-    if price is None:
-        price = 0
-
-    # Convert to float safely
-    try:
-        total = float(price)
-    except (ValueError, TypeError):
-        total = 0.0
+    total = service_price(service)
 
     # Nếu price vẫn bằng 0, báo lỗi
     if total <= 0:
         return jsonify({'success': False,
                         'message': f'Giá dịch vụ "{service.name}" chưa được thiết lập. Vui lòng cập nhật giá dịch vụ trong trang quản lý.'}), 400
 
-    # Lấy cấu hình từ settings
-    vat_rate = float(dao.get_setting_value('vat_rate', '10'))
-    max_discount_rate = float(dao.get_setting_value('max_discount', '20'))
-
-    discount_percent = float(data.get('discount', 0))
-    if discount_percent < 0 or discount_percent > max_discount_rate:
-        return jsonify({'success': False, 'message': f'Giảm giá tối đa {max_discount_rate}%'}), 400
-
-    # Tính toán
-    discount = total * discount_percent / 100
-    subtotal = total - discount
-    vat = subtotal * vat_rate / 100
-    finalTotal = subtotal + vat
+    pricing = PricingSettings.load()
+    try:
+        quote = pricing.quote(total, pricing.discount_percent(data.get('discount', 0)))
+    except PricingError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
 
     invoice_data = {
-        'invoiceId': data['invoiceId'],
+        'invoiceId': invoice_id,
         'customerId': booking.customerId,
-        'total': total,
-        'vat': vat,
-        'discount': discount,
-        'finalTotal': finalTotal
+        'total': quote['total'],
+        'vat': quote['vat'],
+        'discount': quote['discount'],
+        'finalTotal': quote['finalTotal']
     }
 
     invoice = dao.create_invoice(invoice_data, data['bookingId'])
 
-    # Lấy tên customer từ account
-    customer_account = Account.query.filter_by(customerId=booking.customerId).first()
-    customer_name = customer_account.fullName if customer_account else 'N/A'
+    # Tích điểm cho khách hàng trong cùng transaction với hóa đơn
+    loyalty = LoyaltyRules.load()
+    accrue_points(loyalty, [(booking.customerId, loyalty.points(quote['finalTotal']))])
+
+    # Lấy tên customer từ danh bạ
+    customer_name = dao.get_customer_name(booking.customerId)
 
     return jsonify({
         'success': True,
@@ -907,10 +974,10 @@ def create_invoice():
             'customerId': invoice.customerId,
             'customerName': customer_name,
             'serviceName': service.name,
-            'total': total,
-            'discount': discount,
-            'vat': vat,
-            'finalTotal': finalTotal
+            'total': quote['total'],
+            'discount': quote['discount'],
+            'vat': quote['vat'],
+            'finalTotal': quote['finalTotal']
         }
     }), 201
 
@@ -918,29 +985,12 @@ def create_invoice():
 @app.route('/api/invoices', methods=['GET'])
 @handle_errors
 def get_invoices():
-    """Lấy danh sách hóa đơn"""
-    invoices = dao.get_all_invoices()
-    data = []
-
-    for inv in invoices:
-        booking = inv.booking
+    """Lấy danh sách hóa đơn (?since= để chỉ lấy thay đổi)"""
+    sync = SyncRequest()
+    invoices = dao.get_all_invoices(sync.since)
+    data = serializers.INVOICE.many(invoices)
 
-        # Lấy customer name từ account
-        customer_account = Account.query.filter_by(customerId=inv.customerId).first()
-        customer_name = customer_account.fullName if customer_account else 'N/A'
-
-        data.append({
-            'invoiceId': inv.invoiceId,
-            'customerId': inv.customerId,
-            'customerName': customer_name,
-            'serviceName': booking.service.name if booking else '',
-            'total': inv.total,
-            'discount': inv.discount,
-            'vat': inv.vat,
-            'finalTotal': inv.finalTotal
-        })
-
-    return jsonify({'success': True, 'data': data}), 200
+    return jsonify(sync.payload(data, 'invoices')), 200
 
 
 @app.route('/api/invoices/<invoiceId>', methods=['GET'])
@@ -953,13 +1003,12 @@ def get_invoice(invoiceId):
 
     booking = invoice.booking
 
-    # Lấy thông tin customer và employee từ account
-    customer_account = Account.query.filter_by(customerId=invoice.customerId).first()
-    employee_account = Account.query.filter_by(employeeId=booking.employeeId).first() if booking else None
+    # Lấy thông tin customer và employee từ danh bạ
+    customer_contact = dao.get_customer_contact(invoice.customerId)
+    employee_name = dao.get_employee_name(booking.employeeId) if booking else 'N/A'
 
-    customer_name = customer_account.fullName if customer_account else 'N/A'
-    customer_phone = customer_account.phone if customer_account else 'N/A'
-    employee_name = employee_account.fullName if employee_account else 'N/A'
+    customer_name = customer_contact['name'] if customer_contact else 'N/A'
+    customer_phone = customer_contact['phone'] if customer_contact else 'N/A'
 
     return jsonify({
         'success': True,
@@ -982,6 +1031,7 @@ def get_invoice(invoiceId):
 
 @app.route('/api/invoices/<invoiceId>', methods=['PUT'])
 @handle_errors
+@transactional
 def update_invoice(invoiceId):
     """Cập nhật hóa đơn"""
     invoice = dao.get_invoice_by_id(invoiceId)
@@ -994,70 +1044,84 @@ def update_invoice(invoiceId):
     if not booking:
         return jsonify({'success': False, 'message': 'Không tìm thấy booking liên quan'}), 404
 
-    service = dao.get_service_by_id(booking.servicesId)
+    service = booking.service
     if not service:
         return jsonify({'success': False, 'message': 'Không tìm thấy dịch vụ'}), 404
 
-    total = float(service.price)
-
-    vat_rate = float(dao.get_setting_value('vat_rate', '10'))
-    max_discount_rate = float(dao.get_setting_value('max_discount', '20'))
-
-    discount_percent = float(data.get('discount', 0))
-    if discount_percent < 0 or discount_percent > max_discount_rate:
-        return jsonify({'success': False, 'message': f'Giảm giá tối đa {max_discount_rate}%'}), 400
-
-    discount = total * discount_percent / 100
-    subtotal = total - discount
-    vat = subtotal * vat_rate / 100
-    finalTotal = subtotal + vat
+    pricing = PricingSettings.load()
+    try:
+        quote = pricing.quote(service_price(service), pricing.discount_percent(data.get('discount', 0)))
+    except PricingError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
 
     invoice_data = {
-        'total': total,
-        'discount': discount,
-        'vat': vat,
-        'finalTotal': finalTotal
+        'total': quote['total'],
+        'discount': quote['discount'],
+        'vat': quote['vat'],
+        'finalTotal': quote['finalTotal']
     }
 
+    old_final_total = invoice.finalTotal
     dao.update_invoice(invoiceId, invoice_data)
 
+    # Điều chỉnh điểm theo chênh lệch giữa hóa đơn mới và cũ
+    loyalty = LoyaltyRules.load()
+    accrue_points(loyalty, [
+        (invoice.customerId, loyalty.points(quote['finalTotal']) - loyalty.points(old_final_total))
+    ])
+
     return jsonify({
         'success': True,
         'message': 'Cập nhật hóa đơn thành công',
         'data': {
             'invoiceId': invoice.invoiceId,
-            'total': total,
-            'discount': discount,
-            'vat': vat,
-            'finalTotal': finalTotal
+            'total': quote['total'],
+            'discount': quote['discount'],
+            'vat': quote['vat'],
+            'finalTotal': quote['finalTotal']
         }
     }), 200
 
 
 @app.route('/api/invoices/<invoiceId>', methods=['DELETE'])
 @handle_errors
+@transactional
 def delete_invoice(invoiceId):
     """Xóa hóa đơn"""
     invoice = dao.get_invoice_by_id(invoiceId)
     if not invoice:
         return jsonify({'success': False, 'message': 'Không tìm thấy hóa đơn'}), 404
 
+    # Trừ lại điểm đã tích từ hóa đơn
+    loyalty = LoyaltyRules.load()
+    accrue_points(loyalty, [(invoice.customerId, -loyalty.points(invoice.finalTotal))])
+
     dao.delete_invoice(invoiceId)
     return jsonify({'success': True, 'message': 'Xóa hóa đơn thành công'}), 200
 
 
+@app.route('/api/cashier/queue', methods=['GET'])
+@handle_errors
+def get_cashier_queue():
+    """Các booking đã chấp nhận chưa có hóa đơn, kèm VAT/giảm giá tối đa hiện hành"""
+    rows = dao.get_cashier_queue()
+
+    # Luôn có ít nhất một dòng chứa settings; hàng đợi rỗng thì các cột booking là NULL
+    settings = {'vatRate': float(rows[0].vatRate), 'maxDiscount': float(rows[0].maxDiscount)}
+    bookings = serializers.CASHIER_QUEUE_ITEM.many(row for row in rows if row.bookingId is not None)
+
+    return jsonify({'success': True, 'data': {'settings': settings, 'bookings': bookings}}), 200
+
+
 # SETTINGS APIs
 
 @app.route('/api/settings', methods=['GET'])
 @handle_errors
+@etag_cached('settings')
 def get_all_settings():
     """Lấy tất cả cài đặt"""
     settings = dao.get_all_settings()
-    data = [{
-        'settingId': s.settingId,
-        'value': s.value,
-        'description': s.description
-    } for s in settings]
+    data = serializers.SETTING.many(settings)
 
     return jsonify({'success': True, 'data': data}), 200
 
@@ -1070,18 +1134,12 @@ def get_setting(settingId):
     if not setting:
         return jsonify({'success': False, 'message': 'Không tìm thấy cài đặt'}), 404
 
-    return jsonify({
-        'success': True,
-        'data': {
-            'settingId': setting.settingId,
-            'value': setting.value,
-            'description': setting.description
-        }
-    }), 200
+    return jsonify({'success': True, 'data': serializers.SETTING(setting)}), 200
 
 
 @app.route('/api/settings/<settingId>', methods=['PUT'])
 @handle_errors
+@transactional
 def update_setting(settingId):
     """Cập nhật cài đặt"""
     setting = dao.get_setting_by_id(settingId)
@@ -1110,11 +1168,23 @@ def update_setting(settingId):
             if val < 0 or val > 100:
                 return jsonify({'success': False, 'message': 'Giảm giá phải từ 0-100%'}), 400
 
+        elif settingId == 'loyalty_point_value':
+            parse_point_value(new_value)
+
+        elif settingId == 'loyalty_tiers':
+            parse_tiers(new_value)
+
+    except LoyaltyError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except ValueError:
         return jsonify({'success': False, 'message': 'Giá trị không hợp lệ'}), 400
 
     dao.update_setting(settingId, new_value)
 
+    # Đổi quy tắc tích điểm: tính lại điểm/hạng của mọi khách hàng ở job nền
+    if settingId in ('loyalty_point_value', 'loyalty_tiers'):
+        schedule_recompute(LoyaltyRules.load())
+
     return jsonify({
         'success': True,
         'message': 'Cập nhật cài đặt thành công',
@@ -1128,6 +1198,7 @@ def update_setting(settingId):
 
 @app.route('/api/settings/service-price/<servicesId>', methods=['PUT'])
 @handle_errors
+@transactional
 def update_service_price_via_settings(servicesId):
     """Cập nhật giá dịch vụ qua settings"""
     service = dao.get_service_by_id(servicesId)
@@ -1148,7 +1219,6 @@ def update_service_price_via_settings(servicesId):
         return jsonify({'success': False, 'message': 'Giá không hợp lệ'}), 400
 
     service.price = price
-    db.session.commit()
 
     return jsonify({
         'success': True,
@@ -1278,6 +1348,7 @@ def get_service_frequency_report():
 @validate_json(['bookingId', 'employeeId', 'serviceName', 'serviceDuration', 'servicePrice'])
 @handle_errors
 @cors_enabled
+@transactional
 def create_service_form():
     """Tạo phiếu dịch vụ mới"""
     data = request.get_json()
@@ -1292,10 +1363,6 @@ def create_service_form():
     if not employee:
         return jsonify({'success': False, 'message': 'Nhân viên không tồn tại'}), 404
 
-    # Kiểm tra đã có phiếu dịch vụ chưa
-    if dao.check_service_form_exists(data['bookingId']):
-        return jsonify({'success': False, 'message': 'Booking này đã có phiếu dịch vụ'}), 400
-
     # Validate dữ liệu
     duration = int(data['serviceDuration'])
     if duration < 15 or duration > 120:
@@ -1307,7 +1374,7 @@ def create_service_form():
 
     # Tạo mã phiếu dịch vụ
     form_data = data.copy()
-    form_data['formId'] = 'SF' + secrets.token_hex(4).upper()
+    form_data['formId'] = dao.generate_service_form_id()
 
     service_form = dao.create_service_form(form_data)
 
@@ -1330,34 +1397,12 @@ def create_service_form():
 @app.route('/api/service-forms', methods=['GET'])
 @handle_errors
 def get_service_forms():
-    """Lấy danh sách phiếu dịch vụ"""
-    service_forms = dao.get_all_service_forms()
-    data = []
-
-    for sf in service_forms:
-        # Tìm account cho employee và customer
-        employee_account = Account.query.filter_by(employeeId=sf.employeeId).first()
-        customer_account = None
-        if sf.booking and sf.booking.customerId:
-            customer_account = Account.query.filter_by(customerId=sf.booking.customerId).first()
-
-        employee_name = employee_account.fullName if employee_account else 'N/A'
-        customer_name = customer_account.fullName if customer_account else 'N/A'
-
-        data.append({
-            'formId': sf.formId,
-            'bookingId': sf.bookingId,
-            'employeeId': sf.employeeId,
-            'employeeName': employee_name,
-            'customerName': customer_name,
-            'serviceName': sf.serviceName,
-            'serviceDuration': sf.serviceDuration,
-            'servicePrice': sf.servicePrice,
-            'serviceNote': sf.serviceNote,
-            'createdAt': sf.createdAt.isoformat()
-        })
+    """Lấy danh sách phiếu dịch vụ (?since= để chỉ lấy thay đổi)"""
+    sync = SyncRequest()
+    service_forms = dao.get_all_service_forms(sync.since)
+    data = serializers.SERVICE_FORM.many(service_forms)
 
-    return jsonify({'success': True, 'data': data}), 200
+    return jsonify(sync.payload(data, 'service_forms')), 200
 
 
 @app.route('/api/service-forms/<formId>', methods=['GET'])
@@ -1368,30 +1413,7 @@ def get_service_form(formId):
     if not service_form:
         return jsonify({'success': False, 'message': 'Không tìm thấy phiếu dịch vụ'}), 404
 
-    # Tìm account cho employee và customer
-    employee_account = Account.query.filter_by(employeeId=service_form.employeeId).first()
-    customer_account = None
-    if service_form.booking and service_form.booking.customerId:
-        customer_account = Account.query.filter_by(customerId=service_form.booking.customerId).first()
-
-    employee_name = employee_account.fullName if employee_account else 'N/A'
-    customer_name = customer_account.fullName if customer_account else 'N/A'
-
-    return jsonify({
-        'success': True,
-        'data': {
-            'formId': service_form.formId,
-            'bookingId': service_form.bookingId,
-            'employeeId': service_form.employeeId,
-            'employeeName': employee_name,
-            'customerName': customer_name,
-            'serviceName': service_form.serviceName,
-            'serviceDuration': service_form.serviceDuration,
-            'servicePrice': service_form.servicePrice,
-            'serviceNote': service_form.serviceNote,
-            'createdAt': service_form.createdAt.isoformat()
-        }
-    }), 200
+    return jsonify({'success': True, 'data': serializers.SERVICE_FORM(service_form)}), 200
 
 
 @app.route('/api/service-forms/employee/<employeeId>', methods=['GET'])
@@ -1403,31 +1425,14 @@ def get_service_forms_by_employee(employeeId):
         return jsonify({'success': False, 'message': 'Nhân viên không tồn tại'}), 404
 
     service_forms = dao.get_service_forms_by_employee(employeeId)
-    data = []
-
-    for sf in service_forms:
-        customer_account = None
-        if sf.booking and sf.booking.customerId:
-            customer_account = Account.query.filter_by(customerId=sf.booking.customerId).first()
-
-        customer_name = customer_account.fullName if customer_account else 'N/A'
-
-        data.append({
-            'formId': sf.formId,
-            'bookingId': sf.bookingId,
-            'customerName': customer_name,
-            'serviceName': sf.serviceName,
-            'serviceDuration': sf.serviceDuration,
-            'servicePrice': sf.servicePrice,
-            'serviceNote': sf.serviceNote,
-            'createdAt': sf.createdAt.isoformat()
-        })
+    data = serializers.EMPLOYEE_SERVICE_FORM.many(service_forms)
 
     return jsonify({'success': True, 'data': data}), 200
 
 
 @app.route('/api/service-forms/<formId>', methods=['PUT'])
 @handle_errors
+@transactional
 def update_service_form(formId):
     """Cập nhật phiếu dịch vụ"""
     service_form = dao.get_service_form_by_id(formId)
@@ -1454,6 +1459,7 @@ def update_service_form(formId):
 
 @app.route('/api/service-forms/<formId>', methods=['DELETE'])
 @handle_errors
+@transactional
 def delete_service_form(formId):
     """Xóa phiếu dịch vụ"""
     service_form = dao.get_service_form_by_id(formId)
@@ -1464,6 +1470,90 @@ def delete_service_form(formId):
     return jsonify({'success': True, 'message': 'Xóa phiếu dịch vụ thành công'}), 200
 
 
+# BATCH API
+
+@app.route('/api/batch', methods=['POST'])
+@validate_json(['requests'])
+@handle_errors
+def batch_requests():
+    """Chạy nhiều request đọc (GET) trong một lần gọi, trả kết quả theo thứ tự"""
+    data = request.get_json()
+    try:
+        results = run_batch(app, data['requests'], app.config['BATCH_MAX_REQUESTS'])
+    except BatchError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    return jsonify({'success': True, 'data': results}), 200
+
+
+# MONITORING APIs
+
+@app.route('/api/admin/log-stats', methods=['GET'])
+@admin_required
+@handle_errors
+def get_access_log_stats():
+    """Thống kê hàng đợi access log - chỉ admin"""
+    return jsonify({'success': True, 'data': get_log_stats()}), 200
+
+
+@app.route('/api/admin/cache-stats', methods=['GET'])
+@admin_required
+@handle_errors
+def get_cache_stats():
+    """Thống kê hit/miss của các cache in-memory - chỉ admin"""
+    return jsonify({
+        'success': True,
+        'data': {
+            'directory': dao.get_directory_stats()
+        }
+    }), 200
+
+
+@app.route('/api/admin/job-stats', methods=['GET'])
+@admin_required
+@handle_errors
+def get_job_stats():
+    """Độ sâu hàng đợi job nền, thời gian chờ/chạy của job - chỉ admin"""
+    return jsonify({'success': True, 'data': job_runner.stats()}), 200
+
+
+@app.route('/api/admin/loyalty/recompute', methods=['POST'])
+@admin_required
+@handle_errors
+@transactional
+def recompute_loyalty():
+    """Xếp job tính lại điểm tích lũy/hạng thành viên của mọi khách hàng - chỉ admin"""
+    loyalty = LoyaltyRules.load()
+    job_id = schedule_recompute(loyalty)
+    return jsonify({
+        'success': True,
+        'message': 'Đã xếp lịch tính lại điểm tích lũy' if job_id else 'Đang có job tính lại chờ chạy',
+        'data': {'jobId': job_id, 'rules': loyalty.to_dict()}
+    }), 202
+
+
+@app.route('/api/admin/reminder-stats', methods=['GET'])
+@admin_required
+@handle_errors
+def get_reminder_stats():
+    """Trạng thái scheduler nhắc lịch của process - chỉ admin"""
+    return jsonify({'success': True, 'data': reminder_scheduler.stats()}), 200
+
+
+@app.route('/api/admin/slow-queries', methods=['GET'])
+@admin_required
+@handle_errors
+def get_slow_query_log():
+    """Danh sách câu SQL chậm gần nhất - chỉ admin"""
+    return jsonify({
+        'success': True,
+        'data': {
+            'thresholdMs': app.config['SLOW_QUERY_THRESHOLD_MS'],
+            'queries': get_slow_queries()
+        }
+    }), 200
+
+
 # Route để redirect đến Flask-Admin
 @app.route('/admin')
 def redirect_to_admin():
@@ -1474,7 +1564,6 @@ def redirect_to_admin():
 
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        dao.init_default_settings()
+    # Server phát triển - production dùng: gunicorn -c gunicorn.conf.py wsgi:application
+    init_database(app)
     app.run(debug=True)
\ No newline at end of file
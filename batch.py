@@ -0,0 +1,119 @@
+# batch.py
+"""
+Batch API: chạy nhiều request đọc trong một lần gọi HTTP.
+
+Mỗi sub-request được route qua url_map của app và gọi thẳng view function trong
+cùng process, cùng app context (nên dùng chung một DB session), không qua HTTP,
+không chạy lại before/after_request (access log, nén, CORS) cho từng sub-request.
+"""
+from flask import request
+from werkzeug.exceptions import HTTPException
+
+# Endpoint POST nhưng chỉ đọc dữ liệu, được phép gọi trong batch
+IDEMPOTENT_POST_ENDPOINTS = {'preview_invoice', 'quote_invoices'}
+
+# Endpoint trả stream không kết thúc (SSE), không bao giờ chạy trong batch
+STREAMING_ENDPOINTS = {'booking_events'}
+
+# Header của request gốc được chuyển xuống sub-request
+FORWARDED_HEADERS = ('Authorization', 'Accept-Language')
+
+
+# Kiểu giá trị được phép trong params (query string)
+PARAM_TYPES = (str, int, float, bool)
+
+
+class BatchError(ValueError):
+    """Sub-request không hợp lệ (lỗi của client)"""
+
+
+def _validate_params(params):
+    """params: None hoặc object {tên: giá trị hoặc danh sách giá trị}"""
+    if params is None:
+        return None
+    if not isinstance(params, dict):
+        raise BatchError('params phải là object {tên: giá trị}')
+    for name, value in params.items():
+        values = value if isinstance(value, list) else [value]
+        if not all(isinstance(v, PARAM_TYPES) for v in values):
+            raise BatchError(f'Giá trị params không hợp lệ: {name}')
+    return params
+
+
+def _validate(item):
+    if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+        raise BatchError('Mỗi request trong batch phải có path')
+
+    method = item.get('method', 'GET')
+    if not isinstance(method, str) or method.upper() not in ('GET', 'POST'):
+        raise BatchError(f'Batch chỉ hỗ trợ request đọc (GET), không hỗ trợ {method}')
+    method = method.upper()
+
+    path = item['path']
+    if not path.startswith('/api/'):
+        raise BatchError(f'Path không hợp lệ: {path}')
+    return method, path, _validate_params(item.get('params'))
+
+
+def _response_body(response):
+    if response.is_json:
+        return response.get_json()
+    return response.get_data(as_text=True)
+
+
+def run_subrequest(app, item):
+    """Chạy một sub-request, trả về {'id', 'status', 'body'}"""
+    method, path, params = _validate(item)
+    # Đọc thông tin request gốc trước khi push context của sub-request
+    batch_endpoint = request.endpoint
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+
+    with app.test_request_context(
+        path,
+        method=method,
+        query_string=params,
+        json=item.get('body') if method == 'POST' else None,
+        headers=headers,
+        environ_base={'REMOTE_ADDR': request.remote_addr}
+    ) as ctx:
+        sub_request = ctx.request
+        try:
+            if sub_request.routing_exception is not None:
+                raise sub_request.routing_exception
+
+            endpoint = sub_request.url_rule.endpoint
+            if endpoint == batch_endpoint:
+                raise BatchError('Không thể lồng batch trong batch')
+            if endpoint in STREAMING_ENDPOINTS:
+                raise BatchError(f'{path} là stream, không chạy được trong batch')
+            if method == 'POST' and endpoint not in IDEMPOTENT_POST_ENDPOINTS:
+                raise BatchError(f'{path} không phải request đọc, không chạy được trong batch')
+
+            response = app.make_response(app.dispatch_request())
+            if response.is_streamed or response.mimetype == 'text/event-stream':
+                response.close()
+                raise BatchError(f'{path} là stream, không chạy được trong batch')
+            status, body = response.status_code, _response_body(response)
+        except BatchError as e:
+            status, body = 400, {'success': False, 'message': str(e)}
+        except HTTPException as e:
+            status, body = e.code, {'success': False, 'message': e.description}
+
+    return {'id': item.get('id', path), 'status': status, 'body': body}
+
+
+def run_batch(app, items, max_requests):
+    """Chạy lần lượt các sub-request, lỗi của một sub-request không ảnh hưởng các sub-request khác"""
+    if not isinstance(items, list) or not items:
+        raise BatchError('requests phải là danh sách không rỗng')
+    if len(items) > max_requests:
+        raise BatchError(f'Tối đa {max_requests} request trong một batch')
+
+    results = []
+    for item in items:
+        try:
+            results.append(run_subrequest(app, item))
+        except BatchError as e:
+            item_id = item.get('id') if isinstance(item, dict) else None
+            results.append({'id': item_id, 'status': 400, 'body': {'success': False, 'message': str(e)}})
+    return results
@@ -0,0 +1,101 @@
+# benchmarks/bench_serialization.py
+"""
+Benchmark serialize danh sách booking 100k dòng:
+dict viết tay + .isoformat()/float() + JSON provider mặc định của Flask
+so với serializer compile sẵn (serializers.BOOKING) + FastJSONProvider.
+
+Chạy từ thư mục gốc project:
+    python benchmarks/bench_serialization.py [--rows 100000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import dao  # noqa: E402
+import serializers  # noqa: E402
+from json_provider import FastJSONProvider, orjson  # noqa: E402
+
+
+def make_rows(n):
+    """Tạo n booking giả (không cần database)"""
+    services = [SimpleNamespace(name=f'Dịch vụ {i}', price=100000.0 * (i + 1), durration=30 + i) for i in range(10)]
+    start = datetime(2025, 1, 1, 8, 0)
+    return [SimpleNamespace(
+        bookingId=f'B{i:08d}',
+        time=start + timedelta(minutes=30 * i),
+        status='Chấp nhận',
+        customerId=f'C{i % 500:05d}',
+        servicesId=f'SV{i % 10}',
+        service=services[i % 10],
+        employeeId=f'E{i % 20:03d}'
+    ) for i in range(n)]
+
+
+def handwritten(rows):
+    data = []
+    for b in rows:
+        data.append({
+            'bookingId': b.bookingId,
+            'time': b.time.isoformat(),
+            'status': b.status,
+            'customer': {'customerId': b.customerId, 'name': dao.get_customer_name(b.customerId)},
+            'service': {
+                'servicesId': b.servicesId,
+                'name': b.service.name,
+                'price': float(b.service.price) if b.service.price is not None else 0.0,
+                'durration': b.service.durration
+            },
+            'employee': {'employeeId': b.employeeId, 'name': dao.get_employee_name(b.employeeId)}
+        })
+    return data
+
+
+def timed(label, fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'{label:<45} {best * 1000:8.1f} ms  ({size / 1024 / 1024:.1f} MB)')
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serialize booking')
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+
+    # Danh bạ được nạp sẵn như khi server khởi động
+    for b in rows[:500]:
+        dao.directory_dao._directory.set(('customer', b.customerId), {'name': 'Nguyễn Văn A', 'phone': '0900000000'})
+    for b in rows[:20]:
+        dao.directory_dao._directory.set(('employee', b.employeeId), {'name': 'Trần Thị B', 'phone': '0911111111'})
+
+    app = Flask(__name__)
+    default_provider = DefaultJSONProvider(app)
+    default_provider.ensure_ascii = False
+    fast_provider = FastJSONProvider(app)
+
+    print(f'{args.rows} dòng, orjson: {"có" if orjson is not None else "không"}')
+    with app.app_context():
+        before = timed('dict viết tay + DefaultJSONProvider',
+                       lambda: len(default_provider.response({'success': True, 'data': handwritten(rows)}).data))
+        after = timed('serializers.BOOKING + FastJSONProvider',
+                      lambda: len(fast_provider.response({'success': True, 'data': serializers.BOOKING.many(rows)}).data))
+
+    print(f'Nhanh hơn {before / after:.1f} lần')
+
+
+if __name__ == '__main__':
+    main()
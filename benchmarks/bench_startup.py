@@ -0,0 +1,80 @@
+# benchmarks/bench_startup.py
+"""
+Benchmark thời gian khởi động (import app.py) dựa trên `python -X importtime`.
+
+Chạy từ thư mục gốc project:
+    python benchmarks/bench_startup.py [--runs 5] [--budget-ms 800]
+
+Thoát với mã 1 nếu:
+- thời gian import trung vị của app vượt ngân sách, hoặc
+- các module nặng chỉ dùng cho Flask-Admin (flask_admin, wtforms, admin) bị import lúc khởi động.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Các module không được xuất hiện khi import app (chỉ nạp khi mở /admin/)
+FORBIDDEN_MODULES = ('flask_admin', 'wtforms', 'admin', 'jwt')
+
+LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+def measure_once(module):
+    """Import module trong process mới, trả về (cumulative_us, danh sách module đã import)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+    cumulative_us = None
+    imported = []
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        imported.append(name)
+        # Dòng của module gốc chỉ thụt lề một khoảng trắng
+        if name == module and len(match.group(3)) == 1:
+            cumulative_us = int(match.group(2))
+
+    return cumulative_us, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark thời gian import app')
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=800.0)
+    args = parser.parse_args()
+
+    timings_ms = []
+    imported = []
+    for _ in range(args.runs):
+        cumulative_us, imported = measure_once(args.module)
+        timings_ms.append(cumulative_us / 1000)
+
+    median_ms = statistics.median(timings_ms)
+    print(f'import {args.module}: median {median_ms:.1f} ms, '
+          f'min {min(timings_ms):.1f} ms, max {max(timings_ms):.1f} ms ({args.runs} lần)')
+
+    failed = False
+    leaked = sorted({name for name in imported if name.split('.')[0] in FORBIDDEN_MODULES})
+    if leaked:
+        print('Lỗi: các module sau bị import lúc khởi động: ' + ', '.join(leaked))
+        failed = True
+
+    if median_ms > args.budget_ms:
+        print(f'Lỗi: vượt ngân sách {args.budget_ms:.0f} ms')
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# compression.py
+"""
+Nén response (gzip, brotli nếu đã cài) theo Accept-Encoding của client.
+
+- Chỉ nén các mimetype dạng text (JSON, HTML, CSS, JS...) lớn hơn COMPRESS_MIN_SIZE.
+- Response streaming được nén từng chunk (flush sau mỗi chunk để client nhận ngay).
+- File tĩnh được nén sẵn một lần thành file .gz/.br cạnh file gốc; khi client hỗ trợ,
+  file nén sẵn được gửi thẳng, không nén lại ở mỗi request.
+- ETag của bản nén có hậu tố -gzip/-br để cache không lẫn bản nén với bản gốc.
+"""
+import gzip
+import mimetypes
+import os
+import re
+import zlib
+
+from flask import request, g, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # brotli là tùy chọn
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    'application/json',
+    'application/javascript',
+    'text/javascript',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/xml',
+    'image/svg+xml',
+)
+STATIC_EXTENSIONS = ('.css', '.js', '.html', '.json', '.svg', '.txt', '.xml')
+VARIANT_EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+
+_ETAG_SUFFIX = re.compile(r'-(gzip|br)"')
+
+
+def _supported_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding():
+    """Chọn encoding tốt nhất mà client chấp nhận, None nếu không nén được"""
+    return request.accept_encodings.best_match(_supported_encodings())
+
+
+def _compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+
+
+def _stream_compressor(encoding, config):
+    """(compress_chunk, finish) cho nén từng phần"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config['COMPRESS_BROTLI_QUALITY'])
+        return (lambda chunk: compressor.process(chunk) + compressor.flush()), compressor.finish
+
+    # wbits=31: định dạng gzip
+    compressor = zlib.compressobj(config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+    return (lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)), compressor.flush
+
+
+def _compress_stream(iterable, encoding, config):
+    compress_chunk, finish = _stream_compressor(encoding, config)
+    try:
+        for chunk in iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield compress_chunk(chunk)
+        yield finish()
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+def _add_vary(response):
+    response.vary.add('Accept-Encoding')
+
+
+def _tag_etag(response, encoding):
+    """Thêm hậu tố encoding vào ETag (nếu có) của response"""
+    etag, weak = response.get_etag()
+    if etag and not etag.endswith('-' + encoding):
+        response.set_etag(f'{etag}-{encoding}', weak=weak)
+
+
+def _is_compressible(response, config):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers or response.direct_passthrough:
+        return False
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return False
+    return response.mimetype in config['COMPRESS_MIMETYPES']
+
+
+def _strip_etag_suffix():
+    """Bỏ hậu tố -gzip/-br trong If-None-Match để so với ETag gốc của view"""
+    value = request.environ.get('HTTP_IF_NONE_MATCH')
+    if value:
+        match = _ETAG_SUFFIX.search(value)
+        if match:
+            g.etag_encoding = match.group(1)
+            request.environ['HTTP_IF_NONE_MATCH'] = _ETAG_SUFFIX.sub('"', value)
+
+
+def compress_response(response, config):
+    """Nén response nếu phù hợp (dùng trong after_request)"""
+    if response.status_code == 304:
+        # 304 cho bản nén phải trả lại đúng ETag mà client đang giữ
+        encoding = g.get('etag_encoding')
+        if encoding:
+            _tag_etag(response, encoding)
+        return response
+
+    if not _is_compressible(response, config):
+        return response
+
+    if response.is_streamed:
+        encoding = negotiate_encoding()
+        _add_vary(response)
+        if encoding:
+            response.response = _compress_stream(response.response, encoding, config)
+            response.headers.pop('Content-Length', None)
+            response.headers['Content-Encoding'] = encoding
+            _tag_etag(response, encoding)
+        return response
+
+    data = response.get_data()
+    if len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    _add_vary(response)
+    encoding = negotiate_encoding()
+    if not encoding:
+        return response
+
+    compressed = _compress(data, encoding, config)
+    if len(compressed) >= len(data):
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    _tag_etag(response, encoding)
+    return response
+
+
+def _is_fresh(variant, path):
+    return os.path.exists(variant) and os.path.getmtime(variant) >= os.path.getmtime(path)
+
+
+def precompress_static(static_folder, config):
+    """Tạo file .gz/.br cho các file tĩnh dạng text (bỏ qua file đã nén sẵn còn mới)"""
+    created = 0
+    for root, _dirs, files in os.walk(static_folder):
+        for name in files:
+            if not name.endswith(STATIC_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            if os.path.getsize(path) < config['COMPRESS_MIN_SIZE']:
+                continue
+
+            pending = [encoding for encoding in _supported_encodings()
+                       if not _is_fresh(path + VARIANT_EXTENSIONS[encoding], path)]
+            if not pending:
+                continue
+
+            with open(path, 'rb') as f:
+                data = f.read()
+            for encoding in pending:
+                with open(path + VARIANT_EXTENSIONS[encoding], 'wb') as out:
+                    out.write(_compress(data, encoding, config))
+                created += 1
+    return created
+
+
+def _precompressed_static_view(app, view):
+    """Bọc view static: gửi file .br/.gz nén sẵn nếu có và client hỗ trợ"""
+
+    def static(filename):
+        encoding = negotiate_encoding()
+        variant = filename + VARIANT_EXTENSIONS[encoding] if encoding else None
+        if not variant or not os.path.isfile(os.path.join(app.static_folder, variant)):
+            response = view(filename=filename)
+            if filename.endswith(STATIC_EXTENSIONS):
+                _add_vary(response)
+            return response
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(app.static_folder, variant, mimetype=mimetype,
+                                       max_age=app.get_send_file_max_age(filename))
+        response.headers['Content-Encoding'] = encoding
+        _add_vary(response)
+        return response
+
+    static.__name__ = view.__name__
+    return static
+
+
+def init_compression(app):
+    """Bật nén response cho app (cấu hình COMPRESS_* trong app.config)"""
+    config = {
+        'COMPRESS_LEVEL': app.config.get('COMPRESS_LEVEL', 6),
+        'COMPRESS_BROTLI_QUALITY': app.config.get('COMPRESS_BROTLI_QUALITY', 5),
+        'COMPRESS_MIN_SIZE': app.config.get('COMPRESS_MIN_SIZE', 500),
+        'COMPRESS_MIMETYPES': frozenset(app.config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)),
+    }
+
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+
+    app.before_request(_strip_etag_suffix)
+
+    @app.after_request
+    def _compress_response(response):
+        return compress_response(response, config)
+
+    if app.has_static_folder and 'static' in app.view_functions:
+        if app.config.get('COMPRESS_PRECOMPRESS_STATIC', True):
+            precompress_static(app.static_folder, config)
+        app.view_functions['static'] = _precompressed_static_view(app, app.view_functions['static'])
@@ -11,4 +11,12 @@ from .invoice_dao import *
 from .account_dao import *
 from .settings_dao import *
 from .service_form_dao import *
+from .stats_dao import *
+from .directory_dao import *
+from .version_dao import *
+from .event_dao import *
+from .sync_dao import *
+from .search_dao import *
+from .job_dao import *
+from .reminder_dao import *
 from .utils import *
\ No newline at end of file
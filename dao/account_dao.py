@@ -5,6 +5,14 @@ Data Access Object cho Account
 from datetime import datetime
 from __init__ import db
 from models import Account, Customer, Employee
+from cache import TTLCache
+from .directory_dao import remember_account
+from .utils import run_after_commit
+from serializers import ACCOUNT
+
+# Kết quả kiểm tra quyền admin được cache ngắn hạn theo username
+ADMIN_CHECK_TTL = 30
+_admin_check_cache = TTLCache(maxsize=256, ttl=ADMIN_CHECK_TTL)
 
 
 def get_account_by_username(username):
@@ -12,6 +20,20 @@ def get_account_by_username(username):
     return Account.query.filter_by(username=username).first()
 
 
+def is_admin_account(username):
+    """Kiểm tra username có role Admin (cache ADMIN_CHECK_TTL giây)"""
+    def load():
+        account = get_account_by_username(username)
+        return bool(account and account.role == 'Admin')
+
+    return _admin_check_cache.get_or_load(username, load)
+
+
+def invalidate_admin_check(username):
+    """Xóa cache quyền admin khi role/tài khoản thay đổi (sau khi transaction commit)"""
+    run_after_commit(lambda: _admin_check_cache.invalidate(username))
+
+
 def create_account(account_data, customer_id=None):
     """Tạo tài khoản mới"""
     account = Account(
@@ -26,7 +48,8 @@ def create_account(account_data, customer_id=None):
         createdAt=datetime.now()
     )
     db.session.add(account)
-    db.session.commit()
+    db.session.flush()
+    remember_account(account)
     return account
 
 
@@ -35,14 +58,17 @@ def update_account_password(username, new_password_hash):
     account = Account.query.filter_by(username=username).first()
     if account:
         account.passwordHash = new_password_hash
-        db.session.commit()
+        db.session.flush()
         return True
     return False
 
 
-def get_all_accounts():
-    """Lấy tất cả tài khoản"""
-    return Account.query.all()
+def get_all_accounts(since=None):
+    """Lấy tất cả tài khoản (hoặc các tài khoản thay đổi từ thời điểm since)"""
+    query = Account.query
+    if since is not None:
+        query = query.filter(Account.updatedAt >= since)
+    return query.all()
 
 
 def update_account_role(username, new_role):
@@ -50,23 +76,16 @@ def update_account_role(username, new_role):
     account = Account.query.filter_by(username=username).first()
     if account:
         account.role = new_role
-        db.session.commit()
+        db.session.flush()
+        invalidate_admin_check(username)
         return True
     return False
 
 
 def get_account_info_by_role(account):
     """Lấy thông tin account theo role với data từ account table"""
-    base_info = {
-        'accountId': account.accountId,
-        'username': account.username,
-        'role': account.role,
-        'name': account.fullName,
-        'phone': account.phone,
-        'email': account.email,
-        'createdAt': account.createdAt.isoformat()
-    }
-    
+    base_info = ACCOUNT(account)
+
     if account.role == 'Customer' and account.customer and account.customer.active:
         base_info['customerId'] = account.customer.customerId
         base_info['loyaltyPoints'] = account.customer.loyaltyPoints
@@ -3,13 +3,18 @@
 Data Access Object cho Booking
 """
 from datetime import datetime, timedelta
+from sqlalchemy import select, func, and_, or_, true
+from sqlalchemy.orm import aliased
 from __init__ import db
-from models import Booking, Service
+from models import Booking, Service, ServiceForm, Account, Settings
 
 
-def get_all_bookings():
-    """Lấy danh sách tất cả booking"""
-    return Booking.query.all()
+def get_all_bookings(since=None):
+    """Lấy danh sách tất cả booking (hoặc các booking thay đổi từ thời điểm since)"""
+    query = Booking.query
+    if since is not None:
+        query = query.filter(Booking.updatedAt >= since)
+    return query.all()
 
 
 def get_booking_by_id(booking_id):
@@ -28,7 +33,7 @@ def create_booking(data):
         employeeId=data['employeeId']
     )
     db.session.add(booking)
-    db.session.commit()
+    db.session.flush()
     return booking
 
 
@@ -39,7 +44,7 @@ def update_booking(booking_id, data):
         if "time" in data:
             booking.time = datetime.fromisoformat(data['time'])
         booking.status = data.get('status', booking.status)
-        db.session.commit()
+        db.session.flush()
     return booking
 
 
@@ -48,7 +53,7 @@ def delete_booking(booking_id):
     booking = Booking.query.get(booking_id)
     if booking:
         db.session.delete(booking)
-        db.session.commit()
+        db.session.flush()
         return True
     return False
 
@@ -114,4 +119,87 @@ def get_bookings_by_month(month, year):
         Booking.time < end_date
     ).all()
 
-    return bookings
\ No newline at end of file
+    return bookings
+
+def _setting_value(setting_id):
+    """Scalar subquery lấy giá trị một cài đặt"""
+    return select(Settings.value).where(Settings.settingId == setting_id).scalar_subquery()
+
+
+def get_employee_worklist(employee_id, since):
+    """Lịch làm việc của nhân viên kèm trạng thái phiếu dịch vụ - một câu SQL
+
+    Gồm các booking từ thời điểm since trở đi và các booking đã chấp nhận nhưng
+    chưa lập phiếu dịch vụ (kể cả trước since).
+    """
+    form_id = select(ServiceForm.formId).where(
+        ServiceForm.bookingId == Booking.bookingId
+    ).limit(1).scalar_subquery()
+
+    return db.session.execute(
+        select(
+            Booking.bookingId, Booking.time, Booking.status, Booking.customerId,
+            Service.servicesId, Service.name.label('serviceName'), Service.price, Service.durration,
+            Account.fullName.label('customerName'),
+            form_id.label('formId')
+        ).join(Service, Service.servicesId == Booking.servicesId).outerjoin(
+            Account, Account.customerId == Booking.customerId
+        ).where(
+            Booking.employeeId == employee_id,
+            or_(Booking.time >= since, and_(Booking.status == 'Chấp nhận', form_id.is_(None)))
+        ).order_by(Booking.time)
+    ).all()
+
+
+def get_cashier_queue():
+    """Booking đã chấp nhận chưa có hóa đơn, kèm giá dịch vụ và VAT/giảm giá hiện hành - một câu SQL
+
+    Settings được lấy bằng scalar subquery trong một dòng riêng rồi LEFT JOIN với
+    danh sách booking, nên khi hàng đợi rỗng vẫn có một dòng chứa settings
+    (các cột booking là NULL).
+    """
+    customer_account = aliased(Account)
+    employee_account = aliased(Account)
+
+    settings_row = select(
+        func.coalesce(_setting_value('vat_rate'), '10').label('vatRate'),
+        func.coalesce(_setting_value('max_discount'), '20').label('maxDiscount')
+    ).subquery()
+
+    queue = select(
+        Booking.bookingId, Booking.time, Booking.status, Booking.customerId, Booking.employeeId,
+        Service.servicesId, Service.name.label('serviceName'), Service.price, Service.durration,
+        customer_account.fullName.label('customerName'),
+        employee_account.fullName.label('employeeName')
+    ).join(Service, Service.servicesId == Booking.servicesId).outerjoin(
+        customer_account, customer_account.customerId == Booking.customerId
+    ).outerjoin(
+        employee_account, employee_account.employeeId == Booking.employeeId
+    ).where(
+        Booking.status == 'Chấp nhận',
+        Booking.invoiceId.is_(None)
+    ).subquery()
+
+    return db.session.execute(
+        select(settings_row, queue).select_from(settings_row.outerjoin(queue, true())).order_by(queue.c.time)
+    ).all()
+
+
+def get_bookings_for_quote(booking_ids=None):
+    """Booking kèm giá dịch vụ và tên khách hàng để báo giá/xuất hóa đơn - một câu SQL
+
+    booking_ids=None: toàn bộ hàng đợi thu ngân (đã chấp nhận, chưa có hóa đơn).
+    """
+    query = select(
+        Booking.bookingId, Booking.status, Booking.time, Booking.invoiceId,
+        Booking.customerId, Booking.employeeId, Booking.servicesId,
+        Service.name.label('serviceName'), Service.price,
+        Account.fullName.label('customerName')
+    ).join(Service, Service.servicesId == Booking.servicesId).outerjoin(
+        Account, Account.customerId == Booking.customerId
+    )
+    if booking_ids is None:
+        query = query.where(Booking.status == 'Chấp nhận', Booking.invoiceId.is_(None)).order_by(Booking.time)
+    else:
+        query = query.where(Booking.bookingId.in_(booking_ids))
+    return db.session.execute(query).all()
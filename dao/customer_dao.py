@@ -2,8 +2,25 @@
 """
 Data Access Object cho Customer
 """
+from datetime import datetime
+
+from sqlalchemy import select, update, case, cast, func, bindparam, Integer
 from __init__ import db
-from models import Customer, Account
+from models import Customer, Account, Invoice
+from .directory_dao import remember_account
+from .version_dao import bump_table_versions
+
+_customers = Customer.__table__
+
+# Các kiểu sắp xếp của danh bạ khách hàng: (cột, cột khóa, chuyển giá trị cursor)
+# Mỗi cặp (cột, cột khóa) có index tương ứng trong models
+CUSTOMER_SORTS = {
+    'name': (db.collate(Account.fullName, 'NOCASE'), Account.customerId, None),
+    'loyaltyPoints': (Customer.loyaltyPoints, Customer.customerId, None),
+    'createdAt': (Account.createdAt, Account.customerId, datetime.fromisoformat),
+}
+# Sắp xếp theo cột của accounts: khách hàng chưa có tài khoản được trả ở cuối danh sách
+_ACCOUNT_SORTS = ('name', 'createdAt')
 
 
 def get_all_customers():
@@ -12,26 +29,56 @@ def get_all_customers():
     return customers
 
 
+def get_customer_page(page, membership_level=None):
+    """Một trang danh bạ khách hàng active (customers LEFT JOIN accounts)
+
+    page: pagination.PageRequest (sort theo CUSTOMER_SORTS)
+    Khách hàng chưa có tài khoản (tạo qua POST /api/customers) có tên 'N/A'. Khi sắp xếp theo
+    cột của accounts, họ được trả ở cuối danh sách (theo customerId) để phần chính vẫn đọc
+    thẳng trên index của accounts.
+    """
+    query = db.session.query(
+        Customer.customerId, Customer.loyaltyPoints, Customer.membershipLevel,
+        func.coalesce(Account.fullName, 'N/A').label('fullName'), Account.phone, Account.email
+    ).outerjoin(Account, Account.customerId == Customer.customerId).filter(Customer.active == True)
+    if membership_level:
+        query = query.filter(Customer.membershipLevel == membership_level)
+
+    if page.sort not in _ACCOUNT_SORTS:
+        return page.fetch(query)
+    return page.fetch(
+        query.filter(Account.customerId.isnot(None)),
+        tail=query.filter(Account.customerId.is_(None)),
+        tail_key=Customer.customerId
+    )
+
+
 def get_customer_by_id(customer_id):
     """Lấy thông tin khách hàng theo ID"""
     return Customer.query.filter_by(customerId=customer_id, active=True).first()
 
 
 def create_customer(data):
-    """Tạo khách hàng mới"""
+    """Tạo khách hàng mới
+
+    Điểm/hạng luôn bắt đầu từ 0/Basic: chỉ được cộng từ hóa đơn (xem loyalty.py).
+    """
     customer = Customer(
         customerId=data['customerId'],
-        loyaltyPoints=data.get('loyaltyPoints', 0),
-        membershipLevel=data.get('membershipLevel', 'Basic'),
+        loyaltyPoints=0,
+        membershipLevel='Basic',
         active=True
     )
     db.session.add(customer)
-    db.session.commit()
+    db.session.flush()
     return customer
 
 
 def update_customer(customer_id, data):
-    """Cập nhật thông tin khách hàng - cập nhật vào account"""
+    """Cập nhật thông tin khách hàng - cập nhật vào account
+
+    Không sửa trực tiếp loyaltyPoints/membershipLevel: điểm và hạng tính từ hóa đơn.
+    """
     customer = Customer.query.filter_by(customerId=customer_id, active=True).first()
     if customer and customer.account:
         account = customer.account
@@ -42,13 +89,8 @@ def update_customer(customer_id, data):
         if 'email' in data:
             account.email = data['email']
 
-        # Cập nhật thông tin đặc thù customer
-        if 'loyaltyPoints' in data:
-            customer.loyaltyPoints = data['loyaltyPoints']
-        if 'membershipLevel' in data:
-            customer.membershipLevel = data['membershipLevel']
-
-        db.session.commit()
+        db.session.flush()
+        remember_account(account)
     return customer
 
 
@@ -57,6 +99,56 @@ def delete_customer(customer_id):
     customer = Customer.query.get(customer_id)
     if customer:
         customer.active = False
-        db.session.commit()
+        db.session.flush()
         return True
-    return False
\ No newline at end of file
+    return False
+
+
+def add_loyalty_points(deltas, tiers, base_tier):
+    """Cộng điểm cho nhiều khách hàng và tính lại hạng trong cùng câu UPDATE
+
+    deltas: {customerId: số điểm thay đổi (có thể âm)}; tiers: [(ngưỡng, hạng)] tăng dần.
+    Điểm không xuống dưới 0. Đọc-sửa-ghi nằm trong một câu lệnh nên không mất điểm
+    khi nhiều hóa đơn của cùng khách hàng được tạo đồng thời.
+    """
+    new_points = func.max(func.coalesce(_customers.c.loyaltyPoints, 0) + bindparam('b_delta'), 0)
+    level = case(*[(new_points >= threshold, name) for threshold, name in reversed(tiers)], else_=base_tier)
+    session = db.session
+    session.execute(
+        update(_customers).where(_customers.c.customerId == bindparam('b_customerId')).values(
+            loyaltyPoints=new_points, membershipLevel=level
+        ),
+        [{'b_customerId': customer_id, 'b_delta': delta} for customer_id, delta in deltas.items()]
+    )
+    bump_table_versions(session.connection(), {'customers'})
+
+
+def get_loyalty_recompute_rows(point_value):
+    """Điểm/hạng hiện tại và tổng điểm tính từ hóa đơn của mọi khách hàng - một câu SQL
+
+    Điểm mỗi hóa đơn = floor(finalTotal / point_value) (CAST cắt phần thập phân, finalTotal >= 0),
+    cộng theo khách hàng trong một lượt GROUP BY trên ix_invoices_customerId_finalTotal.
+    """
+    totals = select(
+        Invoice.customerId,
+        func.sum(cast(Invoice.finalTotal / float(point_value), Integer)).label('points')
+    ).group_by(Invoice.customerId).subquery()
+    return db.session.execute(
+        select(
+            _customers.c.customerId, _customers.c.loyaltyPoints, _customers.c.membershipLevel,
+            func.coalesce(totals.c.points, 0).label('points')
+        ).outerjoin(totals, totals.c.customerId == _customers.c.customerId)
+    ).all()
+
+
+def set_loyalty_states(states):
+    """Ghi điểm/hạng tính lại: {customerId: (điểm, hạng)}"""
+    session = db.session
+    session.execute(
+        update(_customers).where(_customers.c.customerId == bindparam('b_customerId')).values(
+            loyaltyPoints=bindparam('b_points'), membershipLevel=bindparam('b_level')
+        ),
+        [{'b_customerId': customer_id, 'b_points': points, 'b_level': level}
+         for customer_id, (points, level) in states.items()]
+    )
+    bump_table_versions(session.connection(), {'customers'})
@@ -0,0 +1,125 @@
+# dao/directory_dao.py
+"""
+Danh bạ in-memory dùng chung trong process: customerId/employeeId -> tên, số điện thoại.
+
+Được nạp hàng loạt khi khởi động và cập nhật write-through khi tài khoản thay đổi,
+để các API danh sách lấy tên khách hàng/nhân viên từ bộ nhớ thay vì query accounts
+cho từng dòng. Để giới hạn độ trễ giữa các worker gunicorn (mỗi worker một bản), danh
+bạ được nạp lại toàn bộ bằng một query sau mỗi DIRECTORY_TTL giây (lười, ở lần tra cứu
+đầu tiên sau đó); entry sống 2 * DIRECTORY_TTL nên không hết hạn trước lần nạp lại.
+"""
+import threading
+import time
+
+from __init__ import db
+from models import Account
+from cache import TTLCache
+from .utils import run_after_commit
+
+DIRECTORY_MAXSIZE = 50000
+DIRECTORY_TTL = 300
+_directory = TTLCache(maxsize=DIRECTORY_MAXSIZE, ttl=2 * DIRECTORY_TTL)
+_refresh_lock = threading.Lock()
+_warmed_at = None
+
+
+def _contact(full_name, phone):
+    return {'name': full_name, 'phone': phone}
+
+
+def _load_contact(column, party_id):
+    row = db.session.query(Account.fullName, Account.phone).filter(column == party_id).first()
+    return _contact(row.fullName, row.phone) if row else None
+
+
+def _refresh_if_stale():
+    """Nạp lại toàn bộ danh bạ nếu lần nạp trước đã quá DIRECTORY_TTL giây
+
+    Chỉ một thread nạp; các thread khác dùng entry hiện có (chưa hết hạn) trong lúc chờ.
+    """
+    if _warmed_at is not None and time.monotonic() - _warmed_at < DIRECTORY_TTL:
+        return
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        if _warmed_at is None or time.monotonic() - _warmed_at >= DIRECTORY_TTL:
+            warm_directory()
+    finally:
+        _refresh_lock.release()
+
+
+def get_customer_contact(customer_id):
+    """Tên/số điện thoại của khách hàng, None nếu không có tài khoản"""
+    _refresh_if_stale()
+    return _directory.get_or_load(('customer', customer_id),
+                                  lambda: _load_contact(Account.customerId, customer_id))
+
+
+def get_employee_contact(employee_id):
+    """Tên/số điện thoại của nhân viên, None nếu không có tài khoản"""
+    _refresh_if_stale()
+    return _directory.get_or_load(('employee', employee_id),
+                                  lambda: _load_contact(Account.employeeId, employee_id))
+
+
+def get_customer_name(customer_id):
+    """Tên khách hàng, 'N/A' nếu không có tài khoản"""
+    contact = get_customer_contact(customer_id)
+    return contact['name'] if contact else 'N/A'
+
+
+def get_employee_name(employee_id):
+    """Tên nhân viên, 'N/A' nếu không có tài khoản"""
+    contact = get_employee_contact(employee_id)
+    return contact['name'] if contact else 'N/A'
+
+
+def warm_directory():
+    """Nạp toàn bộ danh bạ bằng một query (khi khởi động và sau mỗi DIRECTORY_TTL giây)"""
+    global _warmed_at
+    _warmed_at = time.monotonic()
+    rows = db.session.query(
+        Account.customerId, Account.employeeId, Account.fullName, Account.phone
+    ).limit(DIRECTORY_MAXSIZE).all()
+
+    for row in rows:
+        contact = _contact(row.fullName, row.phone)
+        if row.customerId:
+            _directory.set(('customer', row.customerId), contact)
+        if row.employeeId:
+            _directory.set(('employee', row.employeeId), contact)
+    return len(rows)
+
+
+def remember_account(account):
+    """Ghi thông tin tài khoản vào danh bạ (write-through, sau khi transaction commit)"""
+    if account is None:
+        return
+    contact = _contact(account.fullName, account.phone)
+    keys = []
+    if account.customerId:
+        keys.append(('customer', account.customerId))
+    if account.employeeId:
+        keys.append(('employee', account.employeeId))
+
+    def write():
+        for key in keys:
+            _directory.set(key, contact)
+
+    run_after_commit(write)
+
+
+def forget_party(customer_id=None, employee_id=None):
+    """Xóa khách hàng/nhân viên khỏi danh bạ (sau khi transaction commit)"""
+    def forget():
+        if customer_id:
+            _directory.invalidate(('customer', customer_id))
+        if employee_id:
+            _directory.invalidate(('employee', employee_id))
+
+    run_after_commit(forget)
+
+
+def get_directory_stats():
+    """Thống kê hit/miss của danh bạ"""
+    return _directory.stats()
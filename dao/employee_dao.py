@@ -2,8 +2,17 @@
 """
 Data Access Object cho Employee
 """
+from datetime import datetime
+
 from __init__ import db
 from models import Employee, Account
+from .directory_dao import remember_account
+
+# Các kiểu sắp xếp của danh bạ nhân viên: (cột, cột khóa, chuyển giá trị cursor)
+EMPLOYEE_SORTS = {
+    'name': (db.collate(Account.fullName, 'NOCASE'), Account.employeeId, None),
+    'createdAt': (Account.createdAt, Account.employeeId, datetime.fromisoformat),
+}
 
 
 def get_all_employees():
@@ -16,6 +25,25 @@ def get_all_employees():
     return employees
 
 
+def get_employee_page(page, position=None, department=None):
+    """Một trang danh bạ nhân viên active, không gồm cashier (một query join employees - accounts)
+
+    page: pagination.PageRequest (sort theo EMPLOYEE_SORTS)
+    """
+    query = db.session.query(
+        Employee.employeeId, Employee.position, Employee.department,
+        Account.fullName, Account.phone, Account.email
+    ).join(Account, Account.employeeId == Employee.employeeId).filter(
+        Employee.active == True,
+        Account.role == 'Employee'
+    )
+    if position:
+        query = query.filter(Employee.position == position)
+    if department:
+        query = query.filter(Employee.department == department)
+    return page.fetch(query)
+
+
 def get_employee_by_id(employee_id):
     """Lấy thông tin nhân viên theo ID"""
     return Employee.query.filter_by(employeeId=employee_id, active=True).first()
@@ -30,7 +58,7 @@ def create_employee(data):
         active=True
     )
     db.session.add(employee)
-    db.session.commit()
+    db.session.flush()
     return employee
 
 
@@ -51,8 +79,9 @@ def update_employee(employee_id, data):
             employee.position = data['position']
         if 'department' in data:
             employee.department = data['department']
-            
-        db.session.commit()
+
+        db.session.flush()
+        remember_account(account)
     return employee
 
 
@@ -61,6 +90,6 @@ def delete_employee(employee_id):
     employee = Employee.query.get(employee_id)
     if employee:
         employee.active = False
-        db.session.commit()
+        db.session.flush()
         return True
     return False
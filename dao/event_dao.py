@@ -0,0 +1,99 @@
+# dao/event_dao.py
+"""
+Data Access Object cho sự kiện thay đổi booking.
+
+Mỗi lần flush có booking được tạo/sửa/xóa, một dòng được ghi vào booking_events
+trong cùng transaction (rollback thì sự kiện cũng mất). eventId tăng dần theo thứ
+tự commit (SQLite chỉ có một writer), nên các worker đọc bằng eventId > last_id.
+"""
+import json
+
+from sqlalchemy import event, insert, inspect, func
+from sqlalchemy.orm import Session
+from __init__ import db
+from models import Booking, BookingEvent
+
+_events = BookingEvent.__table__
+
+
+def _booking_payload(booking):
+    return {
+        'bookingId': booking.bookingId,
+        'status': booking.status,
+        'time': booking.time.isoformat() if booking.time else None,
+        'customerId': booking.customerId,
+        'employeeId': booking.employeeId,
+        'servicesId': booking.servicesId,
+        'invoiceId': booking.invoiceId
+    }
+
+
+def _booking_change_types(booking):
+    """Các loại sự kiện ứng với thay đổi của một booking đã có"""
+    attrs = inspect(booking).attrs
+    types = []
+    if attrs.status.history.has_changes():
+        types.append('status_changed')
+    if attrs.invoiceId.history.has_changes():
+        types.append('invoiced' if booking.invoiceId else 'updated')
+    if not types:
+        types.append('updated')
+    return types
+
+
+def _event_row(event_type, booking):
+    return {
+        'bookingId': booking.bookingId,
+        'type': event_type,
+        'data': json.dumps(dict(_booking_payload(booking), type=event_type), ensure_ascii=False)
+    }
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_booking_events(session, flush_context, instances):
+    rows = []
+    for obj in session.new:
+        if isinstance(obj, Booking):
+            rows.append(_event_row('created', obj))
+    for obj in session.dirty:
+        if isinstance(obj, Booking) and session.is_modified(obj, include_collections=False):
+            rows.extend(_event_row(event_type, obj) for event_type in _booking_change_types(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Booking):
+            rows.append(_event_row('deleted', obj))
+
+    if rows:
+        session.connection().execute(insert(_events), rows)
+        # events.py dựa vào cờ này để đánh thức poller ngay sau commit
+        session.info['booking_events'] = True
+
+
+def record_booking_events(session, event_type, bookings):
+    """Ghi sự kiện cho các booking thay đổi bằng câu lệnh Core (không đi qua flush ORM)
+
+    bookings: các object/dòng có đủ thuộc tính của _booking_payload, mang giá trị mới.
+    """
+    rows = [_event_row(event_type, booking) for booking in bookings]
+    if rows:
+        session.connection().execute(insert(_events), rows)
+        session.info['booking_events'] = True
+
+
+def get_booking_events_after(last_event_id, limit=500):
+    """Các sự kiện có eventId > last_event_id, theo thứ tự"""
+    rows = db.session.query(BookingEvent.eventId, BookingEvent.type, BookingEvent.data).filter(
+        BookingEvent.eventId > last_event_id
+    ).order_by(BookingEvent.eventId).limit(limit).all()
+    return [{'id': row.eventId, 'type': row.type, 'data': row.data} for row in rows]
+
+
+def get_last_booking_event_id():
+    """eventId lớn nhất hiện có (0 nếu chưa có sự kiện)"""
+    return db.session.query(func.coalesce(func.max(BookingEvent.eventId), 0)).scalar()
+
+
+def delete_booking_events_before(cutoff):
+    """Xóa các sự kiện cũ hơn cutoff"""
+    deleted = BookingEvent.query.filter(BookingEvent.createdAt < cutoff).delete(synchronize_session=False)
+    db.session.flush()
+    return deleted
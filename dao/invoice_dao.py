@@ -2,13 +2,21 @@
 """
 Data Access Object cho Invoice
 """
+from types import SimpleNamespace
+
+from sqlalchemy import insert, update, select, bindparam, func
 from __init__ import db
 from models import Invoice, Booking
+from .event_dao import record_booking_events
+from .version_dao import bump_table_versions
 
 
-def get_all_invoices():
-    """Lấy danh sách tất cả hóa đơn"""
-    return Invoice.query.all()
+def get_all_invoices(since=None):
+    """Lấy danh sách tất cả hóa đơn (hoặc các hóa đơn thay đổi từ thời điểm since)"""
+    query = Invoice.query
+    if since is not None:
+        query = query.filter(Invoice.updatedAt >= since)
+    return query.all()
 
 
 def get_invoice_by_id(invoice_id):
@@ -17,9 +25,10 @@ def get_invoice_by_id(invoice_id):
 
 
 def create_invoice(invoice_data, booking_id):
-    """Tạo hóa đơn mới"""
+    """Tạo hóa đơn mới (booking đã có hóa đơn -> IntegrityError khi flush)"""
     invoice = Invoice(
         invoiceId=invoice_data['invoiceId'],
+        bookingId=booking_id,
         customerId=invoice_data['customerId'],
         total=invoice_data['total'],
         vat=invoice_data['vat'],
@@ -32,10 +41,44 @@ def create_invoice(invoice_data, booking_id):
         booking.invoiceId = invoice_data['invoiceId']
 
     db.session.add(invoice)
-    db.session.commit()
+    db.session.flush()
     return invoice
 
 
+def create_invoices_bulk(invoices, bookings):
+    """Tạo nhiều hóa đơn và gắn vào booking (trong transaction của request)
+
+    invoices: dict {invoiceId, bookingId, customerId, total, vat, discount, finalTotal}
+    bookings: các dòng booking (dao.get_bookings_for_quote) để ghi sự kiện 'invoiced'.
+    Dùng executemany của Core thay vì từng object ORM, nên version bảng và sự kiện
+    booking (bình thường do listener before_flush ghi) được ghi trực tiếp ở đây.
+    Booking đã được gắn hóa đơn khác trong lúc xử lý -> IntegrityError (uq_invoices_bookingId,
+    request bị rollback).
+    """
+    if not invoices:
+        return 0
+
+    session = db.session
+    session.execute(insert(Invoice), [
+        {key: invoice[key] for key in ('invoiceId', 'bookingId', 'customerId', 'total', 'vat', 'discount', 'finalTotal')}
+        for invoice in invoices
+    ])
+    session.execute(
+        update(Booking.__table__).where(
+            Booking.__table__.c.bookingId == bindparam('b_bookingId')
+        ).values(invoiceId=bindparam('b_invoiceId')),
+        [{'b_bookingId': invoice['bookingId'], 'b_invoiceId': invoice['invoiceId']} for invoice in invoices]
+    )
+
+    invoice_ids = {invoice['bookingId']: invoice['invoiceId'] for invoice in invoices}
+    record_booking_events(session, 'invoiced', [
+        SimpleNamespace(**dict(row._asdict(), invoiceId=invoice_ids[row.bookingId]))
+        for row in bookings if row.bookingId in invoice_ids
+    ])
+    bump_table_versions(session.connection(), {'invoices', 'bookings'})
+    return len(invoices)
+
+
 def update_invoice(invoice_id, invoice_data):
     """Cập nhật thông tin hóa đơn"""
     invoice = Invoice.query.get(invoice_id)
@@ -44,7 +87,7 @@ def update_invoice(invoice_id, invoice_data):
         invoice.discount = invoice_data['discount']
         invoice.vat = invoice_data['vat']
         invoice.finalTotal = invoice_data['finalTotal']
-        db.session.commit()
+        db.session.flush()
     return invoice
 
 
@@ -55,6 +98,41 @@ def delete_invoice(invoice_id):
         if invoice.booking:
             invoice.booking.invoiceId = None
         db.session.delete(invoice)
-        db.session.commit()
+        db.session.flush()
         return True
-    return False
\ No newline at end of file
+    return False
+
+
+def link_invoices_to_bookings():
+    """Điền invoices.bookingId cho hóa đơn tạo trước khi có cột này (chạy khi khởi động)"""
+    bookings = Booking.__table__
+    invoices = Invoice.__table__
+    db.session.execute(
+        update(invoices).where(invoices.c.bookingId.is_(None)).values(
+            bookingId=select(bookings.c.bookingId).where(bookings.c.invoiceId == invoices.c.invoiceId)
+            .limit(1).scalar_subquery()
+        )
+    )
+
+
+def unlink_duplicate_invoices():
+    """Bỏ liên kết booking của các hóa đơn trùng booking (chạy khi khởi động, trước khi tạo uq_invoices_bookingId)
+
+    Giữ hóa đơn mà booking đang trỏ tới (bookings.invoiceId), không có thì giữ hóa đơn có mã
+    nhỏ nhất; các hóa đơn còn lại vẫn được giữ nguyên, chỉ bỏ bookingId. Trả về các hóa đơn đã bỏ liên kết.
+    """
+    duplicated = select(Invoice.bookingId).where(Invoice.bookingId.isnot(None)).group_by(
+        Invoice.bookingId).having(func.count() > 1)
+    invoices = Invoice.query.filter(Invoice.bookingId.in_(duplicated)).order_by(Invoice.invoiceId).all()
+
+    kept = {}
+    for invoice in invoices:
+        if invoice.booking is not None and invoice.booking.invoiceId == invoice.invoiceId:
+            kept[invoice.bookingId] = invoice.invoiceId
+    unlinked = []
+    for invoice in invoices:
+        if kept.setdefault(invoice.bookingId, invoice.invoiceId) != invoice.invoiceId:
+            unlinked.append(SimpleNamespace(invoiceId=invoice.invoiceId, bookingId=invoice.bookingId))
+            invoice.bookingId = None
+    db.session.flush()
+    return unlinked
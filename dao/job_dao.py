@@ -0,0 +1,151 @@
+# dao/job_dao.py
+"""
+Data Access Object cho hàng đợi job nền (xem jobs.py).
+
+Job được ghi vào bảng jobs trong transaction của request: rollback thì job cũng mất,
+commit thì job chắc chắn còn đó kể cả khi process chết ngay sau đó. Worker nhận job
+bằng một câu UPDATE ... RETURNING nên hai worker (kể cả khác process) không bao giờ
+nhận cùng một job.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from __init__ import db
+from models import Job, JobSchedule
+
+_jobs = Job.__table__
+_schedules = JobSchedule.__table__
+
+
+def enqueue_job(name, payload=None, run_at=None, dedup_key=None, max_attempts=5):
+    """Thêm job vào hàng đợi (trong transaction hiện tại)
+
+    Trả về jobId, hoặc None nếu đã có job cùng dedupKey đang chờ/đang chạy.
+    """
+    now = datetime.now()
+    stmt = sqlite_insert(_jobs).values(
+        name=name,
+        payload=json.dumps(payload or {}, ensure_ascii=False),
+        status='queued',
+        dedupKey=dedup_key,
+        attempts=0,
+        maxAttempts=max_attempts,
+        runAt=run_at or now,
+        createdAt=now
+    )
+    if dedup_key is not None:
+        stmt = stmt.on_conflict_do_nothing(
+            # Điều kiện phải khớp index một phần uq_jobs_dedupKey_active
+            index_elements=[_jobs.c.dedupKey],
+            index_where=db.text("status IN ('queued', 'running')")
+        )
+    return db.session.execute(stmt.returning(_jobs.c.jobId)).scalar()
+
+
+def claim_job(worker_id):
+    """Nhận job đến hạn sớm nhất (status -> running), None nếu không có job nào"""
+    now = datetime.now()
+    next_job = select(_jobs.c.jobId).where(
+        _jobs.c.status == 'queued', _jobs.c.runAt <= now
+    ).order_by(_jobs.c.runAt).limit(1).scalar_subquery()
+
+    return db.session.execute(
+        update(_jobs).where(_jobs.c.jobId == next_job, _jobs.c.status == 'queued').values(
+            status='running', attempts=_jobs.c.attempts + 1, startedAt=now, lockedBy=worker_id
+        ).returning(
+            _jobs.c.jobId, _jobs.c.name, _jobs.c.payload, _jobs.c.attempts, _jobs.c.maxAttempts,
+            _jobs.c.runAt, _jobs.c.startedAt
+        )
+    ).first()
+
+
+def complete_job(job_id):
+    """Đánh dấu job chạy xong"""
+    db.session.execute(
+        update(_jobs).where(_jobs.c.jobId == job_id).values(
+            status='done', finishedAt=datetime.now(), lockedBy=None, lastError=None
+        )
+    )
+
+
+def fail_job(job_id, error, retry_at=None):
+    """Job lỗi: chạy lại lúc retry_at, hoặc chuyển sang failed nếu retry_at là None"""
+    values = {'lockedBy': None, 'lastError': error}
+    if retry_at is not None:
+        values.update(status='queued', runAt=retry_at)
+    else:
+        values.update(status='failed', finishedAt=datetime.now())
+    db.session.execute(update(_jobs).where(_jobs.c.jobId == job_id).values(**values))
+
+
+def requeue_stale_jobs(started_before):
+    """Trả lại hàng đợi các job 'running' quá hạn (process chạy job đã chết)"""
+    return db.session.execute(
+        update(_jobs).where(_jobs.c.status == 'running', _jobs.c.startedAt < started_before).values(
+            status='queued', lockedBy=None, lastError='Worker không phản hồi, chạy lại'
+        )
+    ).rowcount
+
+
+def delete_finished_jobs_before(cutoff):
+    """Xóa các job đã xong/thất bại trước cutoff"""
+    return db.session.execute(
+        delete(_jobs).where(_jobs.c.status.in_(('done', 'failed')), _jobs.c.finishedAt < cutoff)
+    ).rowcount
+
+
+def get_job_queue_stats():
+    """Độ sâu hàng đợi theo trạng thái, số job đến hạn và job đến hạn lâu nhất - một câu SQL"""
+    now = datetime.now()
+    rows = db.session.execute(
+        select(
+            _jobs.c.status,
+            func.count(),
+            func.sum(_jobs.c.runAt <= now),
+            func.min(_jobs.c.runAt)
+        ).group_by(_jobs.c.status)
+    ).all()
+
+    counts = {status: 0 for status in ('queued', 'running', 'done', 'failed')}
+    ready, oldest_ready = 0, None
+    for status, count, due, oldest in rows:
+        counts[status] = count
+        if status == 'queued':
+            ready = int(due or 0)
+            if ready:
+                oldest_ready = oldest
+    return {
+        'depth': counts,
+        'ready': ready,
+        'delayed': counts['queued'] - ready,
+        'oldestReadyAgeSeconds': round((now - oldest_ready).total_seconds(), 3) if oldest_ready else 0.0
+    }
+
+
+def get_job_schedules():
+    """Lịch chạy định kỳ: {name: (cron, nextRunAt)}"""
+    rows = db.session.execute(select(_schedules.c.name, _schedules.c.cron, _schedules.c.nextRunAt)).all()
+    return {row.name: (row.cron, row.nextRunAt) for row in rows}
+
+
+def save_job_schedule(name, cron, next_run_at):
+    """Tạo/cập nhật lịch chạy định kỳ (khi thêm job định kỳ mới hoặc đổi biểu thức cron)"""
+    stmt = sqlite_insert(_schedules).values(name=name, cron=cron, nextRunAt=next_run_at)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[_schedules.c.name], set_={'cron': cron, 'nextRunAt': next_run_at}
+    ))
+
+
+def advance_job_schedule(name, due_at, next_run_at):
+    """Chuyển lịch sang lần chạy kế tiếp nếu vẫn đang ở due_at
+
+    Trả về True nếu process này giành được lần chạy due_at (compare-and-set, nên
+    nhiều process cùng chạy scheduler thì mỗi lần chạy chỉ được enqueue một lần).
+    """
+    return db.session.execute(
+        update(_schedules).where(_schedules.c.name == name, _schedules.c.nextRunAt == due_at).values(
+            nextRunAt=next_run_at
+        )
+    ).rowcount == 1
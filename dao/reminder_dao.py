@@ -0,0 +1,64 @@
+# dao/reminder_dao.py
+"""
+Data Access Object cho nhắc lịch hẹn (xem reminders.py).
+
+Scheduler chỉ đọc booking theo khoảng thời gian (index bookings.time), không quét
+toàn bảng; reminder_log ghi lại các lần nhắc đã nhận gửi để nhiều process cùng
+chạy scheduler thì mỗi lần nhắc vẫn chỉ gửi một lần.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from __init__ import db
+from models import Booking, Service, Account, ReminderLog
+
+# Booking ở các trạng thái này không được nhắc lịch
+INACTIVE_BOOKING_STATUSES = ('Từ chối', 'Đã hủy')
+
+
+def get_upcoming_bookings(start, end):
+    """Booking còn hiệu lực có time trong (start, end] - range scan trên ix_bookings_time"""
+    return db.session.execute(
+        select(Booking.bookingId, Booking.time, Booking.status).where(
+            Booking.time > start,
+            Booking.time <= end,
+            Booking.status.notin_(INACTIVE_BOOKING_STATUSES)
+        )
+    ).all()
+
+
+def claim_reminder(booking_id, remind_at, lead_minutes, booking_time):
+    """Ghi nhận một lần nhắc; False nếu process khác đã nhận gửi lần nhắc này"""
+    stmt = sqlite_insert(ReminderLog.__table__).values(
+        bookingId=booking_id,
+        remindAt=remind_at,
+        leadMinutes=lead_minutes,
+        bookingTime=booking_time,
+        createdAt=datetime.now()
+    ).on_conflict_do_nothing()
+    return db.session.execute(stmt).rowcount == 1
+
+
+def get_booking_reminder(booking_id):
+    """Thông tin gửi nhắc lịch của một booking (dịch vụ, khách hàng, nhân viên) - một câu SQL"""
+    employee = Account.__table__.alias('employee_account')
+    return db.session.execute(
+        select(
+            Booking.bookingId, Booking.time, Booking.status, Booking.customerId, Booking.employeeId,
+            Service.name.label('serviceName'),
+            Account.fullName.label('customerName'), Account.phone, Account.email,
+            employee.c.fullName.label('employeeName')
+        ).join(Service, Service.servicesId == Booking.servicesId).outerjoin(
+            Account, Account.customerId == Booking.customerId
+        ).outerjoin(
+            employee, employee.c.employeeId == Booking.employeeId
+        ).where(Booking.bookingId == booking_id)
+    ).first()
+
+
+def delete_reminder_log_before(cutoff):
+    """Xóa nhắc lịch đã gửi của các booking trước cutoff"""
+    return db.session.execute(
+        delete(ReminderLog.__table__).where(ReminderLog.bookingTime < cutoff)
+    ).rowcount
@@ -0,0 +1,164 @@
+# dao/search_dao.py
+"""
+Data Access Object cho tìm kiếm khách hàng (SQLite FTS5).
+
+Bảng ảo account_search chứa fullName, phone, email, username; được đồng bộ bằng
+trigger trên accounts nên mọi đường ghi (DAO, route, Flask-Admin) đều cập nhật index.
+rowid của account_search là khóa số của bảng account_search_keys (id INTEGER PRIMARY KEY
+<-> accountId UNIQUE): không dùng rowid ngầm của accounts vì VACUUM có thể đánh số lại,
+còn id do bảng khóa cấp không bao giờ đổi và tăng theo thứ tự tạo tài khoản. Tokenizer unicode61 remove_diacritics 2 bỏ dấu
+tiếng Việt; riêng 'đ' không phải chữ có dấu trong Unicode nên được đổi thành 'd'
+ngay trong trigger (và trong câu tìm kiếm).
+"""
+import re
+
+from sqlalchemy import text, select, column, false
+from sqlalchemy.orm import aliased
+from __init__ import db
+from models import Account, Customer
+
+SEARCH_COLUMNS = ('fullName', 'phone', 'email', 'username')
+MAX_SEARCH_TERMS = 8
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def _normalized(expr):
+    return f"replace(replace(coalesce({expr}, ''), 'đ', 'd'), 'Đ', 'D')"
+
+
+def _values(prefix):
+    return ', '.join(_normalized(f'{prefix}."{column}"') for column in SEARCH_COLUMNS)
+
+
+_COLUMNS = ', '.join(f'"{column}"' for column in SEARCH_COLUMNS)
+
+def _key_id(prefix):
+    return f'(SELECT id FROM account_search_keys WHERE "accountId" = {prefix}."accountId")'
+
+
+_SEARCH_INDEX_DDL = [
+    """CREATE TABLE IF NOT EXISTS account_search_keys (
+        id INTEGER PRIMARY KEY, "accountId" VARCHAR(50) NOT NULL UNIQUE
+    )""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS account_search USING fts5(
+        {_COLUMNS}, tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS account_search_ai AFTER INSERT ON accounts BEGIN
+        INSERT INTO account_search_keys("accountId") VALUES (new."accountId");
+        INSERT INTO account_search(rowid, {_COLUMNS}) VALUES ({_key_id('new')}, {_values('new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS account_search_au AFTER UPDATE ON accounts BEGIN
+        DELETE FROM account_search WHERE rowid = {_key_id('old')};
+        UPDATE account_search_keys SET "accountId" = new."accountId" WHERE "accountId" = old."accountId";
+        INSERT INTO account_search(rowid, {_COLUMNS}) VALUES ({_key_id('new')}, {_values('new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS account_search_ad AFTER DELETE ON accounts BEGIN
+        DELETE FROM account_search WHERE rowid = {_key_id('old')};
+        DELETE FROM account_search_keys WHERE "accountId" = old."accountId";
+    END""",
+]
+
+# Index cũ (rowid = rowid của accounts): xóa rồi tạo lại
+_OLD_SEARCH_INDEX = ('account_search_ai', 'account_search_au', 'account_search_ad', 'account_search')
+
+
+def search_index_available():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def create_account_search_index():
+    """Tạo bảng FTS5 và trigger (nếu chưa có), nạp dữ liệu lần đầu"""
+    if not search_index_available():
+        return False
+
+    with db.engine.begin() as conn:
+        tables = set(conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('account_search', 'account_search_keys')"
+        )).scalars())
+        if 'account_search' in tables and 'account_search_keys' not in tables:
+            for name in _OLD_SEARCH_INDEX[:-1]:
+                conn.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+            conn.execute(text(f'DROP TABLE {_OLD_SEARCH_INDEX[-1]}'))
+            tables.clear()
+        for ddl in _SEARCH_INDEX_DDL:
+            conn.execute(text(ddl))
+        if not tables:
+            conn.execute(text(
+                'INSERT INTO account_search_keys("accountId") SELECT "accountId" FROM accounts '
+                'ORDER BY "createdAt", "accountId"'
+            ))
+            conn.execute(text(
+                f'INSERT INTO account_search(rowid, {_COLUMNS}) SELECT k.id, {_values("accounts")} '
+                'FROM accounts JOIN account_search_keys k ON k."accountId" = accounts."accountId"'
+            ))
+    return True
+
+
+def build_match_query(q):
+    """Chuyển chuỗi người dùng nhập thành câu MATCH: mọi từ đều phải khớp tiền tố"""
+    q = q.replace('đ', 'd').replace('Đ', 'D')
+    terms = _TERM.findall(q)[:MAX_SEARCH_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_customers(q, limit=20):
+    """Tìm khách hàng active theo tên, số điện thoại, email, username (khớp tiền tố, không dấu)
+
+    Kết quả xếp theo tài khoản mới nhất trước. Không xếp theo rank (bm25): với từ
+    tiền tố ngắn, bm25 phải chấm điểm mọi dòng khớp (hàng trăm ms ở 500k khách hàng),
+    còn ORDER BY rowid DESC (id của account_search_keys) cho phép FTS5 dừng ngay khi đủ LIMIT dòng.
+    """
+    match = build_match_query(q)
+    if not match:
+        return []
+
+    if not search_index_available():
+        # Database khác SQLite: tìm tiền tố bằng LIKE
+        pattern = f'{q}%'
+        return db.session.query(
+            Account.accountId, Account.customerId, Account.fullName, Account.phone,
+            Account.email, Account.username, Customer.loyaltyPoints, Customer.membershipLevel
+        ).join(Customer, Customer.customerId == Account.customerId).filter(
+            Customer.active == True,
+            db.or_(*(getattr(Account, column).like(pattern) for column in SEARCH_COLUMNS))
+        ).limit(limit).all()
+
+    return db.session.execute(text('''
+        SELECT a."accountId", a."customerId", a."fullName", a.phone, a.email, a.username,
+               c."loyaltyPoints", c."membershipLevel"
+        FROM account_search
+        JOIN account_search_keys k ON k.id = account_search.rowid
+        JOIN accounts a ON a."accountId" = k."accountId"
+        JOIN customers c ON c."customerId" = a."customerId"
+        WHERE account_search MATCH :match AND c.active = 1
+        ORDER BY account_search.rowid DESC
+        LIMIT :limit
+    '''), {'match': match, 'limit': limit}).all()
+
+
+def search_account_keys(q, key):
+    """Subquery các giá trị cột accounts.<key> ('accountId', 'customerId', 'employeeId') của
+    tài khoản khớp q - để lọc danh sách theo kết quả FTS (Flask-Admin), không giới hạn số dòng
+    """
+    if key not in ('accountId', 'customerId', 'employeeId'):
+        raise ValueError(f'Cột không hợp lệ: {key}')
+    match = build_match_query(q)
+    if not match:
+        return select(column(key)).where(false())
+
+    if not search_index_available():
+        account = aliased(Account)
+        pattern = f'{q}%'
+        return select(getattr(account, key)).where(
+            db.or_(*(getattr(account, name).like(pattern) for name in SEARCH_COLUMNS))
+        )
+
+    # Câu SQL thuần: không bị correlate với bảng accounts của query bên ngoài
+    return text(f'''
+        SELECT a."{key}"
+        FROM account_search
+        JOIN account_search_keys k ON k.id = account_search.rowid
+        JOIN accounts a ON a."accountId" = k."accountId"
+        WHERE account_search MATCH :match
+    ''').bindparams(match=match).columns(column(key))
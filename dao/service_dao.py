@@ -6,9 +6,12 @@ from __init__ import db
 from models import Service
 
 
-def get_all_services():
-    """Lấy danh sách tất cả dịch vụ"""
-    return Service.query.all()
+def get_all_services(since=None):
+    """Lấy danh sách tất cả dịch vụ (hoặc các dịch vụ thay đổi từ thời điểm since)"""
+    query = Service.query
+    if since is not None:
+        query = query.filter(Service.updatedAt >= since)
+    return query.all()
 
 
 def get_service_by_id(service_id):
@@ -26,7 +29,7 @@ def create_service(data):
         note=data.get('note', '')
     )
     db.session.add(service)
-    db.session.commit()
+    db.session.flush()
     return service
 
 
@@ -39,7 +42,7 @@ def update_service(service_id, data):
         service.name = data.get('name', service.name)
         service.price = float(data.get('price', service.price))
         service.note = data.get('note', service.note)
-        db.session.commit()
+        db.session.flush()
     return service
 
 
@@ -48,6 +51,6 @@ def delete_service(service_id):
     service = Service.query.get(service_id)
     if service:
         db.session.delete(service)
-        db.session.commit()
+        db.session.flush()
         return True
     return False
\ No newline at end of file
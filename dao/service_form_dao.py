@@ -3,13 +3,18 @@
 Data Access Object cho ServiceForm
 """
 from datetime import datetime
+
+from sqlalchemy import select, func
 from __init__ import db
 from models import ServiceForm
 
 
-def get_all_service_forms():
-    """Lấy danh sách tất cả phiếu dịch vụ"""
-    return ServiceForm.query.all()
+def get_all_service_forms(since=None):
+    """Lấy danh sách tất cả phiếu dịch vụ (hoặc các phiếu thay đổi từ thời điểm since)"""
+    query = ServiceForm.query
+    if since is not None:
+        query = query.filter(ServiceForm.updatedAt >= since)
+    return query.all()
 
 
 def get_service_form_by_id(form_id):
@@ -28,7 +33,7 @@ def get_service_forms_by_booking(booking_id):
 
 
 def create_service_form(data):
-    """Tạo phiếu dịch vụ mới"""
+    """Tạo phiếu dịch vụ mới (booking đã có phiếu -> IntegrityError khi flush)"""
     service_form = ServiceForm(
         formId=data['formId'],
         bookingId=data['bookingId'],
@@ -40,7 +45,7 @@ def create_service_form(data):
         createdAt=datetime.now()
     )
     db.session.add(service_form)
-    db.session.commit()
+    db.session.flush()
     return service_form
 
 
@@ -52,7 +57,7 @@ def update_service_form(form_id, data):
         service_form.serviceDuration = int(data.get('serviceDuration', service_form.serviceDuration))
         service_form.servicePrice = float(data.get('servicePrice', service_form.servicePrice))
         service_form.serviceNote = data.get('serviceNote', service_form.serviceNote)
-        db.session.commit()
+        db.session.flush()
     return service_form
 
 
@@ -61,11 +66,28 @@ def delete_service_form(form_id):
     service_form = ServiceForm.query.get(form_id)
     if service_form:
         db.session.delete(service_form)
-        db.session.commit()
+        db.session.flush()
         return True
     return False
 
 
-def check_service_form_exists(booking_id):
-    """Kiểm tra đã có phiếu dịch vụ cho booking chưa"""
-    return ServiceForm.query.filter_by(bookingId=booking_id).first() is not None
\ No newline at end of file
+def delete_duplicate_service_forms():
+    """Xóa phiếu trùng booking (chạy khi khởi động, trước khi tạo uq_service_forms_bookingId)
+
+    Mỗi booking giữ phiếu được sửa gần nhất; trả về các phiếu đã xóa để ghi log.
+    """
+    duplicated = select(ServiceForm.bookingId).group_by(ServiceForm.bookingId).having(func.count() > 1)
+    forms = ServiceForm.query.filter(ServiceForm.bookingId.in_(duplicated)).order_by(
+        ServiceForm.bookingId, ServiceForm.updatedAt.desc(), ServiceForm.createdAt.desc(), ServiceForm.formId.desc()
+    ).all()
+
+    kept = set()
+    removed = []
+    for form in forms:
+        if form.bookingId in kept:
+            removed.append(form)
+            db.session.delete(form)
+        else:
+            kept.add(form.bookingId)
+    db.session.flush()
+    return removed
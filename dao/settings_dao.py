@@ -16,11 +16,26 @@ def get_setting_by_id(setting_id):
     return Settings.query.get(setting_id)
 
 
+def get_settings_values(setting_ids):
+    """Giá trị của nhiều cài đặt trong một query: {settingId: value}"""
+    rows = db.session.query(Settings.settingId, Settings.value).filter(Settings.settingId.in_(setting_ids)).all()
+    return dict(rows)
+
+
 def update_setting(setting_id, new_value):
     """Cập nhật giá trị cài đặt"""
     setting = Settings.query.get(setting_id)
     if setting:
         setting.value = new_value
-        db.session.commit()
+        db.session.flush()
         return True
-    return False
\ No newline at end of file
+    return False
+
+def set_setting_value(setting_id, value, description=None):
+    """Ghi giá trị cài đặt, tạo mới nếu chưa có"""
+    setting = Settings.query.get(setting_id)
+    if setting is None:
+        setting = Settings(settingId=setting_id, description=description)
+        db.session.add(setting)
+    setting.value = value
+    db.session.flush()
@@ -0,0 +1,49 @@
+# dao/stats_dao.py
+"""
+Data Access Object cho thống kê dashboard
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from __init__ import db
+from models import Customer, Service, Employee, Booking, Invoice
+from cache import TTLCache
+
+# Thống kê dashboard được cache ngắn hạn, đủ để nhiều lần tải trang không chạm DB
+DASHBOARD_STATS_TTL = 10
+_dashboard_cache = TTLCache(maxsize=1, ttl=DASHBOARD_STATS_TTL)
+
+
+def _count(model, *conditions):
+    """Scalar subquery COUNT(*) cho một bảng"""
+    return select(func.count()).select_from(model).where(*conditions).scalar_subquery()
+
+
+def _load_dashboard_stats():
+    """Lấy toàn bộ thống kê dashboard bằng một câu SQL duy nhất"""
+    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    today_end = today_start + timedelta(days=1)
+
+    today_revenue = select(func.coalesce(func.sum(Invoice.finalTotal), 0)).select_from(Invoice).join(
+        Booking, Booking.invoiceId == Invoice.invoiceId
+    ).where(
+        Booking.time >= today_start,
+        Booking.time < today_end
+    ).scalar_subquery()
+
+    row = db.session.execute(select(
+        _count(Customer, Customer.active == True).label('total_customers'),
+        _count(Service).label('total_services'),
+        _count(Employee, Employee.active == True).label('total_employees'),
+        _count(Booking).label('total_bookings'),
+        _count(Booking, Booking.status == 'Đang chờ').label('pending_bookings'),
+        _count(Invoice).label('total_invoices'),
+        _count(Booking, Booking.time >= today_start, Booking.time < today_end).label('today_bookings'),
+        today_revenue.label('today_revenue')
+    )).one()
+
+    return dict(row._mapping)
+
+
+def get_dashboard_stats():
+    """Thống kê cho trang chủ admin (cache DASHBOARD_STATS_TTL giây)"""
+    return _dashboard_cache.get_or_load('dashboard', _load_dashboard_stats)
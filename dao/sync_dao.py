@@ -0,0 +1,54 @@
+# dao/sync_dao.py
+"""
+Data Access Object cho đồng bộ delta.
+
+Các bảng đồng bộ có cột updatedAt (tự cập nhật khi sửa). Khi một dòng bị xóa,
+khóa chính của nó được ghi vào tombstones trong cùng transaction để client biết
+cần xóa dòng đó.
+"""
+from datetime import datetime
+
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import Session
+from __init__ import db
+from models import Tombstone
+
+# Các bảng hỗ trợ ?since=
+SYNC_TABLES = {'bookings', 'invoices', 'services', 'service_forms', 'accounts'}
+
+_tombstones = Tombstone.__table__
+
+
+def _row_id(obj):
+    identity = inspect(obj).identity
+    return str(identity[0]) if identity and len(identity) == 1 else None
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_tombstones(session, flush_context, instances):
+    now = datetime.now()
+    rows = []
+    for obj in session.deleted:
+        table_name = obj.__table__.name
+        row_id = _row_id(obj)
+        if table_name in SYNC_TABLES and row_id is not None:
+            rows.append({'tableName': table_name, 'rowId': row_id, 'deletedAt': now})
+
+    if rows:
+        session.connection().execute(insert(_tombstones), rows)
+
+
+def get_deleted_ids(table_name, since):
+    """Khóa chính các dòng của table_name bị xóa từ thời điểm since"""
+    rows = db.session.query(Tombstone.rowId).filter(
+        Tombstone.tableName == table_name,
+        Tombstone.deletedAt >= since
+    ).order_by(Tombstone.deletedAt).all()
+    return [row.rowId for row in rows]
+
+
+def delete_tombstones_before(cutoff):
+    """Xóa tombstone cũ hơn cutoff"""
+    deleted = Tombstone.query.filter(Tombstone.deletedAt < cutoff).delete(synchronize_session=False)
+    db.session.flush()
+    return deleted
@@ -2,9 +2,82 @@
 """
 Các hàm tiện ích và helper functions
 """
-import secrets
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from __init__ import db
 from models import Settings
+from ids import new_id
+
+
+@contextmanager
+def transaction():
+    """Một đơn vị công việc: commit một lần khi khối lệnh kết thúc, rollback nếu có lỗi
+
+    Các hàm DAO chỉ flush, không commit. Khối transaction() lồng nhau dùng chung
+    transaction của khối ngoài cùng (chỉ khối ngoài cùng commit/rollback).
+    """
+    session = db.session()
+    depth = session.info.get('transaction_depth', 0)
+    session.info['transaction_depth'] = depth + 1
+    try:
+        yield session
+        if depth == 0:
+            session.commit()
+    except BaseException:
+        if depth == 0:
+            session.rollback()
+        raise
+    finally:
+        session.info['transaction_depth'] = depth
+
+
+def run_after_commit(callback):
+    """Chạy callback sau khi transaction hiện tại commit (bỏ qua nếu rollback)
+
+    Dùng cho cache in-memory (write-through/invalidate) để không ghi dữ liệu chưa commit.
+    Không có transaction nào đang mở (vd. gọi sau khi đã commit) thì chạy ngay, vì sẽ không
+    còn lần commit nào để chạy callback.
+    """
+    session = db.session()
+    if not session.info.get('transaction_depth') and not session.in_transaction():
+        callback()
+        return
+    session.info.setdefault('after_commit', []).append(callback)
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_after_commit_callbacks(session):
+    for callback in session.info.pop('after_commit', ()):
+        callback()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_after_commit_callbacks(session):
+    session.info.pop('after_commit', None)
+
+
+# Thông báo cho vi phạm ràng buộc unique: khóa là "bảng.cột" (SQLite) hoặc tên index/constraint
+UNIQUE_VIOLATION_MESSAGES = {
+    'accounts.username': 'Username đã tồn tại',
+    'invoices.bookingId': 'Booking đã có hóa đơn',
+    'uq_invoices_bookingId': 'Booking đã có hóa đơn',
+    'invoices.invoiceId': 'Mã hóa đơn đã tồn tại',
+    'service_forms.bookingId': 'Booking này đã có phiếu dịch vụ',
+    'uq_service_forms_bookingId': 'Booking này đã có phiếu dịch vụ',
+    'services.servicesId': 'Mã dịch vụ đã tồn tại',
+    'bookings.bookingId': 'Mã booking đã tồn tại',
+}
+
+
+def integrity_error_message(error):
+    """Thông báo thân thiện cho IntegrityError (insert vi phạm ràng buộc của database)"""
+    detail = str(getattr(error, 'orig', error))
+    for key, message in UNIQUE_VIOLATION_MESSAGES.items():
+        if key in detail:
+            return message
+    return f'Dữ liệu vi phạm ràng buộc: {detail}'
 
 
 def get_setting_value(setting_id, default_value):
@@ -21,7 +94,10 @@ def init_default_settings():
         {'settingId': 'vat_rate', 'value': '10', 'description': 'Mức VAT (%)'},
         {'settingId': 'max_bookings_per_day', 'value': '5',
          'description': 'Số lượng booking tối đa mỗi nhân viên mỗi ngày'},
-        {'settingId': 'max_discount', 'value': '20', 'description': 'Phần trăm giảm giá tối đa (%)'}
+        {'settingId': 'max_discount', 'value': '20', 'description': 'Phần trăm giảm giá tối đa (%)'},
+        {'settingId': 'loyalty_point_value', 'value': '10000', 'description': 'Số tiền (VNĐ) cho 1 điểm tích lũy'},
+        {'settingId': 'loyalty_tiers', 'value': 'Silver:300,Gold:1000,Platinum:3000',
+         'description': 'Hạng thành viên theo điểm tích lũy (Hạng:điểm tối thiểu, cách nhau dấu phẩy)'}
     ]
 
     for setting in default_settings:
@@ -33,18 +109,39 @@ def init_default_settings():
             )
             db.session.add(new_setting)
 
-    db.session.commit()
+    db.session.flush()
 
 
 def generate_account_id():
     """Tạo mã tài khoản tự động"""
-    return 'ACC' + secrets.token_hex(4).upper()
+    return new_id('ACC')
 
 
 def generate_customer_id():
     """Tạo mã khách hàng tự động"""
-    return 'C' + secrets.token_hex(4).upper()
+    return new_id('C')
+
 
 def generate_employee_id():
     """Tạo mã nhân viên tự động"""
-    return 'E' + secrets.token_hex(4).upper()
\ No newline at end of file
+    return new_id('E')
+
+
+def generate_service_id():
+    """Tạo mã dịch vụ tự động"""
+    return new_id('SV')
+
+
+def generate_booking_id():
+    """Tạo mã booking tự động"""
+    return new_id('BK')
+
+
+def generate_invoice_id():
+    """Tạo mã hóa đơn tự động"""
+    return new_id('HD')
+
+
+def generate_service_form_id():
+    """Tạo mã phiếu dịch vụ tự động"""
+    return new_id('SF')
\ No newline at end of file
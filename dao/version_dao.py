@@ -0,0 +1,65 @@
+# dao/version_dao.py
+"""
+Data Access Object cho version của từng bảng.
+
+Mỗi lần flush có INSERT/UPDATE/DELETE trên một bảng, version của bảng đó được
+tăng trong cùng transaction (rollback thì version cũng rollback). Mọi đường ghi
+qua ORM (DAO, route, Flask-Admin) đều đi qua flush nên không bỏ sót.
+Version được lưu trong database để các worker gunicorn thấy cùng một giá trị.
+
+Chỉ các bảng có endpoint @etag_cached đọc version (đăng ký qua register_versioned_tables)
+mới được tăng version; ghi vào các bảng khác (jobs, booking_events, reminder_log,...)
+không phải UPDATE thêm dòng table_versions.
+"""
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+from __init__ import db
+from models import TableVersion
+
+_versions = TableVersion.__table__
+_versioned_tables = set()
+
+
+def register_versioned_tables(*table_names):
+    """Đăng ký các bảng cần theo dõi version (gọi khi khai báo endpoint @etag_cached)"""
+    _versioned_tables.update(table_names)
+
+
+def get_table_versions(table_names):
+    """Version hiện tại của các bảng (một query theo khóa chính), bảng chưa từng ghi -> 0"""
+    rows = db.session.query(TableVersion.tableName, TableVersion.version).filter(
+        TableVersion.tableName.in_(table_names)
+    ).all()
+    versions = dict(rows)
+    return {name: versions.get(name, 0) for name in table_names}
+
+
+def bump_table_versions(connection, table_names):
+    """Tăng version các bảng (chỉ bảng đã đăng ký) trên connection của transaction hiện tại"""
+    for name in sorted(_versioned_tables.intersection(table_names)):
+        result = connection.execute(
+            update(_versions).where(_versions.c.tableName == name).values(version=_versions.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(_versions).values(tableName=name, version=1))
+
+
+def _changed_tables(session):
+    """Tên các bảng đã đăng ký có object mới/bị sửa/bị xóa trong lần flush này"""
+    tables = set()
+    for obj in session.new:
+        tables.add(obj.__table__.name)
+    for obj in session.deleted:
+        tables.add(obj.__table__.name)
+    for obj in session.dirty:
+        name = obj.__table__.name
+        if name in _versioned_tables and name not in tables and session.is_modified(obj, include_collections=False):
+            tables.add(name)
+    return tables & _versioned_tables
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_versions_on_flush(session, flush_context, instances):
+    tables = _changed_tables(session)
+    if tables:
+        bump_table_versions(session.connection(), tables)
@@ -1,10 +1,12 @@
 # Chứa decorator tuỳ chỉnh dùng trong project (ví dụ: kiểm tra quyền, xác thực, caching hoặc logging cho các view/func...)
 # decorator.py
+import hashlib
 from functools import wraps
-from flask import request, jsonify, session
-import jwt
-from werkzeug.security import check_password_hash
+from flask import request, jsonify, session, make_response, current_app
+from sqlalchemy.exc import IntegrityError
 import dao
+from __init__ import db
+from access_log import activity_logger, current_account
 
 
 def login_required(f):
@@ -102,14 +104,47 @@ def handle_errors(f):
     def decorated_function(*args, **kwargs):
         try:
             return f(*args, **kwargs)
+        except IntegrityError as e:
+            # Ràng buộc unique/khóa chính do database kiểm tra thay cho query kiểm tra trước khi insert
+            db.session.rollback()
+            return jsonify({'success': False, 'message': dao.integrity_error_message(e)}), 400
         except ValueError as e:
+            db.session.rollback()
             return jsonify({'success': False, 'message': f'Dữ liệu không hợp lệ: {str(e)}'}), 400
         except Exception as e:
+            db.session.rollback()
             return jsonify({'success': False, 'message': f'Có lỗi xảy ra: {str(e)}'}), 500
 
     return decorated_function
 
 
+def _response_status(rv):
+    """Status code của giá trị view trả về (Response, (body, status[, headers]) hoặc body)"""
+    if isinstance(rv, tuple):
+        if len(rv) > 1 and isinstance(rv[1], int):
+            return rv[1]
+        rv = rv[0]
+    return getattr(rv, 'status_code', 200)
+
+
+def transactional(f):
+    """Decorator unit-of-work cho API ghi dữ liệu: một transaction, một lần commit mỗi request
+
+    Các hàm DAO chỉ flush; view trả về status < 400 thì commit, ngược lại (hoặc có
+    exception) thì rollback. Đặt ngay trên hàm view, bên dưới handle_errors.
+    """
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with dao.transaction() as session:
+            rv = f(*args, **kwargs)
+            if _response_status(rv) >= 400:
+                session.rollback()
+            return rv
+
+    return decorated_function
+
+
 def rate_limit(max_requests=60, per_minutes=1):
     """Decorator giới hạn số request (đơn giản)"""
     request_counts = {}
@@ -141,18 +176,18 @@ def rate_limit(max_requests=60, per_minutes=1):
 
 
 def log_activity(action_type="unknown"):
-    """Decorator ghi log hoạt động"""
+    """Decorator ghi log hoạt động (JSON, ghi bất đồng bộ qua access_log)"""
 
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            import datetime
-
-            # Ghi log đơn giản
-            timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            ip = request.remote_addr
-
-            print(f"[{timestamp}] {action_type} - IP: {ip} - Endpoint: {request.endpoint}")
+            # Chỉ đưa bản ghi vào hàng đợi, thread nền sẽ ghi ra stdout
+            activity_logger.info({
+                'action': action_type,
+                'ip': request.remote_addr,
+                'endpoint': request.endpoint,
+                'account': current_account()
+            })
 
             result = f(*args, **kwargs)
             return result
@@ -183,4 +218,44 @@ def cors_enabled(f):
 
         return resp
 
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+
+def etag_cached(*table_names):
+    """Decorator conditional GET: ETag theo version các bảng, If-None-Match -> 304
+
+    ETag được tính từ version hiện tại của table_names (một query nhỏ theo khóa chính),
+    nên khi khớp thì trả 304 ngay, không query hay serialize dữ liệu.
+    """
+    # Chỉ các bảng được đăng ký mới được tăng version khi ghi
+    dao.register_versioned_tables(*table_names)
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+
+            # Lấy version trước khi đọc dữ liệu: nếu có ghi xen giữa thì ETag cũ hơn dữ liệu,
+            # lần sau client sẽ nhận bản mới (không bao giờ gắn ETag mới cho dữ liệu cũ)
+            versions = dao.get_table_versions(table_names)
+            key = request.full_path + '|' + ','.join(f'{name}:{versions[name]}' for name in table_names)
+            etag = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+            max_age = current_app.config.get('CATALOG_CACHE_MAX_AGE', 0)
+            cache_control = f'max-age={max_age}, must-revalidate' if max_age else 'no-cache'
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+
+        return decorated_function
+
+    return decorator
@@ -0,0 +1,222 @@
+# events.py
+"""
+Hub publish/subscribe cho sự kiện booking (Server-Sent Events).
+
+- Sự kiện được ghi vào bảng booking_events cùng transaction với thay đổi booking
+  (xem dao/event_dao.py).
+- Mỗi process có một thread poller đọc các sự kiện mới (eventId > last_id) rồi
+  phát cho mọi client SSE đang kết nối tới process đó; nhờ vậy các worker gunicorn
+  khác nhau đều nhận được sự kiện mà không cần message broker.
+- Ghi trong cùng process thì poller được đánh thức ngay sau commit.
+- Client gửi lại Last-Event-ID khi kết nối lại để nhận tiếp các sự kiện bị lỡ.
+- Mỗi stream giữ một thread của worker gthread suốt thời gian kết nối, nên số kết nối
+  mỗi process luôn nhỏ hơn SERVER_THREADS (để dành thread cho API); quá giới hạn thì
+  trả 503, client thử lại sau. Khi worker tắt (graceful restart) mọi stream được đóng
+  ngay để không giữ worker đến hết graceful_timeout.
+"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import dao
+
+# Thời gian client chờ trước khi kết nối lại (ms)
+RETRY_MS = 3000
+
+
+class TooManySubscribers(Exception):
+    """Đã đạt số kết nối SSE tối đa của process"""
+
+
+class Subscriber:
+    """Một kết nối SSE: hàng đợi có giới hạn, bị đóng nếu đọc không kịp"""
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.closed = False
+
+
+class EventHub:
+    """Phát sự kiện booking cho các subscriber trong process"""
+
+    def __init__(self, app):
+        self.app = app
+        self.poll_interval = app.config['EVENTS_POLL_INTERVAL']
+        # Luôn chừa ít nhất một thread của worker cho các request API
+        self.max_subscribers = min(app.config['EVENTS_MAX_SUBSCRIBERS'], app.config['SERVER_THREADS'] - 1)
+        self.queue_size = app.config['EVENTS_SUBSCRIBER_QUEUE']
+        self.retention = timedelta(hours=app.config['EVENTS_RETENTION_HOURS'])
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._last_id = None
+        self._last_cleanup = 0.0
+        self._pid = None
+        self._closing = False
+
+    def _ensure_poller(self):
+        # Thread không sống sót qua fork: mỗi worker gunicorn tự khởi động poller riêng
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._last_id = None
+        threading.Thread(target=self._run, name='booking-event-poller', daemon=True).start()
+
+    def subscribe(self):
+        with self._lock:
+            if self._closing or len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers()
+            self._ensure_poller()
+            subscriber = Subscriber(self.queue_size)
+            self._subscribers.add(subscriber)
+        self._wake.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def close(self):
+        """Đóng mọi stream và từ chối kết nối mới (worker đang tắt)"""
+        with self._lock:
+            self._closing = True
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.closed = True
+            try:
+                # Đánh thức generator đang chờ trong queue.get
+                subscriber.queue.put_nowait(None)
+            except queue.Full:
+                pass
+
+    def wake(self):
+        """Đánh thức poller (gọi sau khi commit có sự kiện mới)"""
+        self._wake.set()
+
+    def stats(self):
+        return {
+            'subscribers': len(self._subscribers),
+            'maxSubscribers': self.max_subscribers,
+            'lastEventId': self._last_id
+        }
+
+    def _publish(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            for item in events:
+                try:
+                    subscriber.queue.put_nowait(item)
+                except queue.Full:
+                    # Client đọc không kịp: đóng stream, client kết nối lại với Last-Event-ID
+                    subscriber.closed = True
+                    break
+
+    def _poll(self):
+        if self._last_id is None:
+            self._last_id = dao.get_last_booking_event_id()
+
+        while True:
+            events = dao.get_booking_events_after(self._last_id)
+            if not events:
+                break
+            self._last_id = events[-1]['id']
+            self._publish(events)
+
+        now = time.monotonic()
+        if now - self._last_cleanup > 3600:
+            self._last_cleanup = now
+            with dao.transaction():
+                dao.delete_booking_events_before(datetime.now() - self.retention)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if not self._subscribers:
+                continue
+            try:
+                with self.app.app_context():
+                    self._poll()
+            except Exception as e:
+                self.app.logger.warning('Không đọc được booking_events: %s', e)
+
+
+def format_event(item):
+    """Định dạng một sự kiện theo chuẩn text/event-stream"""
+    return f"id: {item['id']}\nevent: {item['type']}\ndata: {item['data']}\n\n"
+
+
+def stream_booking_events(hub, last_event_id, heartbeat, replay_limit=1000):
+    """Generator SSE: phát lại sự kiện sau last_event_id rồi chờ sự kiện mới
+
+    Gọi trong request context (đăng ký subscriber và đọc backlog trước khi trả về).
+    """
+    subscriber = hub.subscribe()
+
+    # Đăng ký trước rồi mới đọc backlog: sự kiện xen giữa có thể xuất hiện ở cả hai,
+    # được loại trùng theo eventId
+    try:
+        if last_event_id is not None:
+            backlog = dao.get_booking_events_after(last_event_id, replay_limit)
+            start_id = last_event_id
+        else:
+            # Client mới: chỉ nhận sự kiện phát sinh từ bây giờ
+            backlog = []
+            start_id = dao.get_last_booking_event_id()
+    except Exception:
+        hub.unsubscribe(subscriber)
+        raise
+
+    def generate():
+        sent = start_id
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            if len(backlog) >= replay_limit:
+                # Lỡ quá nhiều sự kiện: client nên tải lại toàn bộ danh sách
+                yield 'event: reset\ndata: {}\n\n'
+            for item in backlog:
+                yield format_event(item)
+                sent = item['id']
+
+            while not subscriber.closed:
+                try:
+                    item = subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': ping\n\n'
+                    continue
+                if item is None:
+                    break
+                if item['id'] > sent:
+                    yield format_event(item)
+                    sent = item['id']
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return generate()
+
+
+_hub = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_hub_after_commit(session):
+    if session.info.pop('booking_events', False) and _hub is not None:
+        _hub.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_event_flag(session):
+    session.info.pop('booking_events', None)
+
+
+def init_events(app):
+    """Khởi tạo hub sự kiện booking cho app"""
+    global _hub
+    _hub = EventHub(app)
+    return _hub
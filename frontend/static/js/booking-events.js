@@ -0,0 +1,40 @@
+// frontend/static/js/booking-events.js
+// Theo dõi thay đổi booking qua SSE (dùng chung cho trang admin, thu ngân, nhân viên).
+//
+// EventSource tự kết nối lại và gửi Last-Event-ID khi mất kết nối; nhưng nếu server
+// từ chối (503 khi process đã đủ số kết nối SSE) thì EventSource dừng hẳn, nên ta tự
+// mở lại sau một khoảng chờ tăng dần, gửi ?lastEventId= để nhận tiếp sự kiện bị lỡ.
+
+const BOOKING_EVENT_TYPES = ['created', 'status_changed', 'invoiced', 'updated', 'deleted', 'reset'];
+
+function subscribeBookingEvents(shouldReload, reload) {
+    let lastEventId = null;
+    let retryDelay = 3000;
+    let timer = null;
+
+    const onEvent = event => {
+        if (event.lastEventId) lastEventId = event.lastEventId;
+        retryDelay = 3000;
+
+        const data = event.data ? JSON.parse(event.data) : {};
+        if (!shouldReload(data)) return;
+
+        // Gộp nhiều sự kiện liên tiếp thành một lần tải lại
+        clearTimeout(timer);
+        timer = setTimeout(reload, 300);
+    };
+
+    const connect = () => {
+        const query = lastEventId ? `?lastEventId=${encodeURIComponent(lastEventId)}` : '';
+        const source = new EventSource(`${API_BASE_URL}/events/bookings${query}`);
+
+        BOOKING_EVENT_TYPES.forEach(type => source.addEventListener(type, onEvent));
+        source.addEventListener('error', () => {
+            if (source.readyState !== EventSource.CLOSED) return;  // EventSource đang tự kết nối lại
+            setTimeout(connect, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 60000);
+        });
+    };
+
+    connect();
+}
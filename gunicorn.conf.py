@@ -0,0 +1,54 @@
+# gunicorn.conf.py
+"""
+Cấu hình gunicorn cho production.
+
+- App được nạp một lần ở master (preload) rồi mới fork worker.
+- db.create_all / init_default_settings chạy đúng một lần ở master.
+- Số worker/thread và địa chỉ bind lấy từ config của app (biến môi trường SPA_*).
+- Graceful restart: gửi SIGHUP cho master để thay worker mà không rớt request;
+  stream SSE được đóng ngay khi worker nhận SIGTERM (client tự kết nối lại worker khác).
+"""
+import signal
+
+from __init__ import db, init_database
+from wsgi import api_app
+from app import event_hub, job_runner, reminder_scheduler
+
+_config = api_app.config
+
+bind = [_config['API_BIND'], _config['FRONTEND_BIND']]
+workers = _config['SERVER_WORKERS']
+threads = _config['SERVER_THREADS']
+worker_class = 'gthread'
+preload_app = True
+graceful_timeout = _config['SERVER_GRACEFUL_TIMEOUT']
+
+
+def on_starting(server):
+    """Khởi tạo database một lần duy nhất trước khi fork worker"""
+    init_database(api_app)
+
+    # Không để worker kế thừa connection SQLite đã mở ở master
+    with api_app.app_context():
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    """Worker mới tạo connection pool riêng và khởi động thread job nền, nhắc lịch"""
+    with api_app.app_context():
+        db.engine.dispose(close=False)
+    if _config['JOBS_ENABLED']:
+        job_runner.ensure_started()
+    if _config['REMINDERS_ENABLED']:
+        reminder_scheduler.ensure_started()
+
+
+def post_worker_init(worker):
+    """SIGTERM (graceful restart/tắt): đóng các stream SSE trước, để thread của chúng trả về ngay"""
+    handle_exit = worker.handle_exit
+
+    def close_streams_and_exit(sig, frame):
+        event_hub.close()
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, close_streams_and_exit)
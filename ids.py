@@ -0,0 +1,67 @@
+# ids.py
+"""
+Sinh mã (ID) cho các bảng: tiền tố + ULID (26 ký tự base32 Crockford).
+
+- 48 bit đầu là thời gian (ms): mã tăng dần theo thời gian, sắp xếp được, và
+  INSERT luôn rơi vào cuối B-tree của khóa chính thay vì vị trí ngẫu nhiên.
+- 80 bit sau là số ngẫu nhiên; các mã sinh trong cùng một ms thì tăng thêm 1
+  (monotonic) nên không trùng trong một process. Giữa các process (worker
+  gunicorn, sau fork được seed lại) xác suất trùng không đáng kể (2^-80), nên
+  không cần query kiểm tra mã đã tồn tại trước khi INSERT.
+"""
+import os
+import threading
+import time
+
+_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+
+
+def _encode(value, length=26):
+    chars = []
+    for _ in range(length):
+        chars.append(_ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+class IdAllocator:
+    """Sinh ULID monotonic, an toàn giữa các thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._last_ms = 0
+        self._last_random = 0
+
+    def next_value(self):
+        """ULID dạng số nguyên 128 bit"""
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._last_random = int.from_bytes(os.urandom(10), 'big')
+            elif self._last_random < _RANDOM_MAX:
+                # Cùng ms (hoặc đồng hồ lùi): tăng phần ngẫu nhiên để giữ thứ tự
+                self._last_random += 1
+            else:
+                self._last_ms += 1
+                self._last_random = int.from_bytes(os.urandom(10), 'big')
+            return (self._last_ms << _RANDOM_BITS) | self._last_random
+
+    def new_id(self, prefix=''):
+        return prefix + _encode(self.next_value())
+
+
+_allocator = IdAllocator()
+
+# Process con sau fork không được tiếp tục dãy số của process cha
+os.register_at_fork(after_in_child=_allocator._reset)
+
+
+def new_id(prefix=''):
+    """Mã mới: tiền tố + ULID"""
+    return _allocator.new_id(prefix)
@@ -0,0 +1,317 @@
+# jobs.py
+"""
+Job nền chạy trong process, hàng đợi bền vững trên bảng jobs (SQLite), không cần broker.
+
+- Handler được đăng ký bằng decorator @job('tên') (có thể kèm cron='*/5 * * * *'
+  để chạy định kỳ); request gọi enqueue() trong transaction của mình, job chỉ
+  xuất hiện khi request commit.
+- Mỗi process có JOBS_WORKERS thread worker; nhiều process (các worker gunicorn,
+  hoặc process riêng chạy `python jobs.py`) dùng chung một hàng đợi - mỗi job chỉ
+  được một worker nhận (xem dao/job_dao.py).
+- Handler chạy trong một transaction cùng với việc đánh dấu job xong; lỗi thì
+  rollback và chạy lại sau một khoảng backoff tăng dần (có jitter), quá
+  maxAttempts thì job chuyển sang failed.
+- dedupKey: chỉ có một job cùng khóa đang chờ/đang chạy.
+- Job định kỳ: lần chạy kế tiếp lưu trong bảng job_schedules, process nào giành
+  được (compare-and-set) thì enqueue; lỡ nhiều lần chạy (server tắt) chỉ chạy bù một lần.
+- Thống kê: độ sâu hàng đợi theo trạng thái, tuổi job đến hạn lâu nhất, thời gian
+  chờ/chạy của các job gần nhất trong process.
+"""
+import json
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+import dao
+
+_handlers = {}
+
+
+class JobHandler:
+    """Handler đã đăng ký cho một tên job"""
+
+    def __init__(self, name, func, cron=None, max_attempts=None):
+        self.name = name
+        self.func = func
+        self.cron = CronSchedule(cron) if cron else None
+        self.max_attempts = max_attempts
+
+
+def job(name, cron=None, max_attempts=None):
+    """Decorator đăng ký handler job: func(payload_dict)"""
+
+    def decorator(func):
+        if name in _handlers:
+            raise ValueError(f'Job {name} đã được đăng ký')
+        _handlers[name] = JobHandler(name, func, cron, max_attempts)
+        return func
+
+    return decorator
+
+
+def enqueue(name, payload=None, run_at=None, dedup_key=None, max_attempts=None):
+    """Thêm job vào hàng đợi trong transaction hiện tại; trả về jobId (None nếu trùng dedupKey)"""
+    handler = _handlers.get(name)
+    if handler is None:
+        raise ValueError(f'Job không tồn tại: {name}')
+    if max_attempts is None:
+        max_attempts = handler.max_attempts or (_runner.max_attempts if _runner else 5)
+
+    job_id = dao.enqueue_job(name, payload, run_at, dedup_key, max_attempts)
+    if job_id is not None and _runner is not None:
+        # Đánh thức worker trong process ngay khi job đã commit
+        dao.run_after_commit(_runner.wake)
+    return job_id
+
+
+class CronSchedule:
+    """Biểu thức cron 5 trường: phút giờ ngày tháng thứ (0 = Chủ nhật)
+
+    Hỗ trợ *, số, danh sách (1,15), khoảng (9-17), bước (*/5, 8-18/2) và các
+    alias @hourly, @daily, @weekly, @monthly.
+    """
+
+    ALIASES = {
+        '@hourly': '0 * * * *',
+        '@daily': '0 0 * * *',
+        '@weekly': '0 0 * * 0',
+        '@monthly': '0 0 1 * *',
+    }
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = self.ALIASES.get(expression, expression).split()
+        if len(fields) != 5:
+            raise ValueError(f'Biểu thức cron phải có 5 trường: {expression}')
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        )
+        # Giống cron: nếu cả ngày và thứ đều bị giới hạn thì khớp một trong hai là đủ
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(','):
+            part, _, step = part.partition('/')
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(v) for v in part.split('-', 1))
+            else:
+                start = end = int(part)
+                if step:
+                    end = high
+            if not (low <= start <= end <= high):
+                raise ValueError(f'Giá trị cron ngoài khoảng {low}-{high}: {field}')
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return frozenset(values)
+
+    def _day_matches(self, dt):
+        day = dt.day in self.days
+        weekday = (dt.isoweekday() % 7) in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, dt):
+        """Thời điểm khớp đầu tiên sau dt (tính theo phút)"""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f'Biểu thức cron không bao giờ khớp: {self.expression}')
+
+
+class JobRunner:
+    """Các thread worker và scheduler của một process"""
+
+    def __init__(self, app):
+        self.app = app
+        self.workers = app.config['JOBS_WORKERS']
+        self.poll_interval = app.config['JOBS_POLL_INTERVAL']
+        self.lease = timedelta(seconds=app.config['JOBS_LEASE_SECONDS'])
+        self.retry_base = app.config['JOBS_RETRY_BASE_SECONDS']
+        self.retry_max = app.config['JOBS_RETRY_MAX_SECONDS']
+        self.max_attempts = app.config['JOBS_MAX_ATTEMPTS']
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+        # (chờ trong hàng đợi, thời gian chạy) của các job gần nhất, đơn vị giây
+        self._timings = deque(maxlen=1000)
+
+    def ensure_started(self):
+        """Khởi động thread của process hiện tại (thread không sống sót qua fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._reset_metrics()
+            for i in range(self.workers):
+                worker_id = f'{socket.gethostname()}:{self._pid}:{i}'
+                threading.Thread(target=self._work, args=(worker_id,), name=f'job-worker-{i}', daemon=True).start()
+            threading.Thread(target=self._schedule, name='job-scheduler', daemon=True).start()
+
+    def wake(self):
+        """Đánh thức worker (gọi sau khi commit có job mới)"""
+        self._wake.set()
+
+    def _backoff(self, attempts):
+        delay = min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def run_next(self, worker_id):
+        """Nhận và chạy một job đến hạn; trả về False nếu hàng đợi trống"""
+        with self.app.app_context():
+            with dao.transaction():
+                claimed = dao.claim_job(worker_id)
+            if claimed is None:
+                return False
+
+            handler = _handlers.get(claimed.name)
+            started = time.perf_counter()
+            try:
+                if handler is None:
+                    raise LookupError(f'Không có handler cho job {claimed.name}')
+                with dao.transaction():
+                    handler.func(json.loads(claimed.payload))
+                    dao.complete_job(claimed.jobId)
+                self.processed += 1
+            except Exception as e:
+                error = f'{e.__class__.__name__}: {e}\n{traceback.format_exc(limit=5)}'
+                retry_at = None
+                if claimed.attempts < claimed.maxAttempts:
+                    retry_at = datetime.now() + timedelta(seconds=self._backoff(claimed.attempts))
+                    self.retried += 1
+                else:
+                    self.failed += 1
+                with dao.transaction():
+                    dao.fail_job(claimed.jobId, error, retry_at)
+                self.app.logger.warning('Job %s #%s lỗi (lần %s): %s', claimed.name, claimed.jobId,
+                                        claimed.attempts, e)
+
+            self._timings.append((
+                max((claimed.startedAt - claimed.runAt).total_seconds(), 0.0),
+                time.perf_counter() - started
+            ))
+            return True
+
+    def _work(self, worker_id):
+        while True:
+            try:
+                if self.run_next(worker_id):
+                    continue
+            except Exception as e:
+                self.app.logger.warning('Worker job lỗi: %s', e)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def run_schedules(self):
+        """Enqueue các job định kỳ đến hạn, trả lại hàng đợi job của worker đã chết"""
+        now = datetime.now()
+        with self.app.app_context(), dao.transaction():
+            saved = dao.get_job_schedules()
+            for handler in _handlers.values():
+                if handler.cron is None:
+                    continue
+                cron, next_run_at = saved.get(handler.name, (None, None))
+                if cron != handler.cron.expression:
+                    dao.save_job_schedule(handler.name, handler.cron.expression, handler.cron.next_after(now))
+                elif next_run_at <= now and dao.advance_job_schedule(
+                        handler.name, next_run_at, handler.cron.next_after(now)):
+                    # dedupKey theo tên: job định kỳ trước chưa chạy xong thì không xếp thêm
+                    enqueue(handler.name, {'scheduledAt': next_run_at.isoformat()}, run_at=next_run_at,
+                            dedup_key=f'cron:{handler.name}')
+            dao.requeue_stale_jobs(now - self.lease)
+
+    def _schedule(self):
+        while True:
+            try:
+                self.run_schedules()
+            except Exception as e:
+                self.app.logger.warning('Scheduler job lỗi: %s', e)
+            # Cron tính theo phút: kiểm tra ở đầu mỗi phút (hoặc sớm hơn nếu poll ngắn hơn)
+            time.sleep(min(60 - datetime.now().second, max(self.poll_interval, 1)))
+
+    def stats(self):
+        """Độ sâu hàng đợi (toàn hệ thống) và thời gian chờ/chạy job của process (gọi trong app context)"""
+        queue = dao.get_job_queue_stats()
+        timings = list(self._timings)
+        waits = sorted(wait for wait, _ in timings)
+        runs = sorted(run for _, run in timings)
+        return dict(queue, process={
+            'workers': self.workers if self._pid == os.getpid() else 0,
+            'processed': self.processed,
+            'retried': self.retried,
+            'failed': self.failed,
+            'waitSeconds': _summary(waits),
+            'runSeconds': _summary(runs),
+        }, handlers=sorted(_handlers))
+
+
+def _summary(values):
+    if not values:
+        return {'count': 0, 'avg': 0.0, 'p95': 0.0, 'max': 0.0}
+    return {
+        'count': len(values),
+        'avg': round(sum(values) / len(values), 4),
+        'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 4),
+        'max': round(values[-1], 4),
+    }
+
+
+@job('jobs.cleanup', cron='17 * * * *')
+def cleanup_finished_jobs(payload):
+    """Xóa job đã xong/thất bại quá thời gian giữ lại"""
+    dao.delete_finished_jobs_before(datetime.now() - timedelta(hours=current_app.config['JOBS_RETENTION_HOURS']))
+
+
+_runner = None
+
+
+def init_jobs(app):
+    """Khởi tạo job runner cho app; thread chỉ chạy khi JOBS_ENABLED (khởi động lười ở request đầu tiên)"""
+    global _runner
+    _runner = JobRunner(app)
+    if app.config['JOBS_ENABLED']:
+        app.before_request(_runner.ensure_started)
+    return _runner
+
+
+if __name__ == '__main__':
+    # Process worker riêng (không phục vụ HTTP): python jobs.py
+    from __init__ import init_database
+    from app import app, job_runner, reminder_scheduler
+
+    init_database(app)
+    job_runner.ensure_started()
+    if app.config['REMINDERS_ENABLED']:
+        reminder_scheduler.ensure_started()
+    while True:
+        time.sleep(3600)
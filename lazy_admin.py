@@ -0,0 +1,48 @@
+# lazy_admin.py
+"""
+Đăng ký Flask-Admin theo kiểu lazy.
+
+flask_admin, WTForms và các ModelView trong admin.py chỉ được import khi có
+request đầu tiên tới /admin/, nên worker phục vụ API khởi động nhanh hơn.
+Flask không cho đăng ký blueprint sau request đầu tiên, vì vậy Flask-Admin
+được gắn vào một Flask app riêng (dùng chung db) và request /admin/... được
+chuyển tới app đó ở tầng WSGI.
+"""
+import threading
+
+
+class LazyAdminMiddleware:
+    """WSGI middleware tạo app Flask-Admin ở lần truy cập /admin/ đầu tiên"""
+
+    def __init__(self, wsgi_app, url='/admin'):
+        self.wsgi_app = wsgi_app
+        self.prefix = url.rstrip('/') + '/'
+        self._admin_wsgi_app = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Import admin.py và khởi tạo Flask-Admin (chỉ chạy một lần)"""
+        if self._admin_wsgi_app is None:
+            with self._lock:
+                if self._admin_wsgi_app is None:
+                    from __init__ import create_app
+                    from admin import init_admin
+                    from compression import init_compression
+
+                    admin_app = create_app()
+                    init_compression(admin_app)
+                    init_admin(admin_app)
+                    self._admin_wsgi_app = admin_app.wsgi_app
+        return self._admin_wsgi_app
+
+    def __call__(self, environ, start_response):
+        # /admin (không có dấu /) vẫn do app chính xử lý để redirect
+        if environ.get('PATH_INFO', '').startswith(self.prefix):
+            return self.load()(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+
+def init_admin_lazy(app, url='/admin'):
+    """Gắn Flask-Admin vào app, chỉ khởi tạo khi được truy cập lần đầu"""
+    app.wsgi_app = LazyAdminMiddleware(app.wsgi_app, url)
+    return app.wsgi_app
@@ -0,0 +1,176 @@
+# loyalty.py
+"""
+Điểm tích lũy và hạng thành viên của khách hàng.
+
+- Mỗi hóa đơn cho floor(finalTotal / loyalty_point_value) điểm. Điểm được cộng/trừ
+  trong cùng transaction với tạo/sửa/xóa hóa đơn (kể cả xuất hóa đơn hàng loạt).
+- Hạng được tính lại tăng dần ngay trong câu UPDATE cộng điểm (CASE theo ngưỡng
+  loyalty_tiers), không đọc lại lịch sử hóa đơn; điểm giảm (xóa/sửa hóa đơn) thì
+  hạng cũng có thể giảm.
+- Khi đổi quy tắc, job loyalty.recompute tính lại toàn bộ: một query gom điểm của
+  mọi hóa đơn theo khách hàng (GROUP BY, một lượt trên index), hạng được gán cho cả
+  mảng điểm bằng numpy (nếu đã cài, chỉ import khi chạy job), chỉ UPDATE khách hàng có
+  điểm/hạng thay đổi.
+- Quy tắc của lần tính lại gần nhất được lưu ở cài đặt loyalty_recomputed_rules; khi
+  khởi động mà khác quy tắc hiện tại (vd. database có hóa đơn từ trước khi có tích điểm)
+  thì xếp một job tính lại.
+"""
+import math
+from collections import defaultdict
+
+import dao
+import jobs
+from pricing import load_numpy, NUMPY_MIN_ITEMS
+
+BASE_TIER = 'Basic'
+DEFAULT_POINT_VALUE = '10000'
+DEFAULT_TIERS = 'Silver:300,Gold:1000,Platinum:3000'
+SETTING_IDS = ('loyalty_point_value', 'loyalty_tiers')
+RECOMPUTED_SETTING = 'loyalty_recomputed_rules'
+
+
+class LoyaltyError(ValueError):
+    """Quy tắc tích điểm không hợp lệ"""
+
+
+def parse_point_value(value):
+    """Số tiền cho một điểm (> 0)"""
+    try:
+        point_value = float(value)
+    except (ValueError, TypeError):
+        raise LoyaltyError('Giá trị một điểm không hợp lệ')
+    if point_value <= 0:
+        raise LoyaltyError('Giá trị một điểm phải lớn hơn 0')
+    return point_value
+
+
+def parse_tiers(value):
+    """'Silver:300,Gold:1000' -> [(300, 'Silver'), (1000, 'Gold')] theo ngưỡng tăng dần"""
+    tiers = []
+    for part in str(value).split(','):
+        name, _, threshold = part.strip().rpartition(':')
+        try:
+            threshold = int(threshold)
+        except ValueError:
+            raise LoyaltyError(f'Hạng thành viên không hợp lệ: {part.strip()}')
+        if not name or threshold <= 0:
+            raise LoyaltyError(f'Hạng thành viên không hợp lệ: {part.strip()}')
+        tiers.append((threshold, name.strip()))
+    tiers.sort()
+    if len({threshold for threshold, _ in tiers}) != len(tiers):
+        raise LoyaltyError('Các hạng thành viên phải có ngưỡng điểm khác nhau')
+    return tiers
+
+
+class LoyaltyRules:
+    """Snapshot quy tắc tích điểm (giá trị một điểm, ngưỡng các hạng)"""
+
+    def __init__(self, point_value, tiers):
+        self.point_value = parse_point_value(point_value)
+        self.tiers = parse_tiers(tiers) if isinstance(tiers, str) else list(tiers)
+
+    @classmethod
+    def load(cls):
+        """Đọc quy tắc trong một query"""
+        values = dao.get_settings_values(SETTING_IDS)
+        return cls(values.get('loyalty_point_value', DEFAULT_POINT_VALUE), values.get('loyalty_tiers', DEFAULT_TIERS))
+
+    def key(self):
+        """Chuỗi đại diện cho quy tắc (so sánh/loại trùng job tính lại)"""
+        tiers = ','.join(f'{name}:{threshold}' for threshold, name in self.tiers)
+        return f'{self.point_value:g}:{tiers}'
+
+    def to_dict(self):
+        return {
+            'pointValue': self.point_value,
+            'tiers': [{'name': name, 'minPoints': threshold} for threshold, name in self.tiers]
+        }
+
+    def points(self, final_total):
+        """Số điểm của một hóa đơn"""
+        return int(math.floor((final_total or 0) / self.point_value))
+
+    def tier(self, points):
+        """Hạng ứng với số điểm"""
+        level = BASE_TIER
+        for threshold, name in self.tiers:
+            if points >= threshold:
+                level = name
+        return level
+
+
+def accrue_points(rules, changes):
+    """Cộng/trừ điểm trong transaction hiện tại: changes là các cặp (customerId, số điểm thay đổi)"""
+    deltas = defaultdict(int)
+    for customer_id, points in changes:
+        if customer_id:
+            deltas[customer_id] += points
+    deltas = {customer_id: delta for customer_id, delta in deltas.items() if delta}
+    if deltas:
+        dao.add_loyalty_points(deltas, rules.tiers, BASE_TIER)
+    return deltas
+
+
+def assign_tiers(rules, points):
+    """Hạng cho cả mảng điểm một lượt (numpy searchsorted theo ngưỡng, nếu đã cài)"""
+    np = load_numpy() if len(points) >= NUMPY_MIN_ITEMS else None
+    if np is None:
+        return [rules.tier(p) for p in points]
+    names = np.asarray([BASE_TIER] + [name for _, name in rules.tiers], dtype=object)
+    thresholds = np.asarray([threshold for threshold, _ in rules.tiers], dtype=np.int64)
+    return names[np.searchsorted(thresholds, np.asarray(points, dtype=np.int64), side='right')]
+
+
+def recompute_all(rules):
+    """Tính lại điểm/hạng của mọi khách hàng từ hóa đơn, trả về số khách hàng thay đổi
+
+    Điểm được cộng theo khách hàng trong một lượt GROUP BY trên index (customerId, finalTotal);
+    hạng và việc so sánh với giá trị hiện tại tính trên mảng, chỉ ghi các dòng thay đổi.
+    """
+    rows = dao.get_loyalty_recompute_rows(rules.point_value)
+    if not rows:
+        return 0
+
+    points = [row.points for row in rows]
+    levels = assign_tiers(rules, points)
+    np = load_numpy() if len(rows) >= NUMPY_MIN_ITEMS else None
+    if np is None:
+        changed = [i for i, row in enumerate(rows)
+                   if row.loyaltyPoints != points[i] or row.membershipLevel != levels[i]]
+    else:
+        current = np.fromiter((-1 if row.loyaltyPoints is None else row.loyaltyPoints for row in rows),
+                              dtype=np.int64, count=len(rows))
+        current_levels = np.asarray([row.membershipLevel for row in rows], dtype=object)
+        changed = np.flatnonzero((np.asarray(points, dtype=np.int64) != current) | (levels != current_levels))
+
+    if len(changed):
+        dao.set_loyalty_states({rows[i].customerId: (points[i], levels[i]) for i in changed})
+    return len(changed)
+
+
+@jobs.job('loyalty.recompute', max_attempts=3)
+def recompute_loyalty(payload):
+    """Job tính lại toàn bộ điểm/hạng (sau khi đổi quy tắc tích điểm)"""
+    rules = LoyaltyRules.load()
+    recompute_all(rules)
+    dao.set_setting_value(RECOMPUTED_SETTING, rules.key(), 'Quy tắc tích điểm của lần tính lại gần nhất (tự ghi)')
+
+
+def schedule_recompute(rules):
+    """Enqueue job tính lại (trong transaction hiện tại)
+
+    Khóa loại trùng gồm cả quy tắc: đổi quy tắc khi job cũ đang chạy vẫn xếp được job mới.
+    """
+    return jobs.enqueue('loyalty.recompute', dedup_key=f'loyalty.recompute:{rules.key()}')
+
+
+def schedule_initial_recompute():
+    """Khi khởi động: xếp job tính lại nếu điểm chưa từng được tính theo quy tắc hiện tại
+
+    Điểm/hạng chỉ được cộng dồn từ hóa đơn mới, nên khách hàng có hóa đơn từ trước khi có
+    tích điểm cần một lần tính lại toàn bộ; các lần khởi động sau không xếp thêm.
+    """
+    rules = LoyaltyRules.load()
+    if dao.get_settings_values((RECOMPUTED_SETTING,)).get(RECOMPUTED_SETTING) != rules.key():
+        return schedule_recompute(rules)
+    return None
@@ -11,6 +11,13 @@ class Settings(db.Model):
     description = db.Column(db.String(200))
 
 
+class TableVersion(db.Model):
+    """Model cho bảng version của từng bảng (tăng mỗi khi bảng bị ghi, dùng làm ETag)"""
+    __tablename__ = 'table_versions'
+    tableName = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
 class Account(db.Model):
     """Model cho bảng tài khoản"""
     __tablename__ = 'accounts'
@@ -24,13 +31,23 @@ class Account(db.Model):
     phone = db.Column(db.String(20))
     email = db.Column(db.String(100))
 
-    customerId = db.Column(db.String(50), db.ForeignKey('customers.customerId'))
-    employeeId = db.Column(db.String(50), db.ForeignKey('employees.employeeId'))
+    customerId = db.Column(db.String(50), db.ForeignKey('customers.customerId'), index=True)
+    employeeId = db.Column(db.String(50), db.ForeignKey('employees.employeeId'), index=True)
     createdAt = db.Column(db.DateTime, default=datetime.now)
+    updatedAt = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
 
     customer = db.relationship('Customer', backref=db.backref('account', uselist=False), uselist=False, lazy=True)
     employee = db.relationship('Employee', backref=db.backref('account', uselist=False), uselist=False, lazy=True)
 
+    # Tìm kiếm theo tên/điện thoại dùng FTS account_search (dao/search_dao.py)
+    __table_args__ = (
+        # Phân trang keyset danh bạ khách hàng/nhân viên theo tên, ngày tạo
+        db.Index('ix_accounts_fullName_customerId', db.collate(fullName, 'NOCASE'), customerId),
+        db.Index('ix_accounts_fullName_employeeId', db.collate(fullName, 'NOCASE'), employeeId),
+        db.Index('ix_accounts_createdAt_customerId', createdAt, customerId),
+        db.Index('ix_accounts_createdAt_employeeId', createdAt, employeeId),
+    )
+
 
 class Customer(db.Model):
     """Model cho bảng khách hàng"""
@@ -43,6 +60,11 @@ class Customer(db.Model):
     active = db.Column(db.Boolean, default=True)
     bookings = db.relationship('Booking', backref='customer', lazy=True)
 
+    __table_args__ = (
+        # Phân trang keyset danh bạ khách hàng theo điểm tích lũy
+        db.Index('ix_customers_loyaltyPoints_customerId', loyaltyPoints, customerId),
+    )
+
 
 class Service(db.Model):
     """Model cho bảng dịch vụ"""
@@ -52,6 +74,7 @@ class Service(db.Model):
     durration = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
     note = db.Column(db.String(200))
+    updatedAt = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
     bookings = db.relationship('Booking', backref='service', lazy=True)
 
 
@@ -76,20 +99,37 @@ class Invoice(db.Model):
     vat = db.Column(db.Float, nullable=False)
     discount = db.Column(db.Float, default=0)
     finalTotal = db.Column(db.Float, nullable=False)
+    # Booking được xuất hóa đơn (không khai báo ForeignKey để tránh vòng với bookings.invoiceId)
+    bookingId = db.Column(db.String(50))
+    updatedAt = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
     customer = db.relationship('Customer', backref='invoices', lazy=True)
     booking = db.relationship('Booking', backref='invoice', uselist=False, lazy=True)
 
+    # Mỗi booking chỉ có một hóa đơn (database đảm bảo, không kiểm tra trước khi insert);
+    # (customerId, finalTotal): tính lại điểm tích lũy bằng GROUP BY chỉ đọc index
+    __table_args__ = (
+        db.Index('uq_invoices_bookingId', 'bookingId', unique=True),
+        db.Index('ix_invoices_customerId_finalTotal', 'customerId', 'finalTotal'),
+    )
+
 
 class Booking(db.Model):
     """Model cho bảng đặt lịch"""
     __tablename__ = 'bookings'
     bookingId = db.Column(db.String(50), primary_key=True)
-    time = db.Column(db.DateTime, nullable=False)
-    status = db.Column(db.String(20), default='Đã xác nhận')
+    time = db.Column(db.DateTime, nullable=False, index=True)
+    status = db.Column(db.String(20), default='Đã xác nhận', index=True)
     customerId = db.Column(db.String(50), db.ForeignKey('customers.customerId'), nullable=False)
     servicesId = db.Column(db.String(50), db.ForeignKey('services.servicesId'), nullable=False)
     employeeId = db.Column(db.String(50), db.ForeignKey('employees.employeeId'), nullable=False)
     invoiceId = db.Column(db.String(50), db.ForeignKey('invoices.invoiceId'))
+    updatedAt = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
+
+    # Lịch làm việc theo nhân viên (employeeId, time) và hàng đợi thu ngân (status, invoiceId)
+    __table_args__ = (
+        db.Index('ix_bookings_employeeId_time', 'employeeId', 'time'),
+        db.Index('ix_bookings_status_invoiceId', 'status', 'invoiceId'),
+    )
 
 
 class ServiceForm(db.Model):
@@ -103,6 +143,79 @@ class ServiceForm(db.Model):
     servicePrice = db.Column(db.Float, nullable=False)
     serviceNote = db.Column(db.String(200))
     createdAt = db.Column(db.DateTime, default=datetime.now)
+    updatedAt = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
 
     booking = db.relationship('Booking', backref='service_form', uselist=False, lazy=True)
-    employee = db.relationship('Employee', backref='service_forms', lazy=True)
\ No newline at end of file
+    employee = db.relationship('Employee', backref='service_forms', lazy=True)
+
+    # Mỗi booking chỉ có một phiếu dịch vụ
+    __table_args__ = (
+        db.Index('uq_service_forms_bookingId', 'bookingId', unique=True),
+    )
+
+
+class BookingEvent(db.Model):
+    """Model cho bảng sự kiện thay đổi booking (nguồn cho SSE, các worker đọc bằng polling)"""
+    __tablename__ = 'booking_events'
+    eventId = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    bookingId = db.Column(db.String(50), nullable=False)
+    type = db.Column(db.String(20), nullable=False)  # created, status_changed, invoiced, updated, deleted
+    data = db.Column(db.Text, nullable=False)  # JSON
+    createdAt = db.Column(db.DateTime, default=datetime.now, index=True)
+
+
+class Tombstone(db.Model):
+    """Model cho bảng bản ghi đã xóa (để client đồng bộ delta biết dòng nào bị xóa)"""
+    __tablename__ = 'tombstones'
+    tombstoneId = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    tableName = db.Column(db.String(50), nullable=False)
+    rowId = db.Column(db.String(50), nullable=False)
+    deletedAt = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_tombstones_tableName_deletedAt', 'tableName', 'deletedAt'),
+    )
+
+
+class Job(db.Model):
+    """Model cho hàng đợi job nền (jobs.py): mỗi dòng là một lần chạy handler"""
+    __tablename__ = 'jobs'
+    jobId = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    dedupKey = db.Column(db.String(200))
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    maxAttempts = db.Column(db.Integer, nullable=False, default=5)
+    runAt = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    createdAt = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    startedAt = db.Column(db.DateTime)
+    finishedAt = db.Column(db.DateTime)
+    lockedBy = db.Column(db.String(100))
+    lastError = db.Column(db.Text)
+
+    __table_args__ = (
+        # Worker lấy job đến hạn: status = 'queued' AND runAt <= now ORDER BY runAt
+        db.Index('ix_jobs_status_runAt', 'status', 'runAt'),
+        # Một dedupKey chỉ có một job đang chờ/đang chạy
+        db.Index('uq_jobs_dedupKey_active', 'dedupKey', unique=True,
+                 sqlite_where=db.text("status IN ('queued', 'running')")),
+    )
+
+
+class JobSchedule(db.Model):
+    """Model cho lịch chạy định kỳ (cron) của job: lần chạy kế tiếp dùng chung cho mọi process"""
+    __tablename__ = 'job_schedules'
+    name = db.Column(db.String(100), primary_key=True)
+    cron = db.Column(db.String(100), nullable=False)
+    nextRunAt = db.Column(db.DateTime, nullable=False)
+
+
+class ReminderLog(db.Model):
+    """Model cho bảng nhắc lịch đã gửi: khóa chính đảm bảo mỗi lần nhắc chỉ gửi một lần"""
+    __tablename__ = 'reminder_log'
+    bookingId = db.Column(db.String(50), primary_key=True)
+    remindAt = db.Column(db.DateTime, primary_key=True)
+    leadMinutes = db.Column(db.Integer, nullable=False)
+    bookingTime = db.Column(db.DateTime, nullable=False, index=True)
+    createdAt = db.Column(db.DateTime, nullable=False, default=datetime.now)
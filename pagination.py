@@ -0,0 +1,140 @@
+# pagination.py
+"""
+Phân trang keyset (cursor) cho các API danh sách lớn.
+
+Client gửi ?limit=&sort=&order= và ?cursor=<nextCursor> nhận từ trang trước.
+Cursor mã hóa (giá trị cột sắp xếp, khóa chính) của dòng cuối trang trước; trang
+tiếp theo bắt đầu ngay sau dòng đó bằng điều kiện (cột, khóa) > (giá trị, khóa)
+trên index, nên thời gian trả một trang không phụ thuộc trang thứ mấy hay tổng
+số dòng (khác với OFFSET phải bỏ qua toàn bộ các dòng phía trước).
+
+Các dòng không có trong query chính (vd. khách hàng chưa có tài khoản khi sắp xếp
+theo cột của tài khoản) có thể được trả thành một phần đuôi, sau mọi dòng của query
+chính, theo khóa tăng dần; cursor ghi nhớ đang ở phần đuôi hay không.
+"""
+import base64
+import json
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import and_, or_, tuple_, literal
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(value, key, tail=False):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, key, 1] if tail else [value, key], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """(giá trị cột sắp xếp, khóa, có phải phần đuôi hay không)"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value, key, *tail = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('cursor không hợp lệ')
+    return value, key, bool(tail and tail[0])
+
+
+def keyset_segments(column, key_column, value, key, descending=False):
+    """Các điều kiện (theo đúng thứ tự sắp xếp) chọn những dòng đứng sau (value, key)
+
+    SQLite xếp NULL trước mọi giá trị khi tăng dần, sau cùng khi giảm dần. Phần NULL
+    và phần có giá trị được tách thành điều kiện riêng: một điều kiện OR gộp cả hai
+    khiến SQLite quét index từ đầu thay vì tìm thẳng tới vị trí cursor. Điều kiện
+    column >= value (<= khi giảm dần) lặp lại ý của so sánh bộ (column, key) nhưng
+    giúp SQLite dùng index để seek.
+    """
+    if value is None:
+        if descending:
+            return [and_(column.is_(None), key_column < key)]
+        return [and_(column.is_(None), key_column > key), column.isnot(None)]
+
+    if descending:
+        return [and_(column <= value, tuple_(column, key_column) < tuple_(value, key)), column.is_(None)]
+    return [and_(column >= value, tuple_(column, key_column) > tuple_(value, key))]
+
+
+class PageRequest:
+    """Tham số phân trang của request hiện tại
+
+    sorts: {tên sort trên API: (cột sắp xếp, cột khóa, hàm chuyển giá trị cursor hoặc None)}
+    Cột khóa phân biệt các dòng trùng giá trị sắp xếp; (cột sắp xếp, cột khóa) nên
+    có index để mỗi trang là một lần đọc tuần tự trên index.
+    """
+
+    def __init__(self, sorts, default_sort):
+        self.limit = min(max(int(request.args.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+
+        self.sort = request.args.get('sort', default_sort)
+        if self.sort not in sorts:
+            raise ValueError(f"sort phải là một trong: {', '.join(sorts)}")
+        self.column, self.key_column, self._parse = sorts[self.sort]
+
+        order = request.args.get('order', 'asc').lower()
+        if order not in ('asc', 'desc'):
+            raise ValueError('order phải là asc hoặc desc')
+        self.descending = order == 'desc'
+
+        token = request.args.get('cursor')
+        self.after, self.in_tail = None, False
+        if token:
+            value, key, self.in_tail = decode_cursor(token)
+            if value is not None and self._parse:
+                value = self._parse(value)
+            self.after = (value, key)
+
+    def fetch(self, query, tail=None, tail_key=None):
+        """Lấy một trang (dư 1 dòng để biết còn trang sau) từ query chưa sắp xếp
+
+        tail: query các dòng không có trong query, trả sau toàn bộ query theo tail_key tăng dần.
+        Mỗi dòng kết quả có thêm sortValue, sortKey để tạo cursor cho trang sau.
+        """
+        size = self.limit + 1
+        rows = [] if self.in_tail else self._fetch_sorted(query, size)
+        if tail is None or len(rows) >= size:
+            return rows
+
+        tail = tail.add_columns(
+            literal(None).label('sortValue'), tail_key.label('sortKey'), literal(True).label('inTail')
+        ).order_by(tail_key.asc())
+        if self.in_tail:
+            tail = tail.filter(tail_key > self.after[1])
+        return rows + tail.limit(size - len(rows)).all()
+
+    def _fetch_sorted(self, query, size):
+        column, key_column = self.column, self.key_column
+        query = query.add_columns(column.label('sortValue'), key_column.label('sortKey'))
+        if self.descending:
+            query = query.order_by(column.desc(), key_column.desc())
+        else:
+            query = query.order_by(column.asc(), key_column.asc())
+
+        if self.after is None:
+            return query.limit(size).all()
+
+        rows = []
+        for condition in keyset_segments(column, key_column, *self.after, self.descending):
+            rows += query.filter(condition).limit(size - len(rows)).all()
+            if len(rows) >= size:
+                break
+        return rows
+
+    def payload(self, rows, serializer):
+        """Nội dung response: một trang dữ liệu và nextCursor (None nếu là trang cuối)"""
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = encode_cursor(last.sortValue, last.sortKey, 'inTail' in last._fields)
+        return {
+            'success': True,
+            'data': serializer.many(rows),
+            'nextCursor': next_cursor,
+            'hasMore': has_more
+        }
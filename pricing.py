@@ -0,0 +1,171 @@
+# pricing.py
+"""
+Tính tiền hóa đơn: giá dịch vụ -> giảm giá -> VAT -> tổng thanh toán.
+
+Dùng chung cho xem trước, tạo, cập nhật hóa đơn và báo giá hàng loạt. Cài đặt
+VAT/giảm giá tối đa được đọc một lần (một query) vào PricingSettings rồi dùng cho
+mọi dòng. Báo giá nhiều booking tính trên mảng numpy (nếu đã cài) thay vì lặp
+từng dòng; cùng công thức và thứ tự phép tính nên kết quả giống hệt bản tính lẻ.
+numpy chỉ được import ở lô lớn đầu tiên (import mất ~200 ms), không phải lúc khởi động.
+"""
+import functools
+
+import dao
+
+DEFAULT_VAT_RATE = '10'
+DEFAULT_MAX_DISCOUNT = '20'
+
+# Lô nhỏ hơn tính bằng vòng lặp Python: nhanh hơn chi phí chuyển sang mảng numpy
+NUMPY_MIN_ITEMS = 64
+
+
+@functools.lru_cache(maxsize=None)
+def load_numpy():
+    """Module numpy (import ở lần gọi đầu tiên), None nếu chưa cài"""
+    try:
+        import numpy
+    except ImportError:  # numpy là tùy chọn
+        return None
+    return numpy
+
+
+class PricingError(ValueError):
+    """Tham số tính tiền không hợp lệ (vd. giảm giá vượt mức tối đa)"""
+
+
+def service_price(service):
+    """Giá dịch vụ dạng float (chưa thiết lập hoặc không hợp lệ -> 0.0)"""
+    try:
+        return float(service.price) if service.price is not None else 0.0
+    except (ValueError, TypeError):
+        return 0.0
+
+
+class PricingSettings:
+    """Snapshot cài đặt tính tiền (VAT, giảm giá tối đa)"""
+
+    def __init__(self, vat_rate, max_discount):
+        self.vat_rate = float(vat_rate)
+        self.max_discount = float(max_discount)
+
+    @classmethod
+    def load(cls):
+        """Đọc VAT và giảm giá tối đa trong một query"""
+        values = dao.get_settings_values(('vat_rate', 'max_discount'))
+        return cls(values.get('vat_rate', DEFAULT_VAT_RATE), values.get('max_discount', DEFAULT_MAX_DISCOUNT))
+
+    def to_dict(self):
+        return {'vatRate': self.vat_rate, 'maxDiscount': self.max_discount}
+
+    def discount_percent(self, value):
+        """Kiểm tra % giảm giá (0..max_discount), trả về float"""
+        try:
+            percent = float(value or 0)
+        except (ValueError, TypeError):
+            raise PricingError('Giảm giá không hợp lệ')
+        if percent < 0 or percent > self.max_discount:
+            raise PricingError(f'Giảm giá tối đa {self.max_discount}%')
+        return percent
+
+    def quote(self, total, discount_percent):
+        """Tính tiền cho một hóa đơn"""
+        discount = total * discount_percent / 100
+        subtotal = total - discount
+        vat = subtotal * self.vat_rate / 100
+        return {
+            'total': total,
+            'discount': discount,
+            'discountPercent': discount_percent,
+            'vat': vat,
+            'vatPercent': self.vat_rate,
+            'finalTotal': subtotal + vat
+        }
+
+    def quote_many(self, totals, discount_percents):
+        """Tính tiền cho nhiều hóa đơn một lượt
+
+        Trả về (danh sách dict như quote(), tổng cộng {count, total, discount, vat, finalTotal}).
+        """
+        np = load_numpy() if len(totals) >= NUMPY_MIN_ITEMS else None
+        if np is None:
+            quotes = [self.quote(total, percent) for total, percent in zip(totals, discount_percents)]
+            summary = {key: sum(q[key] for q in quotes) for key in ('total', 'discount', 'vat', 'finalTotal')}
+            return quotes, {'count': len(quotes), **summary}
+
+        total = np.asarray(totals, dtype=np.float64)
+        percent = np.asarray(discount_percents, dtype=np.float64)
+        discount = total * percent / 100
+        subtotal = total - discount
+        vat = subtotal * self.vat_rate / 100
+        final_total = subtotal + vat
+
+        vat_rate = self.vat_rate
+        quotes = [
+            {'total': t, 'discount': d, 'discountPercent': p, 'vat': v, 'vatPercent': vat_rate, 'finalTotal': f}
+            for t, d, p, v, f in zip(total.tolist(), discount.tolist(), percent.tolist(),
+                                     vat.tolist(), final_total.tolist())
+        ]
+        summary = {
+            'count': len(quotes),
+            'total': float(total.sum()),
+            'discount': float(discount.sum()),
+            'vat': float(vat.sum()),
+            'finalTotal': float(final_total.sum())
+        }
+        return quotes, summary
+
+
+def price_bookings(pricing, items, bookings, default_discount=0, for_invoice=False):
+    """Tính tiền cho danh sách item {bookingId, discount}
+
+    bookings: {bookingId: dòng booking có serviceName, price, customerId, customerName, invoiceId}
+    for_invoice: kiểm tra thêm điều kiện xuất hóa đơn (booking chưa có hóa đơn, giá > 0,
+    không lặp booking).
+    Trả về (results, priced, summary): results có một dict cho mỗi item (lỗi ghi trong
+    'error'), priced là các cặp (result, dòng booking) tính được tiền.
+    """
+    results, priced, totals, percents = [], [], [], []
+    seen = set()
+    for item in items:
+        booking_id = item['bookingId']
+        row = bookings.get(booking_id)
+        result = {'bookingId': booking_id}
+        results.append(result)
+        if row is None:
+            result['error'] = 'Không tìm thấy booking'
+            continue
+
+        total = service_price(row)
+        if for_invoice:
+            if booking_id in seen:
+                result['error'] = 'Booking bị lặp trong danh sách'
+                continue
+            seen.add(booking_id)
+            if row.invoiceId:
+                result['error'] = 'Booking đã có hóa đơn'
+                continue
+            if total <= 0:
+                result['error'] = f'Giá dịch vụ "{row.serviceName}" chưa được thiết lập'
+                continue
+
+        try:
+            percent = pricing.discount_percent(item.get('discount', default_discount))
+        except PricingError as e:
+            result['error'] = str(e)
+            continue
+
+        result.update({
+            'customerId': row.customerId,
+            'customerName': row.customerName or 'N/A',
+            'serviceName': row.serviceName
+        })
+        if not for_invoice:
+            result['hasInvoice'] = row.invoiceId is not None
+        priced.append((result, row))
+        totals.append(total)
+        percents.append(percent)
+
+    quotes, summary = pricing.quote_many(totals, percents)
+    for (result, _row), quote in zip(priced, quotes):
+        result.update(quote)
+    return results, priced, summary
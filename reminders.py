@@ -0,0 +1,265 @@
+# reminders.py
+"""
+Nhắc lịch hẹn (SMS/email) trước giờ hẹn.
+
+- Mỗi process giữ một min-heap (remindAt, bookingId, ...) cho các booking trong
+  cửa sổ REMINDERS_HORIZON_HOURS tới, nạp bằng range query trên bookings.time;
+  cửa sổ được nới dần theo thời gian, mỗi booking chỉ được đọc một lần.
+- Thay đổi booking (tạo/sửa/xóa) được cập nhật vào heap từ bảng booking_events
+  (eventId > last_id), nên mọi process đều thấy thay đổi của nhau. Entry cũ trong
+  heap không bị xóa ngay mà bị bỏ qua khi pop (so với time hiện tại của booking).
+- Đến hạn: ghi reminder_log (khóa chính bookingId + remindAt, process nào ghi được
+  thì gửi) và enqueue job reminders.send; job gọi sender, lỗi thì được chạy lại
+  theo cơ chế retry của jobs.py.
+- Chi phí mỗi chu kỳ chỉ phụ thuộc số booking trong cửa sổ và số thay đổi mới,
+  không phụ thuộc tổng số booking.
+- Sender cắm được qua REMINDERS_SENDER: 'log', 'file' (JSON lines vào REMINDERS_FILE),
+  'stub' (giữ trong bộ nhớ, dùng khi test) hoặc 'module:attr' (class/factory nhận app).
+"""
+import heapq
+import importlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+import dao
+import jobs
+
+
+class LogSender:
+    """Ghi nhắc lịch ra log của app"""
+
+    def __init__(self, app):
+        self.logger = app.logger
+
+    def send(self, reminder):
+        self.logger.info('Nhắc lịch %s: %s', reminder['bookingId'], reminder['message'])
+
+
+class FileSender:
+    """Ghi mỗi nhắc lịch thành một dòng JSON vào file"""
+
+    def __init__(self, app):
+        self.path = app.config['REMINDERS_FILE']
+        self._lock = threading.Lock()
+
+    def send(self, reminder):
+        line = json.dumps(reminder, ensure_ascii=False, default=str) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+class StubSender:
+    """Giữ các nhắc lịch đã gửi trong bộ nhớ (test)"""
+
+    def __init__(self, app):
+        self.sent = []
+
+    def send(self, reminder):
+        self.sent.append(reminder)
+
+
+SENDERS = {'log': LogSender, 'file': FileSender, 'stub': StubSender}
+
+
+def load_sender(app):
+    """Tạo sender theo REMINDERS_SENDER ('log', 'file', 'stub' hoặc 'module:attr')"""
+    name = app.config['REMINDERS_SENDER']
+    if name in SENDERS:
+        return SENDERS[name](app)
+    module_name, _, attr = name.partition(':')
+    if not attr:
+        raise ValueError(f'REMINDERS_SENDER không hợp lệ: {name}')
+    return getattr(importlib.import_module(module_name), attr)(app)
+
+
+def _parse_leads(value):
+    leads = sorted({int(v) for v in str(value).split(',') if v.strip()}, reverse=True)
+    if not leads or leads[-1] <= 0:
+        raise ValueError(f'REMINDERS_LEAD_MINUTES không hợp lệ: {value}')
+    return leads
+
+
+class ReminderScheduler:
+    """Min-heap các lần nhắc sắp tới của một process"""
+
+    def __init__(self, app):
+        self.app = app
+        self.leads = _parse_leads(app.config['REMINDERS_LEAD_MINUTES'])
+        # Cửa sổ nạp booking phải chứa được lần nhắc sớm nhất
+        self.horizon = max(timedelta(hours=app.config['REMINDERS_HORIZON_HOURS']),
+                           timedelta(minutes=self.leads[0] + 60))
+        self.poll_interval = app.config['REMINDERS_POLL_INTERVAL']
+        self.grace = timedelta(minutes=app.config['REMINDERS_GRACE_MINUTES'])
+        self.sender = load_sender(app)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._heap = []
+        # bookingId -> time đang được nhắc; entry trong heap không khớp là entry cũ
+        self._bookings = {}
+        self._loaded_until = None
+        self._last_event_id = None
+        self.dispatched = 0
+
+    def ensure_started(self):
+        """Khởi động thread scheduler của process hiện tại (thread không sống sót qua fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._reset()
+            threading.Thread(target=self._run, name='reminder-scheduler', daemon=True).start()
+
+    def _schedule(self, booking_id, booking_time, status, now):
+        """Thêm/cập nhật/bỏ các lần nhắc của một booking"""
+        if (status in dao.INACTIVE_BOOKING_STATUSES or booking_time is None
+                or booking_time <= now or booking_time > self._loaded_until):
+            # Booking ngoài cửa sổ sẽ được nạp lại khi cửa sổ nới tới
+            self._bookings.pop(booking_id, None)
+            return
+        if self._bookings.get(booking_id) == booking_time:
+            return
+
+        self._bookings[booking_id] = booking_time
+        for lead in self.leads:
+            remind_at = booking_time - timedelta(minutes=lead)
+            if remind_at >= now - self.grace:
+                heapq.heappush(self._heap, (remind_at, booking_id, lead, booking_time))
+
+    def _load(self, now):
+        """Nới cửa sổ tới now + horizon: chỉ đọc khoảng thời gian mới"""
+        end = now + self.horizon
+        if self._loaded_until is None:
+            # Lấy eventId trước khi nạp: sự kiện xen giữa được áp dụng lại (idempotent)
+            self._last_event_id = dao.get_last_booking_event_id()
+            start, self._loaded_until = now, end
+        elif end > self._loaded_until:
+            start, self._loaded_until = self._loaded_until, end
+        else:
+            return
+        for row in dao.get_upcoming_bookings(start, end):
+            self._schedule(row.bookingId, row.time, row.status, now)
+
+    def _apply_events(self, now):
+        """Cập nhật heap theo các thay đổi booking mới (booking_events)"""
+        while True:
+            events = dao.get_booking_events_after(self._last_event_id)
+            if not events:
+                return
+            self._last_event_id = events[-1]['id']
+            for item in events:
+                data = json.loads(item['data'])
+                if item['type'] == 'deleted':
+                    self._bookings.pop(data['bookingId'], None)
+                else:
+                    booking_time = datetime.fromisoformat(data['time']) if data.get('time') else None
+                    self._schedule(data['bookingId'], booking_time, data.get('status'), now)
+
+    def _dispatch(self, now):
+        """Enqueue các lần nhắc đến hạn"""
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            remind_at, booking_id, lead, booking_time = heapq.heappop(heap)
+            if self._bookings.get(booking_id) != booking_time:
+                continue  # booking đã đổi giờ/hủy/xóa
+            if remind_at < now - self.grace:
+                continue  # quá trễ (server tắt lâu) - không nhắc nữa
+            with dao.transaction():
+                if dao.claim_reminder(booking_id, remind_at, lead, booking_time):
+                    jobs.enqueue('reminders.send', {
+                        'bookingId': booking_id,
+                        'time': booking_time.isoformat(),
+                        'leadMinutes': lead
+                    })
+                    self.dispatched += 1
+
+        # Dọn entry cũ khi heap phình quá số lần nhắc còn hiệu lực
+        if len(heap) > 2 * len(self._bookings) * len(self.leads) + 64:
+            self._heap = [entry for entry in heap if self._bookings.get(entry[1]) == entry[3]]
+            heapq.heapify(self._heap)
+
+    def tick(self):
+        """Một chu kỳ: nới cửa sổ, áp dụng thay đổi booking, gửi các lần nhắc đến hạn"""
+        now = datetime.now()
+        with self.app.app_context():
+            self._load(now)
+            self._apply_events(now)
+            self._dispatch(now)
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                self.app.logger.warning('Scheduler nhắc lịch lỗi: %s', e)
+            delay = self.poll_interval
+            if self._heap:
+                delay = min(delay, max((self._heap[0][0] - datetime.now()).total_seconds(), 0.5))
+            time.sleep(delay)
+
+    def stats(self):
+        return {
+            'sender': type(self.sender).__name__,
+            'leadMinutes': self.leads,
+            'trackedBookings': len(self._bookings),
+            'heapSize': len(self._heap),
+            'nextReminderAt': self._heap[0][0] if self._heap else None,
+            'loadedUntil': self._loaded_until,
+            'lastEventId': self._last_event_id,
+            'dispatched': self.dispatched
+        }
+
+
+def build_reminder(row, lead_minutes):
+    """Nội dung nhắc lịch gửi cho sender"""
+    time_text = row.time.strftime('%H:%M %d/%m/%Y')
+    return {
+        'bookingId': row.bookingId,
+        'time': row.time,
+        'leadMinutes': lead_minutes,
+        'customerId': row.customerId,
+        'customerName': row.customerName or '',
+        'phone': row.phone or '',
+        'email': row.email or '',
+        'serviceName': row.serviceName,
+        'employeeName': row.employeeName or '',
+        'message': f'Nhắc lịch: {row.serviceName} lúc {time_text}'
+                   + (f' với {row.employeeName}' if row.employeeName else '')
+    }
+
+
+@jobs.job('reminders.send')
+def send_reminder(payload):
+    """Gửi một lần nhắc qua sender (bỏ qua nếu booking đã đổi giờ/hủy sau khi xếp lịch)"""
+    row = dao.get_booking_reminder(payload['bookingId'])
+    if row is None or row.status in dao.INACTIVE_BOOKING_STATUSES or row.time.isoformat() != payload['time']:
+        return
+    _scheduler.sender.send(build_reminder(row, payload['leadMinutes']))
+
+
+@jobs.job('reminders.cleanup', cron='@daily')
+def cleanup_reminder_log(payload):
+    """Xóa reminder_log của các booking đã qua"""
+    days = current_app.config['REMINDERS_LOG_RETENTION_DAYS']
+    dao.delete_reminder_log_before(datetime.now() - timedelta(days=days))
+
+
+_scheduler = None
+
+
+def init_reminders(app):
+    """Khởi tạo scheduler nhắc lịch; thread chỉ chạy khi REMINDERS_ENABLED (cùng process với job worker)"""
+    global _scheduler
+    _scheduler = ReminderScheduler(app)
+    if app.config['REMINDERS_ENABLED']:
+        app.before_request(_scheduler.ensure_started)
+    return _scheduler
@@ -0,0 +1,239 @@
+# serializers.py
+"""
+Serializer khai báo cho các model trả về qua API.
+
+Mỗi serializer được khai báo một lần bằng danh sách field và compile thành một
+hàm Python duy nhất (không lặp qua field, không getattr động cho từng dòng),
+rồi áp dụng cho từng dòng kết quả. datetime được giữ nguyên để JSON provider
+serialize native sang ISO 8601.
+"""
+
+
+def to_float(value):
+    """float(value), None -> 0.0"""
+    return float(value) if value is not None else 0.0
+
+
+class Field:
+    """Một field đầu ra.
+
+    source: đường dẫn thuộc tính ('service.name') hoặc hàm nhận object.
+    convert: hàm chuyển giá trị (vd. to_float).
+    default: giá trị khi một object trung gian trên đường dẫn là None;
+             nếu không khai báo thì truy cập thẳng như code viết tay.
+    """
+
+    _NO_DEFAULT = object()
+
+    def __init__(self, source, convert=None, default=_NO_DEFAULT):
+        self.source = source
+        self.convert = convert
+        self.default = default
+
+    @property
+    def has_default(self):
+        return self.default is not Field._NO_DEFAULT
+
+
+class RowSerializer:
+    """Compile danh sách field thành hàm obj -> dict"""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = dict(fields)
+        self.serialize = self._compile()
+
+    def _compile(self):
+        namespace = {}
+        items = []
+
+        for i, (key, field) in enumerate(self.fields.items()):
+            if not isinstance(field, Field):
+                field = Field(field)
+
+            if callable(field.source):
+                namespace[f'src_{i}'] = field.source
+                expr = f'src_{i}(obj)'
+            else:
+                parts = field.source.split('.')
+                expr = 'obj.' + '.'.join(parts)
+                if field.has_default:
+                    # Kiểm tra None cho từng object trung gian trên đường dẫn
+                    checks = ['obj.' + '.'.join(parts[:n]) + ' is not None' for n in range(1, len(parts))]
+                    if checks:
+                        namespace[f'default_{i}'] = field.default
+                        expr = f'({expr} if {" and ".join(checks)} else default_{i})'
+
+            if field.convert is not None:
+                namespace[f'convert_{i}'] = field.convert
+                expr = f'convert_{i}({expr})'
+
+            items.append(f'{key!r}: {expr}')
+
+        source = f'def serialize_{self.name}(obj):\n    return {{' + ', '.join(items) + '}\n'
+        exec(compile(source, f'<serializer {self.name}>', 'exec'), namespace)
+        return namespace[f'serialize_{self.name}']
+
+    def __call__(self, obj):
+        return self.serialize(obj)
+
+    def many(self, rows):
+        """Áp dụng serializer cho danh sách dòng"""
+        serialize = self.serialize
+        return [serialize(row) for row in rows]
+
+
+def _customer_name(obj):
+    return dao.get_customer_name(obj.customerId)
+
+
+def _employee_name(obj):
+    return dao.get_employee_name(obj.employeeId)
+
+
+def _booking_customer_name(obj):
+    booking = obj.booking
+    if booking and booking.customerId:
+        return dao.get_customer_name(booking.customerId)
+    return 'N/A'
+
+
+SERVICE = RowSerializer('service', {
+    'servicesId': 'servicesId',
+    'name': 'name',
+    'durration': 'durration',
+    'price': Field('price', to_float),
+    'note': 'note'
+})
+
+BOOKING = RowSerializer('booking', {
+    'bookingId': 'bookingId',
+    'time': 'time',
+    'status': 'status',
+    'customer': lambda b: {'customerId': b.customerId, 'name': dao.get_customer_name(b.customerId)},
+    'service': lambda b: {
+        'servicesId': b.servicesId,
+        'name': b.service.name,
+        'price': to_float(b.service.price),
+        'durration': b.service.durration
+    },
+    'employee': lambda b: {'employeeId': b.employeeId, 'name': dao.get_employee_name(b.employeeId)}
+})
+
+INVOICE = RowSerializer('invoice', {
+    'invoiceId': 'invoiceId',
+    'customerId': 'customerId',
+    'customerName': _customer_name,
+    'serviceName': Field('booking.service.name', default=''),
+    'total': 'total',
+    'discount': 'discount',
+    'vat': 'vat',
+    'finalTotal': 'finalTotal'
+})
+
+SERVICE_FORM = RowSerializer('service_form', {
+    'formId': 'formId',
+    'bookingId': 'bookingId',
+    'employeeId': 'employeeId',
+    'employeeName': _employee_name,
+    'customerName': _booking_customer_name,
+    'serviceName': 'serviceName',
+    'serviceDuration': 'serviceDuration',
+    'servicePrice': 'servicePrice',
+    'serviceNote': 'serviceNote',
+    'createdAt': 'createdAt'
+})
+
+# Phiếu dịch vụ trong danh sách của một nhân viên (không lặp lại thông tin nhân viên)
+EMPLOYEE_SERVICE_FORM = RowSerializer('employee_service_form', {
+    'formId': 'formId',
+    'bookingId': 'bookingId',
+    'customerName': _booking_customer_name,
+    'serviceName': 'serviceName',
+    'serviceDuration': 'serviceDuration',
+    'servicePrice': 'servicePrice',
+    'serviceNote': 'serviceNote',
+    'createdAt': 'createdAt'
+})
+
+# Dòng lịch làm việc của nhân viên (kết quả dao.get_employee_worklist)
+WORKLIST_ITEM = RowSerializer('worklist_item', {
+    'bookingId': 'bookingId',
+    'time': 'time',
+    'status': 'status',
+    'customer': lambda r: {'customerId': r.customerId, 'name': r.customerName or 'N/A'},
+    'service': lambda r: {
+        'servicesId': r.servicesId,
+        'name': r.serviceName,
+        'price': to_float(r.price),
+        'durration': r.durration
+    },
+    'formId': 'formId',
+    'hasServiceForm': lambda r: r.formId is not None
+})
+
+# Dòng hàng đợi thu ngân (kết quả dao.get_cashier_queue)
+CASHIER_QUEUE_ITEM = RowSerializer('cashier_queue_item', {
+    'bookingId': 'bookingId',
+    'time': 'time',
+    'status': 'status',
+    'customer': lambda r: {'customerId': r.customerId, 'name': r.customerName or 'N/A'},
+    'service': lambda r: {
+        'servicesId': r.servicesId,
+        'name': r.serviceName,
+        'price': to_float(r.price),
+        'durration': r.durration
+    },
+    'employee': lambda r: {'employeeId': r.employeeId, 'name': r.employeeName or 'N/A'}
+})
+
+# Dòng danh bạ khách hàng (dao.get_customer_page)
+CUSTOMER_DIRECTORY_ITEM = RowSerializer('customer_directory_item', {
+    'customerId': 'customerId',
+    'loyaltyPoints': 'loyaltyPoints',
+    'membershipLevel': 'membershipLevel',
+    'name': Field('fullName', lambda v: v or ''),
+    'phone': Field('phone', lambda v: v or ''),
+    'email': Field('email', lambda v: v or '')
+})
+
+# Dòng danh bạ nhân viên (dao.get_employee_page)
+EMPLOYEE_DIRECTORY_ITEM = RowSerializer('employee_directory_item', {
+    'employeeId': 'employeeId',
+    'position': 'position',
+    'department': 'department',
+    'name': Field('fullName', lambda v: v or ''),
+    'phone': Field('phone', lambda v: v or ''),
+    'email': Field('email', lambda v: v or '')
+})
+
+# Kết quả tìm kiếm khách hàng (dao.search_customers)
+CUSTOMER_SEARCH_RESULT = RowSerializer('customer_search_result', {
+    'customerId': 'customerId',
+    'accountId': 'accountId',
+    'username': 'username',
+    'name': Field('fullName', lambda v: v or ''),
+    'phone': Field('phone', lambda v: v or ''),
+    'email': Field('email', lambda v: v or ''),
+    'loyaltyPoints': 'loyaltyPoints',
+    'membershipLevel': 'membershipLevel'
+})
+
+ACCOUNT = RowSerializer('account', {
+    'accountId': 'accountId',
+    'username': 'username',
+    'role': 'role',
+    'name': 'fullName',
+    'phone': 'phone',
+    'email': 'email',
+    'createdAt': 'createdAt'
+})
+
+SETTING = RowSerializer('setting', {
+    'settingId': 'settingId',
+    'value': 'value',
+    'description': 'description'
+})
+
+# Import ở cuối file vì dao (account_dao) cũng import serializers; dao chỉ được dùng khi serialize
+import dao  # noqa: E402
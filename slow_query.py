@@ -0,0 +1,123 @@
+# slow_query.py
+"""
+Slow-query log dựa trên event của SQLAlchemy engine.
+
+Câu SQL chạy lâu hơn ngưỡng SLOW_QUERY_THRESHOLD_MS được ghi lại cùng tham số (chỉ
+với câu đọc; câu ghi có thể chứa passwordHash, số điện thoại, email nên tham số bị ẩn),
+hàm DAO gọi nó, endpoint đang xử lý và (với SQLite) kết quả EXPLAIN QUERY PLAN.
+N bản ghi gần nhất được giữ trong ring buffer để xem qua API admin.
+"""
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from access_log import slow_query_logger
+
+DAO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dao') + os.sep
+
+# Cấu hình hiện hành (được đặt bởi init_slow_query_log)
+_settings = {'threshold_ms': None, 'explain': True, 'max_param_length': 200}
+_buffer = deque(maxlen=100)
+_lock = threading.Lock()
+
+
+def _find_dao_caller():
+    """Tìm hàm DAO gần nhất trên call stack"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(DAO_DIR):
+            module = os.path.splitext(os.path.basename(filename))[0]
+            return f'dao.{module}.{frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def _is_select(statement):
+    return statement.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+def _short_params(statement, parameters):
+    """Rút gọn tham số để log không phình to; câu ghi (INSERT/UPDATE/DELETE) thì ẩn tham số"""
+    if not _is_select(statement):
+        return '<ẩn>' if parameters else repr(parameters)
+    text = repr(parameters)
+    limit = _settings['max_param_length']
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+def _explain_query_plan(conn, statement, parameters):
+    """Lấy EXPLAIN QUERY PLAN cho câu SELECT trên SQLite"""
+    if conn.dialect.name != 'sqlite':
+        return None
+    if not _is_select(statement):
+        return None
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters or ())
+        return [row[-1] for row in cursor.fetchall()]
+    except Exception as e:
+        return [f'Không lấy được query plan: {e}']
+    finally:
+        cursor.close()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _check_slow_query(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get('query_start_time')
+    if not start_times:
+        return
+    duration_ms = (time.perf_counter() - start_times.pop()) * 1000
+
+    threshold_ms = _settings['threshold_ms']
+    if threshold_ms is None or duration_ms < threshold_ms:
+        return
+
+    entry = {
+        'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+        'durationMs': round(duration_ms, 2),
+        'statement': statement,
+        'parameters': _short_params(statement, parameters),
+        'daoFunction': _find_dao_caller(),
+        'endpoint': request.endpoint if has_request_context() else None,
+        'plan': None
+    }
+    if _settings['explain'] and not executemany:
+        entry['plan'] = _explain_query_plan(conn, statement, parameters)
+
+    with _lock:
+        _buffer.append(entry)
+    slow_query_logger.warning(entry)
+
+
+def get_slow_queries():
+    """Các slow query gần nhất, mới nhất trước"""
+    with _lock:
+        entries = list(_buffer)
+    entries.reverse()
+    return entries
+
+
+def init_slow_query_log(app):
+    """Bật slow-query log theo config của app"""
+    global _buffer
+
+    _settings['threshold_ms'] = app.config['SLOW_QUERY_THRESHOLD_MS']
+    _settings['explain'] = app.config['SLOW_QUERY_EXPLAIN']
+
+    with _lock:
+        if _buffer.maxlen != app.config['SLOW_QUERY_BUFFER_SIZE']:
+            _buffer = deque(_buffer, maxlen=app.config['SLOW_QUERY_BUFFER_SIZE'])
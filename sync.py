@@ -0,0 +1,45 @@
+# sync.py
+"""
+Đồng bộ delta cho các API danh sách.
+
+Client gửi ?since=<cursor> (cursor nhận từ lần gọi trước) để chỉ nhận các dòng
+thay đổi (updatedAt >= since) và danh sách khóa chính đã bị xóa (tombstones).
+Không có since, hoặc since cũ hơn thời gian giữ tombstone, thì trả về toàn bộ
+danh sách kèm 'full': true để client thay thế dữ liệu đang giữ.
+"""
+from datetime import datetime, timedelta
+
+from flask import request, current_app
+
+import dao
+
+# Cursor lùi lại một chút để không bỏ sót dòng được flush trước nhưng commit sau
+# thời điểm tạo cursor (client có thể nhận trùng vài dòng, không bao giờ thiếu)
+CURSOR_SKEW = timedelta(seconds=5)
+
+
+class SyncRequest:
+    """Tham số đồng bộ của request hiện tại - tạo trước khi query dữ liệu"""
+
+    def __init__(self):
+        now = datetime.now()
+        self.cursor = (now - CURSOR_SKEW).isoformat()
+
+        value = request.args.get('since')
+        since = datetime.fromisoformat(value) if value else None
+
+        retention = timedelta(days=current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+        if since is not None and since < now - retention:
+            since = None
+        self.since = since
+
+    @property
+    def full(self):
+        return self.since is None
+
+    def payload(self, data, table_name):
+        """Nội dung response: dữ liệu, cursor cho lần sau và các khóa đã xóa"""
+        payload = {'success': True, 'data': data, 'cursor': self.cursor, 'full': self.full}
+        if not self.full:
+            payload['deleted'] = dao.get_deleted_ids(table_name, self.since)
+        return payload
@@ -0,0 +1,46 @@
+# wsgi.py
+"""
+Entry point WSGI cho production.
+
+API (app.py) và frontend (frontend/index.py) chạy chung một cây process gunicorn:
+mỗi request được chuyển tới app tương ứng theo cổng mà nó đi vào.
+
+Chạy: gunicorn -c gunicorn.conf.py wsgi:application
+"""
+from app import app as api_app
+from frontend.index import app as frontend_app
+from compression import init_compression
+
+
+def _bind_port(bind):
+    """Lấy cổng từ địa chỉ bind dạng host:port"""
+    return int(bind.rsplit(':', 1)[1])
+
+
+class PortDispatcher:
+    """Chọn WSGI app theo cổng nhận request, mặc định là API"""
+
+    def __init__(self, default_app, apps_by_port):
+        self.default_app = default_app
+        self.apps_by_port = apps_by_port
+
+    def __call__(self, environ, start_response):
+        # Ưu tiên cổng của socket đang lắng nghe, sau đó mới tới SERVER_PORT (lấy từ Host header)
+        sock = environ.get('gunicorn.socket')
+        try:
+            port = sock.getsockname()[1] if sock is not None else int(environ.get('SERVER_PORT', 0))
+        except (OSError, ValueError, IndexError, TypeError):
+            port = 0
+
+        app = self.apps_by_port.get(port, self.default_app)
+        return app(environ, start_response)
+
+
+# Frontend dùng chung cấu hình nén với API; file tĩnh được nén sẵn một lần ở master
+frontend_app.config.update({key: value for key, value in api_app.config.items() if key.startswith('COMPRESS_')})
+init_compression(frontend_app)
+
+application = PortDispatcher(api_app, {
+    _bind_port(api_app.config['API_BIND']): api_app,
+    _bind_port(api_app.config['FRONTEND_BIND']): frontend_app,
+})